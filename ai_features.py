@@ -1,23 +1,20 @@
-from models.models import Order, SaleItem, MenuItem, db
-from datetime import datetime, timedelta
+from models.models import Order, MenuItem, DailySalesRollup, db, get_business_date
+from datetime import timedelta
 from sqlalchemy import func
 import numpy as np
 from sklearn.linear_model import LinearRegression
+from services.reporting import get_sales_by_period
 
 def predict_sales():
     """Predict future sales using linear regression on restaurant orders"""
     try:
-        # Get sales data for the last 30 days
+        # Get sales data for the last 30 days (oldest to newest, one query)
         days_back = 30
-        sales_by_day = []
-        
-        for i in range(days_back):
-            date = datetime.utcnow().date() - timedelta(days=i)
-            day_orders = Order.query.filter(func.date(Order.created_at) == date).all()
-            total = sum(order.total for order in day_orders)
-            sales_by_day.append(total)
-        
-        sales_by_day.reverse()  # Oldest to newest
+        today = get_business_date()
+        sales_by_day = [
+            bucket['revenue']
+            for bucket in get_sales_by_period(today - timedelta(days=days_back - 1), today + timedelta(days=1))
+        ]
         
         if len(sales_by_day) < 7:
             return {
@@ -42,7 +39,7 @@ def predict_sales():
         # Format predictions
         prediction_data = []
         for i, pred in enumerate(predictions):
-            date = datetime.utcnow().date() + timedelta(days=i+1)
+            date = today + timedelta(days=i+1)
             prediction_data.append({
                 'date': date.strftime('%Y-%m-%d'),
                 'predicted_sales': max(0, round(pred, 2))  # Ensure non-negative
@@ -78,10 +75,10 @@ def get_top_products(limit=5):
             MenuItem.id,
             MenuItem.name,
             MenuItem.price,
-            func.sum(SaleItem.quantity).label('total_sold'),
-            func.sum(SaleItem.quantity * SaleItem.price_at_sale).label('total_revenue')
-        ).join(SaleItem).group_by(MenuItem.id).order_by(
-            func.sum(SaleItem.quantity).desc()
+            func.sum(DailySalesRollup.quantity).label('total_sold'),
+            func.sum(DailySalesRollup.revenue).label('total_revenue')
+        ).join(DailySalesRollup, DailySalesRollup.menu_item_id == MenuItem.id).group_by(MenuItem.id).order_by(
+            func.sum(DailySalesRollup.quantity).desc()
         ).limit(limit).all()
         
         result = []
@@ -109,19 +106,14 @@ def get_top_products(limit=5):
 def get_sales_trend(days=30):
     """Get sales trend data for restaurant"""
     try:
-        trend_data = []
+        today = get_business_date()
+        buckets = get_sales_by_period(today - timedelta(days=days - 1), today + timedelta(days=1))
         
-        for i in range(days-1, -1, -1):
-            date = datetime.utcnow().date() - timedelta(days=i)
-            day_orders = Order.query.filter(func.date(Order.created_at) == date).all()
-            total = sum(order.total for order in day_orders)
-            count = len(day_orders)
-            
-            trend_data.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'revenue': round(total, 2),
-                'transactions': count
-            })
+        trend_data = [{
+            'date': bucket['period'].strftime('%Y-%m-%d'),
+            'revenue': round(bucket['revenue'], 2),
+            'transactions': bucket['transactions']
+        } for bucket in buckets]
         
         return {
             'success': True,
@@ -140,18 +132,18 @@ def get_stock_recommendations():
     try:
         # Get menu items with low stock and high sales
         days_back = 7
-        date_threshold = datetime.utcnow() - timedelta(days=days_back)
+        date_threshold = get_business_date() - timedelta(days=days_back)
         
         recommendations = db.session.query(
             MenuItem.id,
             MenuItem.name,
             MenuItem.stock_quantity,
-            func.sum(SaleItem.quantity).label('recent_sales')
-        ).join(SaleItem).join(Order).filter(
-            Order.created_at >= date_threshold,
+            func.sum(DailySalesRollup.quantity).label('recent_sales')
+        ).join(DailySalesRollup, DailySalesRollup.menu_item_id == MenuItem.id).filter(
+            DailySalesRollup.sales_date >= date_threshold,
             MenuItem.stock_quantity < MenuItem.low_stock_threshold * 2
         ).group_by(MenuItem.id).order_by(
-            func.sum(SaleItem.quantity).desc()
+            func.sum(DailySalesRollup.quantity).desc()
         ).limit(10).all()
         
         result = []
@@ -201,8 +193,8 @@ def get_customer_insights():
         returning_rate = (returning_customers / total_customers) * 100
 
         # Churn risk: Customers who haven't ordered in 30 days
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        active_customers = db.session.query(Order.user_id).filter(Order.created_at >= thirty_days_ago).distinct().count()
+        thirty_days_ago = get_business_date() - timedelta(days=30)
+        active_customers = db.session.query(Order.user_id).filter(Order.business_date >= thirty_days_ago).distinct().count()
         churn_risk_count = total_customers - active_customers
 
         # Avg Frequency (simplified: total orders / total customers / 30 days approx, or just average orders per customer)
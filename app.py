@@ -28,6 +28,7 @@ import openai
 from openai import OpenAI
 
 from bkash_config import BKASH
+from db_config import DATABASE_URL, ENGINE_OPTIONS, DATABASE_BINDS
 
 load_dotenv()
 
@@ -40,8 +41,25 @@ client = OpenAI()
 # -------------------------
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-default-key-fallback')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///restaurant.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL  # DATABASE_URL env, default instance/restaurant.db
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = ENGINE_OPTIONS
+app.config['SQLALCHEMY_BINDS'] = DATABASE_BINDS  # 'replica' when REPLICA_DATABASE_URL is set
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# SQLite tuning applied to every connection (services/sqlite_tuning.py)
+app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+app.config['SQLITE_BUSY_TIMEOUT'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # ms a writer waits for the lock
+app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # bytes
+app.config['SQLITE_CACHE_SIZE'] = int(os.environ.get('SQLITE_CACHE_SIZE', -16000))  # negative = KiB per connection
+app.config['SQLITE_WRITE_RETRIES'] = int(os.environ.get('SQLITE_WRITE_RETRIES', 4))  # retries of a locked write transaction
+# Analytics, AI insights, CRM and export reads use the replica while it is
+# at most REPLICA_MAX_LAG seconds behind, else the primary. 'thread' stamps
+# the heartbeat (and copies a SQLite replica) from a thread of the one web
+# worker holding instance/replica_sync.lock; 'external' leaves it to a
+# separate `python replica_sync.py` process.
+app.config['REPLICA_MAX_LAG'] = float(os.environ.get('REPLICA_MAX_LAG', 30))
+app.config['REPLICA_SYNC'] = os.environ.get('REPLICA_SYNC', 'thread')
+app.config['REPLICA_SYNC_INTERVAL'] = float(os.environ.get('REPLICA_SYNC_INTERVAL', 10))  # seconds
 app.config['UPLOAD_FOLDER'] = os.path.join('static', 'uploads')
 app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif'}
 
@@ -59,6 +77,22 @@ app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
 app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
 app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_USERNAME')
 app.config['MAIL_DEBUG'] = True # Enable verbose SMTP logs
+# Emails are queued in the email_job table. 'thread' sends them from a
+# background thread of each web worker; 'external' leaves it to a separate
+# `python email_worker.py` process.
+app.config['EMAIL_WORKER'] = os.environ.get('EMAIL_WORKER', 'thread')
+
+# Invoice PDFs are rendered in a process pool and cached by content hash;
+# INVOICE_WORKERS=0 renders in the request thread instead.
+app.config['INVOICE_CACHE_DIR'] = os.environ.get('INVOICE_CACHE_DIR', '/tmp/invoice_cache')
+app.config['INVOICE_WORKERS'] = int(os.environ.get('INVOICE_WORKERS', min(2, os.cpu_count() or 1)))
+
+# Live updates over Server-Sent Events. Each open stream holds a worker
+# thread, so only enable with a threaded server (e.g. gunicorn -k gthread
+# --threads 16); when off, the live screens keep polling.
+app.config['SSE_ENABLED'] = os.environ.get('SSE_ENABLED', 'False') == 'True'
+# 'memory' fans out within one process, 'feed' across workers via change_feed
+app.config['EVENT_BROKER'] = os.environ.get('EVENT_BROKER', 'memory')
 
 mail = Mail(app)
 
@@ -77,11 +111,20 @@ from extensions import db, mail, migrate, cache, compress
 # -------------------------
 
 db.init_app(app)
+from services.sqlite_tuning import init_sqlite
+init_sqlite(app)
 csrf = CSRFProtect(app)
 mail.init_app(app)
 migrate.init_app(app, db)
 cache.init_app(app)
 compress.init_app(app)
+from services.events import events
+events.init_app(app)
+from services.replica import init_replica
+init_replica(app)
+from services.email_queue import init_email_queue
+init_email_queue(app)
+from services.identity import get_identity
 from routes.auth import auth_bp
 app.register_blueprint(auth_bp, url_prefix='/auth')
 
@@ -133,13 +176,23 @@ def refresh_user_session():
     This handles immediate role updates (e.g. admin promotion/demotion)
     and ensuring deleted users are logged out.
     """
+    if request.endpoint == 'static':
+        return
+
     if 'user_id' in session:
-        user = User.query.get(session['user_id'])
-        if user:
-            # Sync role and username from DB to Session
-            session['role'] = user.role
-            session['is_admin'] = (user.role == 'admin')
-            session['username'] = user.username
+        # Short-TTL cached snapshot; role changes invalidate it (services.identity)
+        identity = get_identity(session['user_id'])
+        if identity['exists']:
+            # Sync role and username from DB to Session (only write on change,
+            # so the session cookie is not re-issued on every response)
+            synced = {
+                'role': identity['role'],
+                'is_admin': identity['role'] == 'admin',
+                'username': identity['username']
+            }
+            for key, value in synced.items():
+                if session.get(key) != value:
+                    session[key] = value
         else:
             # User deleted from DB but still has cookie -> Logout them
             session.clear()
@@ -149,7 +202,10 @@ def refresh_user_session():
 # Models
 # -------------------------
 # Import models from the new package
-from models.models import User, MenuItem, Order, Reservation, Rating, StaffShift, ReportLog
+from models.models import User, Order, Reservation, Rating, StaffShift, ReportLog, DailySalesRollup
+from services.rollup import rebuild_daily_sales_rollup
+from services.ratings import top_rated_items
+from services.cache_tags import cached_fragment, TAG_MENU, TAG_RATINGS
 
 
 def is_profile_complete(user):
@@ -189,10 +245,31 @@ def create_admin_if_not_exists():
         db.session.commit()
 
 
+from services.changefeed import create_feed_clock_if_missing
+from services.reservations import create_booking_lock_if_missing
+from services.ratings import add_rating_columns, rebuild_rating_aggregates
+
+def add_rating_columns_if_missing():
+    # First start after upgrading: menu_item gains the rating aggregates
+    # (create_all never adds columns), filled from the existing ratings.
+    if add_rating_columns():
+        rebuild_rating_aggregates()
+
+def build_sales_rollup_if_missing():
+    # First start after upgrading: fill the rollup from existing orders.
+    # Only ids are read, so this runs before column migrations too.
+    if not db.session.query(DailySalesRollup.id).first() and db.session.query(Order.id).first():
+        rebuild_daily_sales_rollup()
+
+
 # Run DB setup once, when the app starts
 with app.app_context():
-    db.create_all()
+    db.create_all(bind_key=None)  # primary only; the replica is a copy of it
     create_admin_if_not_exists()
+    add_rating_columns_if_missing()
+    build_sales_rollup_if_missing()
+    create_feed_clock_if_missing()
+    create_booking_lock_if_missing()
 
 
 @app.context_processor
@@ -200,28 +277,15 @@ def inject_global_data():
     cart = session.get('cart', {})
     count = sum(cart.values()) if isinstance(cart, dict) else 0
 
-    # Cached best rated item (5 minutes)
-    @cache.cached(timeout=300, key_prefix='best_rated_item_context')
+    # Cached best rated item (5 minutes, or until the menu/ratings change)
     def get_best_rated_item():
-        # Eager load ratings to avoid N+1
-        all_items = MenuItem.query.options(db.joinedload(MenuItem.ratings)).all()
-        best_item = None
-        max_avg = 0
-        
-        for it in all_items:
-            # Calculate in-memory with pre-fetched ratings (no new queries)
-            ratings = it.ratings
-            if not ratings:
-                avg = 0
-            else:
-                avg = round(sum(r.score for r in ratings) / len(ratings), 1)
-
-            if avg > max_avg:
-                max_avg = avg
-                best_item = it
-        return best_item
+        # Single indexed lookup on the precomputed rating average. A plain
+        # dict is cached: an ORM instance would outlive its session.
+        top = top_rated_items(limit=1)
+        return {'id': top[0].id, 'name': top[0].name} if top else None
 
-    return dict(cart_count=count, best_rated_item=get_best_rated_item())
+    best_rated_item = cached_fragment('best_rated_item_context', [TAG_MENU, TAG_RATINGS], get_best_rated_item)
+    return dict(cart_count=count, best_rated_item=best_rated_item)
 
 
 # ========================================
@@ -296,6 +360,6 @@ def internal_server_error(e):
 if __name__ == '__main__':
     # If you change models and need a fresh DB: delete restaurant.db manually then restart.
     with app.app_context():
-        db.create_all()
+        db.create_all(bind_key=None)
         create_admin_if_not_exists()
     app.run(debug=True)
@@ -0,0 +1,98 @@
+"""
+Cache Benchmark
+Measures GET /menu latency (main.menu, served from a cached fragment) with
+the in-process LRU tier in front of the shared backend, and with the shared
+backend alone (CACHE_LOCAL_TIMEOUT=0). Each configuration runs in its own
+process on a temporary copy of the SQLite database and an empty cache
+directory, so nothing real is touched.
+
+Usage: python bench_cache.py [--requests 2000] [--backend FileSystemCache]
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CONFIGURATIONS = [
+    ('backend only', {'CACHE_LOCAL_TIMEOUT': '0'}),
+    ('tiered', {'CACHE_LOCAL_TIMEOUT': '5'}),
+]
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def measure(requests):
+    """Child process: time GET /menu and a raw cache.get of the menu fragment."""
+    os.environ.setdefault('OPENAI_API_KEY', 'unused')  # the app builds an OpenAI client on import
+    from app import app
+    from extensions import cache
+
+    client = app.test_client()
+    assert client.get('/menu').status_code == 200  # fill the cache
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get('/menu')
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200
+
+    # The cost of one lookup of a fragment-sized value
+    cache.set('bench:fragment', 'x' * len(response.get_data()))
+    started = time.perf_counter()
+    for _ in range(requests):
+        cache.get('bench:fragment')
+    lookup = (time.perf_counter() - started) / requests
+
+    print(json.dumps({
+        'p50': percentile(latencies, 0.5), 'p99': percentile(latencies, 0.99),
+        'mean': statistics.mean(latencies), 'lookup': lookup,
+        'fragment_bytes': len(response.get_data()), 'stats': cache.cache.stats()
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--backend', default='FileSystemCache', help="shared backend (CACHE_BACKEND)")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        measure(args.requests)
+        return 0
+
+    from db_config import IS_SQLITE, SQLITE_PATH
+    if not IS_SQLITE:
+        print("[ERROR] The benchmark copies the SQLite database; unset DATABASE_URL")
+        return 1
+
+    workdir = tempfile.mkdtemp(prefix='bench_cache_')
+    try:
+        copy_path = os.path.join(workdir, 'restaurant.db')
+        source, target = sqlite3.connect(SQLITE_PATH), sqlite3.connect(copy_path)
+        source.backup(target)
+        target.close()
+        source.close()
+
+        print(f"GET /menu x {args.requests}, backend {args.backend}")
+        for label, overrides in CONFIGURATIONS:
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{copy_path}", CACHE_BACKEND=args.backend,
+                       CACHE_DIR=tempfile.mkdtemp(dir=workdir), EMAIL_WORKER='external', **overrides)
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', '--requests', str(args.requests)],
+                                    env=env, capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            stats = result['stats']
+            print(f"  {label:<13} p50 {result['p50'] * 1000:.2f} ms  p99 {result['p99'] * 1000:.2f} ms  "
+                  f"mean {result['mean'] * 1000:.2f} ms  cache.get({result['fragment_bytes']} B) "
+                  f"{result['lookup'] * 1e6:.1f} us  (local hits {stats['local_hits']}, backend hits {stats['backend_hits']})")
+        return 0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
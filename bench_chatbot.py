@@ -0,0 +1,124 @@
+"""
+Chatbot Matcher Benchmark
+Times the chatbot's message matching over the phrases in chat_phrases.txt:
+the old per-pattern loop (rebuild the keyword map, then compile and run
+one regex per keyword and per intent phrase, for every message) against
+the precompiled matchers in services/chatbot.py (one combined regex each).
+
+It also checks that the rewrite kept the behaviour. For every phrase:
+- the items and quantities found must be the same as with the old loop;
+- the intent must be the same as with the old loop, with phrases matched
+  as whole words. Before user-016, the old loop also matched inside
+  longer words, so "chicken" counted as "hi". The phrases where that
+  substring rule differs are listed but do not fail the run.
+
+The menu is read from the database (DATABASE_URL, default
+instance/restaurant.db); nothing is written.
+
+Usage: python bench_chatbot.py [--messages 5000] [--phrases chat_phrases.txt]
+Exits 1 if any phrase gives a different result.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from sqlalchemy import create_engine, select
+from db_config import DATABASE_URL
+from models.models import MenuItem
+from services.chatbot import ItemMatcher, INTENTS, WORD_TO_NUM, detect_intent
+
+def old_find_items(items, message):
+    """The per-keyword loop api_chat used to run on every message."""
+    keyword_map = {}
+    for item_id, name in items:
+        name_lower = name.lower()
+        keyword_map[name_lower] = item_id
+        keyword_map[name_lower + 's'] = item_id
+        for part in name_lower.split():
+            if len(part) > 2 and part not in keyword_map:
+                keyword_map[part] = item_id
+
+    found = []
+    msg_scan = message
+    for keyword in sorted(keyword_map, key=len, reverse=True):
+        pattern = rf"(?:(\d+|one|two|three|four|five|six|seven|eight|nine|ten|a|an)\s+)?\b{re.escape(keyword)}\b"
+        for match in list(re.finditer(pattern, msg_scan)):
+            qty_str = match.group(1)
+            qty = 1
+            if qty_str:
+                qty = int(qty_str) if qty_str.isdigit() else WORD_TO_NUM.get(qty_str, 1)
+            found.append((keyword_map[keyword], qty))
+            start, end = match.span()
+            msg_scan = msg_scan[:start] + (" " * (end - start)) + msg_scan[end:]
+    return found
+
+def old_intent(message, whole_words=True):
+    """The old if/elif chain: one check per intent phrase, in priority order."""
+    for name, phrases in INTENTS:
+        for phrase in phrases:
+            if whole_words:
+                if re.search(rf"\b{re.escape(phrase)}s?\b", message):
+                    return name
+            elif phrase in message:
+                return name
+    return None
+
+def load_phrases(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip().lower() for line in f if line.strip() and not line.startswith('#')]
+
+def time_per_message(fn, messages):
+    started = time.perf_counter()
+    for message in messages:
+        fn(message)
+    return (time.perf_counter() - started) / len(messages) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=5000, help="messages drawn from the phrases for timing")
+    parser.add_argument('--phrases', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chat_phrases.txt'))
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    items_table = MenuItem.__table__
+    with engine.connect() as conn:
+        items = conn.execute(select(items_table.c.id, items_table.c.name)
+                             .where(items_table.c.availability == True).order_by(items_table.c.id)).all()
+    engine.dispose()
+    items = [tuple(row) for row in items]
+    phrases = load_phrases(args.phrases)
+    print(f"{len(phrases)} phrases, {len(items)} available menu items")
+
+    matcher = ItemMatcher(items)
+    failures = 0
+    for phrase in phrases:
+        old_items, new_items = sorted(old_find_items(items, phrase)), sorted(matcher.find_items(phrase))
+        if old_items != new_items:
+            failures += 1
+            print(f"[FAIL] items for {phrase!r}: old {old_items}, new {new_items}")
+        if old_intent(phrase) != detect_intent(phrase):
+            failures += 1
+            print(f"[FAIL] intent for {phrase!r}: old {old_intent(phrase)}, new {detect_intent(phrase)}")
+        elif old_intent(phrase, whole_words=False) != detect_intent(phrase):
+            print(f"  whole-word change: {phrase!r} was {old_intent(phrase, whole_words=False)}, now {detect_intent(phrase)}")
+
+    random.seed(0)
+    messages = [random.choice(phrases) for _ in range(args.messages)]
+    # The old path matched items only when no intent was found, as api_chat does
+    old_us = time_per_message(lambda m: old_intent(m, whole_words=False) or old_find_items(items, m), messages)
+    new_us = time_per_message(lambda m: detect_intent(m) or matcher.find_items(m), messages)
+    build_us = time_per_message(lambda m: ItemMatcher(items), messages[:200])
+    print(f"old per-pattern loop: {old_us:.1f} us/message")
+    print(f"combined regex:       {new_us:.1f} us/message ({old_us / new_us:.1f}x faster)")
+    print(f"matcher build (once per menu version): {build_us:.0f} us")
+
+    if failures:
+        print(f"[FAIL] {failures} differences")
+        return 1
+    print("[SUCCESS] Same items and intents for every phrase")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+SQLite Contention Benchmark
+Measures order writes and dashboard reads while several processes share
+the SQLite database, with the connection tuning of services/sqlite_tuning.py
+and without it:
+- before: rollback journal, synchronous=FULL, the driver's own 5 s busy
+  timeout and no retry of locked writes (an untuned connection);
+- after: the app's defaults (WAL, synchronous=NORMAL, busy_timeout,
+  mmap/cache sizes and SQLITE_WRITE_RETRIES retries).
+
+For each configuration, W writer processes place orders through
+services.orders.create_order while R reader processes poll the kitchen
+queue and the pending-order count, as the dashboards do. Writer and
+reader p50/p99 latencies and failed operations are reported.
+
+Each configuration runs on its own temporary copy of the SQLite database,
+so the real orders and stock are not touched.
+
+Usage: python bench_sqlite.py [--writers 4] [--orders 100] [--readers 2]
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+CONFIGURATIONS = [
+    ('before', 'rollback journal, synchronous=FULL, no retries',
+     {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_BUSY_TIMEOUT': '5000',
+      'SQLITE_WRITE_RETRIES': '0', 'SQLITE_MMAP_SIZE': '0', 'SQLITE_CACHE_SIZE': '-2000'}),
+    ('after', 'app defaults: WAL, synchronous=NORMAL, retries', {}),
+]
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float('nan')
+
+def wait_for_start(go_path):
+    """Report that the app is loaded, then wait until every process is."""
+    print('ready', flush=True)
+    while not os.path.exists(go_path):
+        time.sleep(0.005)
+
+def run_writer(orders, go_path, item_id, user_id):
+    """Child process: place `orders` orders of one item, timing each one."""
+    from app import app
+    from extensions import db
+    from services.cart import price_cart
+    from services.orders import create_order
+
+    latencies, errors = [], 0
+    with app.app_context():
+        wait_for_start(go_path)
+        for _ in range(orders):
+            started = time.perf_counter()
+            try:
+                create_order(user_id, price_cart({str(item_id): 1}), phone='0', address_street='-',
+                             address_city='-', address_district='-', status='Confirmed', payment_method='cash')
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                db.session.rollback()
+                errors += 1
+                print(f"[Bench] {type(e).__name__}: {e}", file=sys.stderr)
+            finally:
+                db.session.remove()
+    return latencies, errors
+
+def run_reader(go_path, stop_path):
+    """Child process: poll the kitchen queue and pending count until the writers are done."""
+    from app import app
+    from extensions import db
+    from models.models import Order
+
+    latencies, errors = [], 0
+    with app.app_context():
+        wait_for_start(go_path)
+        while not os.path.exists(stop_path):
+            started = time.perf_counter()
+            try:
+                Order.query.filter(Order.status.in_(['Confirmed', 'Preparing'])).order_by(Order.created_at.asc()).limit(50).all()
+                Order.query.filter(Order.status.in_(['Placed', 'Pending', 'Paid'])).count()
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                db.session.rollback()
+                errors += 1
+                print(f"[Bench] {type(e).__name__}: {e}", file=sys.stderr)
+            finally:
+                db.session.remove()
+            time.sleep(0.01)
+    return latencies, errors
+
+def is_ready(process):
+    """Wait for a child's 'ready' line; False if it exited first."""
+    for line in process.stdout:
+        if line.strip() == 'ready':
+            return True
+    return False
+
+def prepare_copy(source_path, target_path, journal_mode):
+    """Copy the database, switch its journal mode and give one item ample stock.
+
+    Returns (item_id, user_id).
+    """
+    source, target = sqlite3.connect(source_path), sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+        target.execute(f"PRAGMA journal_mode={journal_mode}")
+        item_id = target.execute("SELECT min(id) FROM menu_item").fetchone()[0]
+        user_id = target.execute("SELECT min(id) FROM user").fetchone()[0]
+        if item_id is not None:
+            target.execute("UPDATE menu_item SET stock_quantity = 1000000 WHERE id = ?", (item_id,))
+            target.commit()
+        return item_id, user_id
+    finally:
+        target.close()
+        source.close()
+
+def summary(label, results):
+    latencies = [x for r in results for x in r['latencies']]
+    errors = sum(r['errors'] for r in results)
+    return (f"{label:<7} ok {len(latencies):>5}  failed {errors:>3}  p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  "
+            f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4, help="writer processes")
+    parser.add_argument('--orders', type=int, default=100, help="orders per writer")
+    parser.add_argument('--readers', type=int, default=2, help="reader processes")
+    parser.add_argument('--child', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        os.environ.setdefault('OPENAI_API_KEY', 'unused')  # the app builds an OpenAI client on import
+        role, go_path = args.child[0], args.child[1]
+        if role == 'writer':
+            latencies, errors = run_writer(args.orders, go_path, int(args.child[2]), int(args.child[3]))
+        else:
+            latencies, errors = run_reader(go_path, args.child[2])
+        print(json.dumps({'latencies': latencies, 'errors': errors}))
+        return 0
+
+    from db_config import IS_SQLITE, SQLITE_PATH
+    if not IS_SQLITE:
+        print("[ERROR] The benchmark copies the SQLite database; unset DATABASE_URL")
+        return 1
+
+    workdir = tempfile.mkdtemp(prefix='bench_sqlite_')
+    try:
+        print(f"{args.writers} writers x {args.orders} orders, {args.readers} readers")
+        for label, description, overrides in CONFIGURATIONS:
+            copy_path = os.path.join(workdir, f"{label}.db")
+            item_id, user_id = prepare_copy(SQLITE_PATH, copy_path, overrides.get('SQLITE_JOURNAL_MODE', 'WAL'))
+            if item_id is None or user_id is None:
+                print("[ERROR] The database needs at least one menu item and one user")
+                return 1
+            go_path, stop_path = os.path.join(workdir, f"{label}.go"), os.path.join(workdir, f"{label}.stop")
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{copy_path}", EMAIL_WORKER='external', **overrides)
+
+            def child(*child_args):
+                return subprocess.Popen([sys.executable, os.path.abspath(__file__), '--orders', str(args.orders),
+                                         '--child', *map(str, child_args)], env=env, stdout=subprocess.PIPE, text=True)
+
+            writers = [child('writer', go_path, item_id, user_id) for _ in range(args.writers)]
+            readers = [child('reader', go_path, stop_path) for _ in range(args.readers)]
+            if not all([is_ready(p) for p in writers + readers]):
+                for p in writers + readers:
+                    p.kill()
+                print("[ERROR] A benchmark process failed to load the app")
+                return 1
+            open(go_path, 'w').close()
+            start_at = time.time()
+            writer_results = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in writers]
+            elapsed = time.time() - start_at
+            open(stop_path, 'w').close()
+            reader_results = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in readers]
+
+            print(f"{label}: {description} ({elapsed:.1f}s)")
+            print(f"  {summary('writers', writer_results)}")
+            print(f"  {summary('readers', reader_results)}")
+        return 0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,16 @@
 # bkash_config.py
+import os
+
+# Every value can be overridden from the environment, e.g. BKASH_BASE_URL
+# to point at a local mock gateway (python mock_bkash_gateway.py).
 BKASH = {
-    "base_url": "https://checkout.sandbox.bka.sh/v1.2.0-beta",
-    "username": "YOUR_BKASH_USERNAME",
-    "password": "YOUR_BKASH_PASSWORD",
-    "app_key": "YOUR_APP_KEY",
-    "app_secret": "YOUR_APP_SECRET",
-    "callback_url": "http://127.0.0.1:5000/bkash/callback"
+    "base_url": os.environ.get("BKASH_BASE_URL", "https://checkout.sandbox.bka.sh/v1.2.0-beta"),
+    "username": os.environ.get("BKASH_USERNAME", "YOUR_BKASH_USERNAME"),
+    "password": os.environ.get("BKASH_PASSWORD", "YOUR_BKASH_PASSWORD"),
+    "app_key": os.environ.get("BKASH_APP_KEY", "YOUR_APP_KEY"),
+    "app_secret": os.environ.get("BKASH_APP_SECRET", "YOUR_APP_SECRET"),
+    "callback_url": os.environ.get("BKASH_CALLBACK_URL", "http://127.0.0.1:5000/bkash/callback"),
+    # Seconds; a slow gateway fails the request instead of hanging a worker
+    "connect_timeout": float(os.environ.get("BKASH_CONNECT_TIMEOUT", 3.05)),
+    "read_timeout": float(os.environ.get("BKASH_READ_TIMEOUT", 10))
 }
@@ -1,10 +1,7 @@
-import sqlite3
-import os
+from sqlalchemy import create_engine, inspect
+from db_config import DATABASE_URL
 
-db_path = os.path.join('instance', 'restaurant.db')
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
-cursor.execute("PRAGMA table_info(user)")
-columns = [column[1] for column in cursor.fetchall()]
+engine = create_engine(DATABASE_URL)
+columns = [column['name'] for column in inspect(engine).get_columns('user')]
 print("Columns in 'user' table:", columns)
-conn.close()
+engine.dispose()
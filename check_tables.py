@@ -1,13 +1,10 @@
-import sqlite3
+from sqlalchemy import create_engine, inspect
+from db_config import DATABASE_URL, IS_SQLITE, SQLITE_PATH
 import os
 
-db_path = os.path.join('instance', 'restaurant.db')
-if os.path.exists(db_path):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = cursor.fetchall()
-    print("Tables found:", [t[0] for t in tables])
-    conn.close()
+if not IS_SQLITE or os.path.exists(SQLITE_PATH):
+    engine = create_engine(DATABASE_URL)
+    print("Tables found:", inspect(engine).get_table_names())
+    engine.dispose()
 else:
     print("Database not found.")
@@ -0,0 +1,18 @@
+"""
+Email Worker
+Sends the emails queued in the email_job table, in batches over one SMTP
+connection, retrying failures with backoff until they are sent or dead.
+
+Run it next to the web app when EMAIL_WORKER=external:
+Usage: python email_worker.py          (runs until stopped)
+       python email_worker.py --once   (sends one batch and exits)
+"""
+import sys
+import logging
+from app import app
+from services.email_queue import run_email_worker
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print("[Email] Worker started")
+    run_email_worker(app, once='--once' in sys.argv)
@@ -3,13 +3,26 @@ from flask_mail import Mail
 from flask_migrate import Migrate
 from flask_caching import Cache
 from flask_compress import Compress
+from services.replica import RoutingSession
+import os
 
-db = SQLAlchemy()
+# Reads of the reporting screens can go to a replica bind (services/replica.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 mail = Mail()
 migrate = Migrate()
+# Two-tier cache: a small per-process LRU in front of a shared backend.
+# CACHE_BACKEND can be FileSystemCache (default), RedisCache or SimpleCache;
+# set CACHE_LOCAL_TIMEOUT=0 to turn the in-process tier off.
 cache = Cache(config={
-    'CACHE_TYPE': 'FileSystemCache',
-    'CACHE_DIR': '/tmp/flask_cache',  # Works on Render's ephemeral filesystem
-    'CACHE_DEFAULT_TIMEOUT': 300
+    'CACHE_TYPE': 'services.tiered_cache.TieredCache',
+    'CACHE_BACKEND': os.environ.get('CACHE_BACKEND', 'FileSystemCache'),
+    'CACHE_DIR': os.environ.get('CACHE_DIR', '/tmp/flask_cache'),  # Works on Render's ephemeral filesystem
+    'CACHE_THRESHOLD': int(os.environ.get('CACHE_THRESHOLD', 2000)),  # Files kept before the backend prunes
+    'CACHE_REDIS_URL': os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'),
+    'CACHE_DEFAULT_TIMEOUT': 300,
+    'CACHE_LOCAL_MAX_ENTRIES': int(os.environ.get('CACHE_LOCAL_MAX_ENTRIES', 1000)),
+    'CACHE_LOCAL_TIMEOUT': int(os.environ.get('CACHE_LOCAL_TIMEOUT', 5)),
+    # Keys that must be exact across workers skip the in-process tier
+    'CACHE_LOCAL_BYPASS': tuple(p for p in os.environ.get('CACHE_LOCAL_BYPASS', 'identity:,tag-version:').split(',') if p)
 })
 compress = Compress()
@@ -0,0 +1,51 @@
+"""
+Upgrade Migrations
+Runs every migration an existing database needs, in the order they depend
+on each other, and stops at the first one that fails:
+- migrate_business_date.py before migrate_sale_items.py, so backfilled
+  sale items take their order's business_date;
+- migrate_sale_items.py before migrate_sales_rollup.py, whose per-item
+  rows are built from the sale items;
+- migrate_indexes.py last, since some of its indexes cover columns the
+  earlier scripts add.
+Each script runs in its own process and is safe to re-run, so after a
+failure fix the cause and run this again.
+
+Usage: python migrate_all.py
+"""
+import os
+import subprocess
+import sys
+
+MIGRATIONS = [
+    'migrate_ratings.py',
+    'migrate_reservations.py',
+    'migrate_business_date.py',
+    'migrate_sale_items.py',
+    'migrate_sales_rollup.py',
+    'migrate_indexes.py',
+]
+
+def run(script):
+    """Run one migration, echoing its output; False if it failed."""
+    process = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), script)],
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    failed = False
+    for line in process.stdout:
+        print(f"  {line}", end='')
+        # The scripts report errors without a non-zero exit code
+        failed = failed or line.startswith('[ERROR]')
+    return process.wait() == 0 and not failed
+
+def main():
+    for script in MIGRATIONS:
+        print(f"[Migrate] {script}")
+        if not run(script):
+            remaining = MIGRATIONS[MIGRATIONS.index(script) + 1:]
+            print(f"[ERROR] {script} failed" + (f"; not run: {', '.join(remaining)}" if remaining else ""))
+            return 1
+    print("[SUCCESS] Database is up to date")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
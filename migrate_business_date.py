@@ -0,0 +1,56 @@
+"""
+Business Date Migration
+Adds the indexed business_date column (the Asia/Dhaka calendar day of
+created_at) to orders and sale_item and fills it for existing rows, so
+day-based reports can use an index range instead of date(created_at).
+Safe to re-run; rows that already have a business_date are left alone.
+
+Usage: python migrate_business_date.py
+"""
+from app import app
+from models.models import db, Order, SaleItem
+
+BATCH_SIZE = 5000
+
+# created_at holds Dhaka wall-clock time (see get_dhaka_time), so its
+# date part is already the business date.
+BACKFILL = {
+    'orders': "UPDATE orders SET business_date = date(created_at) WHERE id IN "
+              "(SELECT id FROM orders WHERE business_date IS NULL AND created_at IS NOT NULL LIMIT :n)",
+    # Lines always take their order's day, even if created_at differs
+    'sale_item': "UPDATE sale_item SET business_date = "
+                 "(SELECT business_date FROM orders WHERE orders.id = sale_item.order_id) WHERE id IN "
+                 "(SELECT sale_item.id FROM sale_item JOIN orders ON orders.id = sale_item.order_id "
+                 "WHERE sale_item.business_date IS NULL AND orders.business_date IS NOT NULL LIMIT :n)",
+}
+
+def migrate():
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            for model in (Order, SaleItem):
+                table = model.__tablename__
+                if 'business_date' not in {c['name'] for c in inspector.get_columns(table)}:
+                    with db.engine.begin() as conn:
+                        conn.execute(db.text(f"ALTER TABLE {table} ADD COLUMN business_date DATE"))
+                    print(f"[SUCCESS] business_date column added to {table}")
+                for index in model.__table__.indexes:
+                    if 'business_date' in index.columns:
+                        index.create(db.engine, checkfirst=True)
+            print("[OK] Business date indexes verified")
+
+            for table, sql in BACKFILL.items():
+                filled = 0
+                while True:
+                    # Short transactions keep the app writable during the backfill
+                    with db.engine.begin() as conn:
+                        count = conn.execute(db.text(sql), {'n': BATCH_SIZE}).rowcount
+                    if not count:
+                        break
+                    filled += count
+                print(f"[OK] business_date filled for {filled} {table} rows")
+        except Exception as e:
+            print(f"[ERROR] Migration failed: {e}")
+
+if __name__ == "__main__":
+    migrate()
@@ -1,199 +1,189 @@
 """
 Database Migration Script
 Adds reset_token, reset_token_expiry, email_verified, and email_verification_code columns to User table
+
+Works on the database from db_config (DATABASE_URL, default instance/restaurant.db)
+without starting the app, whose startup queries need the migrated columns.
 """
-import sqlite3
+from datetime import datetime
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+from db_config import DATABASE_URL, IS_SQLITE, SQLITE_PATH, ENGINE_OPTIONS
 import os
+import random
 
-# Path to database
-db_path = os.path.join('instance', 'restaurant.db')
-
-if not os.path.exists(db_path):
-    print(f"[ERROR] Database not found at {db_path}")
+if IS_SQLITE and not os.path.exists(SQLITE_PATH):
+    print(f"[ERROR] Database not found at {SQLITE_PATH}")
     print("The database will be created automatically when you run app.py")
     exit(1)
 
+engine = create_engine(DATABASE_URL, **ENGINE_OPTIONS)
+q = engine.dialect.identifier_preparer.quote  # "user" and "order" are reserved words
+
+def columns_of(conn, table):
+    return [col['name'] for col in inspect(conn).get_columns(table)]
+
+def table_exists(conn, table):
+    return inspect(conn).has_table(table)
+
+def add_column(conn, table, name, ddl):
+    conn.execute(text(f"ALTER TABLE {q(table)} ADD COLUMN {name} {ddl}"))
+
 try:
-    # Connect to database
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Check if columns already exist
-    cursor.execute("PRAGMA table_info(user)")
-    columns = [column[1] for column in cursor.fetchall()]
-    
-    # Add reset_token column if it doesn't exist
-    if 'reset_token' not in columns:
-        print("Adding reset_token column...")
-        cursor.execute("ALTER TABLE user ADD COLUMN reset_token VARCHAR(100)")
-        print("[SUCCESS] reset_token column added")
-    
-    # Add reset_token_expiry column if it doesn't exist
-    if 'reset_token_expiry' not in columns:
-        print("Adding reset_token_expiry column...")
-        cursor.execute("ALTER TABLE user ADD COLUMN reset_token_expiry DATETIME")
-        print("[SUCCESS] reset_token_expiry column added")
-
-    # Add email_verified column if it doesn't exist
-    if 'email_verified' not in columns:
-        print("Adding email_verified column...")
-        cursor.execute("ALTER TABLE user ADD COLUMN email_verified BOOLEAN DEFAULT 0")
-        print("[SUCCESS] email_verified column added")
-
-    # Add email_verification_code column if it doesn't exist
-    if 'email_verification_code' not in columns:
-        print("Adding email_verification_code column...")
-        cursor.execute("ALTER TABLE user ADD COLUMN email_verification_code VARCHAR(10)")
-        print("[SUCCESS] email_verification_code column added")
-
-    # Add created_at column if it doesn't exist
-    if 'created_at' not in columns:
-        print("Adding created_at column...")
-        cursor.execute("ALTER TABLE user ADD COLUMN created_at DATETIME")
-        
-        # Set default value for existing rows (current time)
-        from datetime import datetime
-        now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-        cursor.execute(f"UPDATE user SET created_at = '{now}' WHERE created_at IS NULL")
-        
-        print("[SUCCESS] created_at column added")
-
-    # Add member_id column if it doesn't exist
-    if 'member_id' not in columns:
-        print("Adding member_id column...")
-        cursor.execute("ALTER TABLE user ADD COLUMN member_id VARCHAR(20)")
-        
-        # Generate member_id for existing users
-        print("Generating member_ids for existing users...")
-        cursor.execute("SELECT id FROM user")
-        users = cursor.fetchall()
-        import random
-        for u in users:
-            uid = u[0]
-            # Format: 75 + 2 random digits + id
-            mid = f"75{random.randint(10, 99)}{uid}"
-            cursor.execute(f"UPDATE user SET member_id = '{mid}' WHERE id = {uid}")
-            
-        print("[SUCCESS] member_id column added and populated")
-
-    # [SRS Update] Add role column to User
-    if 'role' not in columns:
-        print("Adding role column to User...")
-        cursor.execute("ALTER TABLE user ADD COLUMN role VARCHAR(20) DEFAULT 'customer'")
-        print("[SUCCESS] role column added")
-
-    # Check MenuItem table
-    cursor.execute("PRAGMA table_info(menu_item)")
-    menu_columns = [col[1] for col in cursor.fetchall()]
-    
-    if 'stock_quantity' not in menu_columns:
-        print("Adding stock_quantity to MenuItem...")
-        cursor.execute("ALTER TABLE menu_item ADD COLUMN stock_quantity INTEGER DEFAULT 0")
-        print("[SUCCESS] stock_quantity added")
-
-    if 'low_stock_threshold' not in menu_columns:
-        print("Adding low_stock_threshold to MenuItem...")
-        cursor.execute("ALTER TABLE menu_item ADD COLUMN low_stock_threshold INTEGER DEFAULT 5")
-        print("[SUCCESS] low_stock_threshold added")
-
-    # Rename 'order' to 'orders' if necessary
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='orders'")
-    orders_exists = cursor.fetchone()
-    
-    if not orders_exists:
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='order'")
-        order_exists = cursor.fetchone()
-        if order_exists:
-            print("Renaming table 'order' to 'orders'...")
-            # Use quoted "order" just in case
-            cursor.execute('ALTER TABLE "order" RENAME TO orders')
-            print("[SUCCESS] Table renamed to 'orders'")
+    with engine.begin() as conn:
+        # Check if columns already exist
+        columns = columns_of(conn, 'user')
+
+        # Add reset_token column if it doesn't exist
+        if 'reset_token' not in columns:
+            print("Adding reset_token column...")
+            add_column(conn, 'user', 'reset_token', 'VARCHAR(100)')
+            print("[SUCCESS] reset_token column added")
+
+        # Add reset_token_expiry column if it doesn't exist
+        if 'reset_token_expiry' not in columns:
+            print("Adding reset_token_expiry column...")
+            add_column(conn, 'user', 'reset_token_expiry', 'TIMESTAMP')
+            print("[SUCCESS] reset_token_expiry column added")
+
+        # Add email_verified column if it doesn't exist
+        if 'email_verified' not in columns:
+            print("Adding email_verified column...")
+            add_column(conn, 'user', 'email_verified', 'BOOLEAN DEFAULT FALSE')
+            print("[SUCCESS] email_verified column added")
+
+        # Add email_verification_code column if it doesn't exist
+        if 'email_verification_code' not in columns:
+            print("Adding email_verification_code column...")
+            add_column(conn, 'user', 'email_verification_code', 'VARCHAR(10)')
+            print("[SUCCESS] email_verification_code column added")
+
+        # Add created_at column if it doesn't exist
+        if 'created_at' not in columns:
+            print("Adding created_at column...")
+            add_column(conn, 'user', 'created_at', 'TIMESTAMP')
+
+            # Set default value for existing rows (current time)
+            conn.execute(text(f"UPDATE {q('user')} SET created_at = :now WHERE created_at IS NULL"),
+                         {'now': datetime.utcnow()})
+
+            print("[SUCCESS] created_at column added")
+
+        # Add member_id column if it doesn't exist
+        if 'member_id' not in columns:
+            print("Adding member_id column...")
+            add_column(conn, 'user', 'member_id', 'VARCHAR(20)')
+
+            # Generate member_id for existing users
+            print("Generating member_ids for existing users...")
+            users = conn.execute(text(f"SELECT id FROM {q('user')}")).fetchall()
+            for (uid,) in users:
+                # Format: 75 + 2 random digits + id
+                mid = f"75{random.randint(10, 99)}{uid}"
+                conn.execute(text(f"UPDATE {q('user')} SET member_id = :mid WHERE id = :uid"), {'mid': mid, 'uid': uid})
+
+            print("[SUCCESS] member_id column added and populated")
+
+        # [SRS Update] Add role column to User
+        if 'role' not in columns:
+            print("Adding role column to User...")
+            add_column(conn, 'user', 'role', "VARCHAR(20) DEFAULT 'customer'")
+            print("[SUCCESS] role column added")
+
+        # Check MenuItem table
+        menu_columns = columns_of(conn, 'menu_item')
+
+        if 'stock_quantity' not in menu_columns:
+            print("Adding stock_quantity to MenuItem...")
+            add_column(conn, 'menu_item', 'stock_quantity', 'INTEGER DEFAULT 0')
+            print("[SUCCESS] stock_quantity added")
+
+        if 'low_stock_threshold' not in menu_columns:
+            print("Adding low_stock_threshold to MenuItem...")
+            add_column(conn, 'menu_item', 'low_stock_threshold', 'INTEGER DEFAULT 5')
+            print("[SUCCESS] low_stock_threshold added")
+
+        # Rename 'order' to 'orders' if necessary
+        if not table_exists(conn, 'orders'):
+            if table_exists(conn, 'order'):
+                print("Renaming table 'order' to 'orders'...")
+                conn.execute(text(f"ALTER TABLE {q('order')} RENAME TO orders"))
+                print("[SUCCESS] Table renamed to 'orders'")
+            else:
+                # Neither exists? logic for creating new table belongs to db.create_all(), but we are migrating.
+                pass
+
+        # Check Orders table (now normalized to 'orders')
+        if table_exists(conn, 'orders'):
+            order_columns = columns_of(conn, 'orders')
+
+            if 'payment_status' not in order_columns:
+                print("Adding payment_status to orders...")
+                add_column(conn, 'orders', 'payment_status', "VARCHAR(20) DEFAULT 'pending'")
+                print("[SUCCESS] payment_status added")
+
+            if 'payment_method' not in order_columns:
+                print("Adding payment_method to orders...")
+                add_column(conn, 'orders', 'payment_method', 'VARCHAR(20)')
+                print("[SUCCESS] payment_method added")
+
+            if 'discount' not in order_columns:
+                print("Adding discount to orders...")
+                add_column(conn, 'orders', 'discount', 'FLOAT DEFAULT 0.0')
+                print("[SUCCESS] discount added")
+
+            if 'order_type' not in order_columns:
+                print("Adding order_type to orders...")
+                add_column(conn, 'orders', 'order_type', "VARCHAR(20) DEFAULT 'dine_in'")
+                print("[SUCCESS] order_type added")
+
+        # [SRS Update] Create Missing Tables
+        print("Checking for missing SRS tables...")
+
+        # StaffShift Table
+        if not table_exists(conn, 'staff_shift'):
+            print("Creating 'staff_shift' table...")
+            conn.execute(text(f"""
+                CREATE TABLE staff_shift (
+                    id INTEGER PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    shift_start TIMESTAMP NOT NULL,
+                    shift_end TIMESTAMP NOT NULL,
+                    FOREIGN KEY (user_id) REFERENCES {q('user')} (id)
+                )
+            """))
+            print("[SUCCESS] 'staff_shift' table created")
+
+        # ReportLog Table
+        if not table_exists(conn, 'report_log'):
+            print("Creating 'report_log' table...")
+            conn.execute(text("""
+                CREATE TABLE report_log (
+                    id INTEGER PRIMARY KEY,
+                    report_type VARCHAR(50) NOT NULL,
+                    generated_at TIMESTAMP,
+                    report_metadata TEXT
+                )
+            """))
+            print("[SUCCESS] 'report_log' table created")
         else:
-            # Neither exists? logic for creating new table belongs to db.create_all(), but we are migrating.
-            pass
-
-    # Check Orders table (now normalized to 'orders')
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='orders'")
-    orders_exists = cursor.fetchone()
-    
-    if orders_exists:
-        cursor.execute("PRAGMA table_info(orders)") 
-        order_columns = [col[1] for col in cursor.fetchall()]
-
-        if 'payment_status' not in order_columns:
-            print("Adding payment_status to orders...")
-            cursor.execute("ALTER TABLE orders ADD COLUMN payment_status VARCHAR(20) DEFAULT 'pending'")
-            print("[SUCCESS] payment_status added")
-        
-        if 'payment_method' not in order_columns:
-             print("Adding payment_method to orders...")
-             cursor.execute("ALTER TABLE orders ADD COLUMN payment_method VARCHAR(20)")
-             print("[SUCCESS] payment_method added")
-
-        if 'discount' not in order_columns:
-             print("Adding discount to orders...")
-             cursor.execute("ALTER TABLE orders ADD COLUMN discount FLOAT DEFAULT 0.0")
-             print("[SUCCESS] discount added")
-
-        if 'order_type' not in order_columns:
-             print("Adding order_type to orders...")
-             cursor.execute("ALTER TABLE orders ADD COLUMN order_type VARCHAR(20) DEFAULT 'dine_in'")
-             print("[SUCCESS] order_type added")
-
-    # [SRS Update] Create Missing Tables
-    print("Checking for missing SRS tables...")
-    
-
-    # StaffShift Table
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='staff_shift'")
-    if not cursor.fetchone():
-        print("Creating 'staff_shift' table...")
-        cursor.execute("""
-            CREATE TABLE staff_shift (
-                id INTEGER PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                shift_start DATETIME NOT NULL,
-                shift_end DATETIME NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES user (id)
-            )
-        """)
-        print("[SUCCESS] 'staff_shift' table created")
-
-    # ReportLog Table
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='report_log'")
-    if not cursor.fetchone():
-        print("Creating 'report_log' table...")
-        cursor.execute("""
-            CREATE TABLE report_log (
-                id INTEGER PRIMARY KEY,
-                report_type VARCHAR(50) NOT NULL,
-                generated_at DATETIME,
-                report_metadata TEXT
-            )
-        """)
-        print("[SUCCESS] 'report_log' table created")
-    else:
-        # Check if metadata column needs renaming (we used report_metadata in model)
-        cursor.execute("PRAGMA table_info(report_log)")
-        report_cols = [col[1] for col in cursor.fetchall()]
-        if 'metadata' in report_cols and 'report_metadata' not in report_cols:
-             print("Renaming 'metadata' to 'report_metadata' in report_log...")
-             # SQLite doesn't support RENAME COLUMN in older versions easily, but 3.25.0+ does
-             try:
-                 cursor.execute("ALTER TABLE report_log RENAME COLUMN metadata TO report_metadata")
-                 print("[SUCCESS] Column renamed")
-             except:
-                 print("[WARNING] Could not rename column, might be older SQLite version. Skipping.")
-
-    # Commit changes
-    conn.commit()
+            # Check if metadata column needs renaming (we used report_metadata in model)
+            report_cols = columns_of(conn, 'report_log')
+            if 'metadata' in report_cols and 'report_metadata' not in report_cols:
+                print("Renaming 'metadata' to 'report_metadata' in report_log...")
+                # SQLite supports RENAME COLUMN from 3.25.0
+                try:
+                    with conn.begin_nested():
+                        conn.execute(text("ALTER TABLE report_log RENAME COLUMN metadata TO report_metadata"))
+                    print("[SUCCESS] Column renamed")
+                except SQLAlchemyError:
+                    print("[WARNING] Could not rename column, might be older SQLite version. Skipping.")
+
+    # Changes are committed when the block exits
     print("\n[SUCCESS] Database migration completed successfully!")
     print("You can now run the application with: python app.py")
-    
-    # Close connection
-    conn.close()
-    
-except sqlite3.Error as e:
+
+except SQLAlchemyError as e:
     print(f"[ERROR] Database error: {e}")
     exit(1)
 except Exception as e:
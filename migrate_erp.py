@@ -6,7 +6,7 @@ This script creates the new ERP tables and migrates existing data
 from app import app, db
 from models.models import User, MenuItem, Order, SaleItem, Employee, Attendance
 from datetime import datetime, date
-import json
+from services.orders import backfill_sale_items
 
 def migrate_database():
     """Create new tables and migrate existing data"""
@@ -19,43 +19,7 @@ def migrate_database():
         
         # Migrate existing orders to create SaleItem records
         print("\nMigrating existing orders to SaleItem records...")
-        orders = Order.query.all()
-        migrated_count = 0
-        
-        for order in orders:
-            # Check if this order already has sale_items
-            existing_items = SaleItem.query.filter_by(order_id=order.id).first()
-            if existing_items:
-                continue  # Skip if already migrated
-            
-            try:
-                # Parse items from order
-                if order.items_parsed:
-                    items_data = order.items_parsed
-                elif order.items:
-                    items_data = json.loads(order.items)
-                else:
-                    continue
-                
-                # Create SaleItem for each item in the order
-                for item_name, quantity in items_data.items():
-                    # Find the menu item
-                    menu_item = MenuItem.query.filter_by(name=item_name).first()
-                    if menu_item:
-                        sale_item = SaleItem(
-                            order_id=order.id,
-                            menu_item_id=menu_item.id,
-                            quantity=quantity,
-                            price_at_sale=menu_item.price
-                        )
-                        db.session.add(sale_item)
-                        migrated_count += 1
-                
-            except Exception as e:
-                print(f"  Warning: Could not migrate order {order.id}: {str(e)}")
-                continue
-        
-        db.session.commit()
+        orders_converted, migrated_count, orders_skipped = backfill_sale_items()
         print(f"[OK] Migrated {migrated_count} order items to SaleItem records")
         
         # Create sample employee records for existing staff
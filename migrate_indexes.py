@@ -0,0 +1,114 @@
+"""
+Index Migration
+Creates the secondary indexes declared on the models (orders, reservations,
+staff shifts, employee requests, attendance) on an existing database and
+then checks the query plan of every hot dashboard / poll query: each must
+be answered from an index, not a full table scan. Run it after the other
+migrations. Safe to re-run; existing indexes are left alone.
+
+Usage: python migrate_indexes.py           (create indexes, then check plans)
+       python migrate_indexes.py --check   (only check plans; exits 1 on a full scan)
+"""
+import sys
+from datetime import timedelta
+from sqlalchemy import select, func
+from app import app
+from models.models import db, Order, Reservation, DailySalesRollup, StaffShift, EmployeeRequest, Attendance, get_business_date
+
+INDEXED_MODELS = [Order, Reservation, StaffShift, EmployeeRequest, Attendance]
+
+def hot_queries():
+    """(name, statement) for the queries behind the staff, dashboard and analytics screens."""
+    today = get_business_date()  # the restaurant's day, as the screens use it
+    since = today - timedelta(days=30)
+    active = ['Confirmed', 'Preparing']
+    return [
+        # routes/staff.py
+        ("kitchen queue", select(Order).where(Order.status.in_(active)).order_by(Order.created_at.asc())),
+        ("waiter ready orders", select(Order).where(Order.order_type == 'dine_in', Order.status == 'Ready')),
+        ("waiter open dine-in orders", select(Order).where(Order.order_type == 'dine_in', Order.status != 'Delivered')),
+        ("upcoming reservations", select(Reservation).where(Reservation.date >= today.isoformat())
+            .order_by(Reservation.date.asc(), Reservation.time.asc())),
+        ("chef badge count", select(func.count()).select_from(Order).where(Order.status == 'Confirmed')),
+        ("waiter badge reservations", select(func.count()).select_from(Reservation)
+            .where(Reservation.date >= today.isoformat(), Reservation.status == 'Confirmed')),
+        # routes/main.py
+        ("pending orders count", select(func.count()).select_from(Order).where(Order.status.in_(['Placed', 'Pending', 'Paid']))),
+        ("pending reservations count", select(func.count()).select_from(Reservation).where(Reservation.status == 'Pending')),
+        ("pending employee requests", select(func.count()).select_from(EmployeeRequest).where(EmployeeRequest.status == 'pending')),
+        ("absent today", select(func.count()).select_from(Attendance)
+            .where(Attendance.date == today, Attendance.status.in_(['absent', 'leave', 'on_leave']))),
+        # routes/analytics.py, services/reporting.py
+        ("sales report", select(Order).where(Order.business_date >= since)
+            .order_by(Order.business_date.desc(), Order.created_at.desc())),
+        ("sales report top items", select(DailySalesRollup.menu_item_id, func.sum(DailySalesRollup.quantity))
+            .where(DailySalesRollup.sales_date >= since).group_by(DailySalesRollup.menu_item_id)),
+        ("csv export", select(Order.unique_order_number, Order.total).where(Order.business_date >= since)
+            .order_by(Order.business_date.asc(), Order.created_at.asc())),
+        ("daily report orders", select(Order.unique_order_number).where(Order.business_date == today)),
+        # customer history, staff shifts, request lists
+        ("my orders", select(Order).where(Order.user_id == 1).order_by(Order.created_at.desc())),
+        ("my reservations", select(Reservation).where(Reservation.user_id == 1).order_by(Reservation.created_at.desc())),
+        ("shift list", select(StaffShift).order_by(StaffShift.shift_start.desc())),
+        ("requests by requester", select(EmployeeRequest)
+            .where(EmployeeRequest.requested_by_id == 1, EmployeeRequest.status == 'pending')),
+    ]
+
+def full_scans(conn, statement):
+    """Plan lines of `statement` that read a whole table without an index."""
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={'render_postcompile': True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    # SQLite reports "SCAN <table>" for a full scan; index walks read
+    # "SCAN <table> USING [COVERING] INDEX ..." and lookups "SEARCH ...".
+    return [row[-1] for row in plan if row[-1].startswith('SCAN ') and ' USING ' not in row[-1]]
+
+def check_query_plans():
+    if db.engine.dialect.name != 'sqlite':
+        print("[SKIP] Query plan check reads SQLite's EXPLAIN QUERY PLAN output")
+        return 0
+    failures = 0
+    with db.engine.connect() as conn:
+        for name, statement in hot_queries():
+            try:
+                scans = full_scans(conn, statement)
+            except Exception as e:
+                failures += 1
+                print(f"[ERROR] {name}: {getattr(e, 'orig', e)}")
+                continue
+            if scans:
+                failures += 1
+                print(f"[FAIL] {name}: {'; '.join(scans)}")
+            else:
+                print(f"[OK] {name}")
+    return failures
+
+def migrate():
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            for model in INDEXED_MODELS:
+                existing = {c['name'] for c in inspector.get_columns(model.__tablename__)}
+                for index in model.__table__.indexes:
+                    missing = [c.name for c in index.columns if c.name not in existing]
+                    if missing:
+                        # e.g. reservation.start_at comes from migrate_reservations.py
+                        print(f"[SKIP] {index.name}: column(s) {', '.join(missing)} not migrated yet")
+                        continue
+                    index.create(db.engine, checkfirst=True)
+            print("[OK] Indexes verified")
+            # Pooled connections may still hold the schema from before the
+            # new indexes, and EXPLAIN would plan against it
+            db.engine.dispose()
+        except Exception as e:
+            print(f"[ERROR] Migration failed: {e}")
+            return 1
+        return check_query_plans()
+
+if __name__ == "__main__":
+    if '--check' in sys.argv:
+        with app.app_context():
+            failures = check_query_plans()
+    else:
+        failures = migrate()
+    sys.exit(1 if failures else 0)
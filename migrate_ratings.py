@@ -0,0 +1,32 @@
+"""
+Rating Aggregates Migration
+Adds rating_count / rating_sum / rating_avg to menu_item, indexes rating_avg
+and fills the columns from the existing Rating rows.
+Safe to re-run; it also repairs aggregates that drifted.
+
+Usage: python migrate_ratings.py
+"""
+import logging
+from app import app
+from models.models import db, MenuItem
+from services.ratings import add_rating_columns, rebuild_rating_aggregates
+
+def migrate():
+    with app.app_context():
+        try:
+            for name in add_rating_columns():
+                print(f"[SUCCESS] {name} column added")
+
+            for index in MenuItem.__table__.indexes:
+                index.create(db.engine, checkfirst=True)
+            print("[OK] Top-rated index verified")
+
+            rated = rebuild_rating_aggregates()
+            print(f"[OK] Rating aggregates rebuilt for {rated} menu items")
+        except Exception as e:
+            db.session.rollback()
+            print(f"[ERROR] Migration failed: {e}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate()
@@ -0,0 +1,91 @@
+"""
+Reservation Window Migration
+Adds typed start_at / end_at columns to reservation, fills them from the
+legacy date / time / duration strings and creates the (table_no, start_at)
+index used by the availability checks.
+Active reservations whose table_no is not one of services.reservations.TABLES
+(e.g. "Any" from before tables were assigned, or "5") are moved to a real
+table, otherwise the overlap checks would never see them.
+Safe to re-run; rows that already have a window or a known table are left alone.
+
+Usage: python migrate_reservations.py
+"""
+import logging
+import re
+from app import app
+from models.models import db, Reservation
+from services.reservations import TABLES, INACTIVE_STATUSES, set_booking_window, find_free_table, tables_for
+
+COLUMNS = [
+    ('start_at', 'TIMESTAMP'),
+    ('end_at', 'TIMESTAMP'),
+]
+
+def known_table(table_no):
+    """The TABLES key a legacy label like "5", "t5" or "Table 5" names, or None."""
+    number = re.sub(r'^(TABLE|T)\s*', '', (table_no or '').strip().upper())
+    key = f"T{int(number)}" if number.isdigit() else None
+    return key if key in TABLES else None
+
+def assign_legacy_tables():
+    """Give every active reservation on an unknown table a real one.
+
+    A label that names a table keeps it. Otherwise the smallest table that
+    is free for the booking's window is used; when none is free the booking
+    was already double-booked, and the smallest table that seats the party
+    is used (the largest table for a bigger party) so that it at least
+    blocks one. Returns (moved, double-booked).
+    """
+    moved, clashes = 0, 0
+    legacy = Reservation.query.filter(
+        Reservation.table_no.notin_(list(TABLES)),
+        Reservation.start_at.isnot(None),
+        Reservation.status.notin_(INACTIVE_STATUSES)
+    ).order_by(Reservation.start_at, Reservation.id).all()
+    for r in legacy:
+        table_no = known_table(r.table_no) or find_free_table(r.start_at, r.end_at, r.guests or 1)
+        if not table_no:
+            table_no = (tables_for(r.guests or 1) or [max(TABLES, key=TABLES.get)])[0]
+            print(f"[WARN] Reservation {r.id} ({r.table_no!r}, {r.start_at}) overlaps on every table; "
+                  f"assigned {table_no}, please review")
+            clashes += 1
+        r.table_no = table_no
+        db.session.flush()  # the next find_free_table sees this booking
+        moved += 1
+    return moved, clashes
+
+def migrate():
+    with app.app_context():
+        try:
+            existing = {c['name'] for c in db.inspect(db.engine).get_columns('reservation')}
+            with db.engine.begin() as conn:
+                for name, ddl in COLUMNS:
+                    if name not in existing:
+                        conn.execute(db.text(f"ALTER TABLE reservation ADD COLUMN {name} {ddl}"))
+                        print(f"[SUCCESS] {name} column added")
+
+            for index in Reservation.__table__.indexes:
+                index.create(db.engine, checkfirst=True)
+            print("[OK] Table/start index verified")
+
+            filled, skipped = 0, 0
+            for r in Reservation.query.filter(Reservation.start_at.is_(None)).all():
+                try:
+                    set_booking_window(r)
+                    filled += 1
+                except (TypeError, ValueError):
+                    print(f"[WARN] Reservation {r.id} has an unreadable date/time: {r.date} {r.time}")
+                    skipped += 1
+            db.session.commit()
+            print(f"[OK] Booking windows filled for {filled} reservations ({skipped} skipped)")
+
+            moved, clashes = assign_legacy_tables()
+            db.session.commit()
+            print(f"[OK] {moved} reservations moved to a known table ({clashes} double-booked)")
+        except Exception as e:
+            db.session.rollback()
+            print(f"[ERROR] Migration failed: {e}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate()
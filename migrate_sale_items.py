@@ -0,0 +1,44 @@
+"""
+Backfill Script for SaleItem
+Converts historical orders (JSON in Order.items) into normalized SaleItem rows.
+Runs in batches and commits after each one, so it is safe to interrupt and re-run.
+
+Usage: python migrate_sale_items.py [batch_size] [start_after_order_id]
+"""
+import sys
+import logging
+from app import app
+from models.models import db, SaleItem
+from services.orders import backfill_sale_items
+from services.rollup import rebuild_daily_sales_rollup
+
+def migrate(batch_size=200, start_after=0):
+    with app.app_context():
+        try:
+            db.create_all()
+
+            # Indexes used by the SaleItem GROUP BY aggregations
+            for index in SaleItem.__table__.indexes:
+                index.create(db.engine, checkfirst=True)
+            print("[OK] SaleItem table and indexes verified")
+
+            print(f"Backfilling sale items (batch size {batch_size}, after order id {start_after})...")
+            converted, created, skipped = backfill_sale_items(batch_size=batch_size, start_after=start_after)
+
+            print(f"[OK] Converted {converted} orders into {created} SaleItem rows")
+            if skipped:
+                print(f"[WARNING] {skipped} orders had no matching menu items and were skipped")
+
+            # Per-item rollup rows are derived from SaleItem, so refresh them
+            rows = rebuild_daily_sales_rollup()
+            print(f"[OK] Daily sales rollup rebuilt ({rows} rows)")
+        except Exception as e:
+            db.session.rollback()
+            print(f"[ERROR] Backfill stopped: {e}")
+            print("Re-run the script to resume; already converted orders are skipped.")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    start_after = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    migrate(batch_size, start_after)
@@ -0,0 +1,23 @@
+"""
+Rebuild Script for DailySalesRollup
+Recomputes the pre-aggregated daily sales table from orders and sale items.
+Safe to run at any time to repair drift; the table is replaced in one transaction.
+
+Usage: python migrate_sales_rollup.py
+"""
+from app import app
+from models.models import db
+from services.rollup import rebuild_daily_sales_rollup
+
+def migrate():
+    with app.app_context():
+        try:
+            db.create_all()
+            print("Rebuilding daily sales rollup...")
+            rows = rebuild_daily_sales_rollup()
+            print(f"[OK] Daily sales rollup rebuilt ({rows} rows)")
+        except Exception as e:
+            print(f"[ERROR] Rebuild failed: {e}")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,107 @@
+"""
+Mock bKash Gateway
+A tiny local stand-in for the bKash checkout API, for trying the payment
+flow and the client's timeouts / circuit breaker without the sandbox.
+
+Implements /token/grant, /token/refresh and /checkout/payment/create,
+execute/<id> and query/<id>. Created payments redirect straight back to
+the callbackURL with status=success. GET /stats returns call counts.
+
+Usage: python mock_bkash_gateway.py [--port 9090] [--latency 0.0] [--fail-rate 0.0] [--token-ttl 3600]
+Then start the app with BKASH_BASE_URL=http://127.0.0.1:9090
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlencode
+import argparse
+import random
+import json
+import time
+import uuid
+
+OPTIONS = {'latency': 0.0, 'fail_rate': 0.0, 'token_ttl': 3600}
+PAYMENTS = {}
+TOKENS = set()
+CALLS = {}
+
+class MockGateway(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real gateway
+    disable_nagle_algorithm = True
+
+    def _reply(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except BrokenPipeError:
+            pass  # the client gave up (timeout), which is what latency tests expect
+
+    def _token(self):
+        token = uuid.uuid4().hex
+        TOKENS.add(token)
+        return {'id_token': token, 'refresh_token': uuid.uuid4().hex,
+                'expires_in': OPTIONS['token_ttl'], 'token_type': 'Bearer'}
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        path = self.path
+        endpoint = '/'.join(path.split('/')[:4])
+        CALLS[endpoint] = CALLS.get(endpoint, 0) + 1
+
+        if OPTIONS['latency']:
+            time.sleep(OPTIONS['latency'])
+        if random.random() < OPTIONS['fail_rate']:
+            return self._reply(503, {'errorMessage': 'Service unavailable (injected)'})
+
+        if path in ('/token/grant', '/token/refresh'):
+            return self._reply(200, self._token())
+
+        if self.headers.get('authorization') not in TOKENS:
+            return self._reply(200, {'statusCode': '2079', 'statusMessage': 'Invalid App Token'})
+
+        if path == '/checkout/payment/create':
+            payment_id = 'TR' + uuid.uuid4().hex[:16].upper()
+            PAYMENTS[payment_id] = {'paymentID': payment_id, 'amount': body.get('amount'),
+                                    'merchantInvoiceNumber': body.get('merchantInvoiceNumber'),
+                                    'transactionStatus': 'Initiated'}
+            callback = body.get('callbackURL', 'http://127.0.0.1:5000/orders/bkash/callback')
+            return self._reply(200, dict(PAYMENTS[payment_id], bkashURL=f"{callback}?{urlencode({'paymentID': payment_id, 'status': 'success'})}"))
+
+        payment_id = path.rsplit('/', 1)[-1]
+        payment = PAYMENTS.get(payment_id)
+        if payment is None:
+            return self._reply(200, {'errorCode': '2056', 'errorMessage': 'Invalid Payment State'})
+
+        if path.startswith('/checkout/payment/execute/'):
+            if payment['transactionStatus'] == 'Completed':
+                return self._reply(200, {'errorCode': '2062', 'errorMessage': 'The payment has already been completed'})
+            payment.update(transactionStatus='Completed', trxID=uuid.uuid4().hex[:10].upper())
+            return self._reply(200, payment)
+
+        if path.startswith('/checkout/payment/query/'):
+            return self._reply(200, payment)
+
+        self._reply(404, {'errorMessage': 'Not found'})
+
+    def do_GET(self):
+        # Call counts per endpoint, to see what the client actually sent
+        if self.path == '/stats':
+            return self._reply(200, CALLS)
+        self._reply(404, {'errorMessage': 'Not found'})
+
+    def log_message(self, format, *args):
+        print(f"[mock-bkash] {self.command} {self.path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=9090)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of requests answered with HTTP 503')
+    parser.add_argument('--token-ttl', type=int, default=3600, help='expires_in of granted tokens')
+    args = parser.parse_args()
+    OPTIONS.update(latency=args.latency, fail_rate=args.fail_rate, token_ttl=args.token_ttl)
+    print(f"[mock-bkash] Listening on http://127.0.0.1:{args.port} (latency {args.latency}s, fail rate {args.fail_rate})")
+    ThreadingHTTPServer(('127.0.0.1', args.port), MockGateway).serve_forever()
@@ -4,6 +4,22 @@ import pytz
 
 def get_dhaka_time():
     return datetime.now(pytz.timezone('Asia/Dhaka'))
+
+def get_business_date(value=None):
+    """The restaurant's (Asia/Dhaka) calendar date of `value`, default now.
+
+    Naive datetimes are taken as Dhaka wall-clock time, which is how
+    get_dhaka_time() timestamps come back from the database.
+    """
+    if value is None:
+        value = get_dhaka_time()
+    elif value.tzinfo is not None:
+        value = value.astimezone(pytz.timezone('Asia/Dhaka'))
+    return value.date()
+
+def business_date_default(context):
+    """Column default deriving business_date from the row's created_at."""
+    return get_business_date(context.get_current_parameters().get('created_at'))
 import uuid
 from extensions import db
 
@@ -52,13 +68,22 @@ class MenuItem(db.Model):
     # Inventory fields
     stock_quantity = db.Column(db.Integer, default=0)
     low_stock_threshold = db.Column(db.Integer, default=5)
+    # Rating aggregates, maintained by services.ratings.add_rating
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_avg = db.Column(db.Float, nullable=False, default=0.0)
     # Relationships
     ratings = db.relationship('Rating', backref='menu_item', lazy=True, cascade="all, delete-orphan")
 
+    # Matches the ORDER BY of services.ratings.top_rated_items
+    __table_args__ = (
+        db.Index('ix_menu_item_top_rated', rating_avg.desc(), id),
+    )
+
     def get_average_rating(self):
-        if not self.ratings:
+        if not self.rating_count:
             return 0
-        return round(sum(r.score for r in self.ratings) / len(self.ratings), 1)
+        return round(self.rating_avg, 1)
 
 class Order(db.Model):
     __tablename__ = 'orders'
@@ -77,8 +102,34 @@ class Order(db.Model):
     address_city = db.Column(db.String(100), nullable=False)
     address_street = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=get_dhaka_time)
+    # Dhaka calendar day of created_at; day-based reports filter on this
+    business_date = db.Column(db.Date, default=business_date_default)
     items_parsed = db.Column(db.PickleType)
 
+    # Kitchen/admin queues (status filter, oldest first), waiter queue
+    # (order_type + status), date-range reports and per-customer history
+    __table_args__ = (
+        db.Index('ix_orders_status_created_at', status, created_at),
+        db.Index('ix_orders_type_status', order_type, status),
+        db.Index('ix_orders_created_at', created_at),
+        db.Index('ix_orders_user_created_at', user_id, created_at),
+        db.Index('ix_orders_business_date_created_at', business_date, created_at),
+    )
+
+class BkashPayment(db.Model):
+    """A bKash payment id claimed by the callback, before the payment is executed.
+
+    The primary key makes the claim atomic: a replayed or concurrent
+    callback for the same payment fails to insert and places no order.
+    order_id stays empty until the order exists (and for a payment whose
+    order could not be placed, which then needs a refund).
+    """
+    __tablename__ = 'bkash_payment'
+    payment_id = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=get_dhaka_time)
+
 class Reservation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     unique_reservation_number = db.Column(db.String(12), unique=True, nullable=False, default=lambda: str(uuid.uuid4().hex[:12]).upper())
@@ -90,6 +141,18 @@ class Reservation(db.Model):
     table_no = db.Column(db.String(50), nullable=False)
     status = db.Column(db.String(20), default="Pending")
     created_at = db.Column(db.DateTime, default=get_dhaka_time)
+    # Typed booking window derived from date/time/duration, for overlap checks
+    start_at = db.Column(db.DateTime, nullable=True)
+    end_at = db.Column(db.DateTime, nullable=True)
+
+    # Serves services.reservations.busy_tables: table equality + start range
+    # Upcoming list (date, time order), status counts, per-customer history
+    __table_args__ = (
+        db.Index('ix_reservation_table_start', table_no, start_at),
+        db.Index('ix_reservation_date_time', date, time),
+        db.Index('ix_reservation_status_date', status, date),
+        db.Index('ix_reservation_user_created_at', user_id, created_at),
+    )
 
 class Rating(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -105,6 +168,11 @@ class StaffShift(db.Model):
     shift_start = db.Column(db.DateTime, nullable=False)
     shift_end = db.Column(db.DateTime, nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_staff_shift_start', shift_start),
+        db.Index('ix_staff_shift_user_start', user_id, shift_start),
+    )
+
 
 class ReportLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -119,16 +187,22 @@ class SaleItem(db.Model):
     """Track individual items within orders for detailed analytics"""
     __tablename__ = 'sale_item'
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
-    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
+    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     price_at_sale = db.Column(db.Float, nullable=False)  # Price at time of sale
     created_at = db.Column(db.DateTime, default=get_dhaka_time)
+    business_date = db.Column(db.Date, default=business_date_default)  # same day as the order's
     
     # Relationships
     order = db.relationship('Order', backref=db.backref('sale_items', lazy=True, cascade='all, delete-orphan'))
     menu_item = db.relationship('MenuItem', backref=db.backref('sale_items', lazy=True))
 
+    # Per-item sales over a range of days without joining orders
+    __table_args__ = (
+        db.Index('ix_sale_item_business_date_item', business_date, menu_item_id),
+    )
+
 
 class Employee(db.Model):
     """Employee management with HR data"""
@@ -172,6 +246,12 @@ class EmployeeRequest(db.Model):
     user = db.relationship('User', foreign_keys=[user_id], backref=db.backref('received_requests', lazy=True))
     requested_by = db.relationship('User', foreign_keys=[requested_by_id], backref=db.backref('made_requests', lazy=True))
 
+    # Pending-request counts and lists, optionally per requester; newest first
+    __table_args__ = (
+        db.Index('ix_employee_request_status_requester', status, requested_by_id),
+        db.Index('ix_employee_request_created_at', created_at),
+    )
+
 
 class Attendance(db.Model):
     """Employee attendance tracking"""
@@ -183,6 +263,109 @@ class Attendance(db.Model):
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=get_dhaka_time)
     
-    # Unique constraint to prevent duplicate attendance for same day
-    __table_args__ = (db.UniqueConstraint('employee_id', 'date', name='_employee_date_uc'),)
+    # Unique constraint to prevent duplicate attendance for same day;
+    # (date, status) serves the "absent/on leave today" count
+    __table_args__ = (
+        db.UniqueConstraint('employee_id', 'date', name='_employee_date_uc'),
+        db.Index('ix_attendance_date_status', 'date', 'status'),
+    )
+
+
+
+class DailySalesRollup(db.Model):
+    """Pre-aggregated sales per day x payment method x order type x menu item.
+
+    Rows with menu_item_id = 0 hold order-level totals (order count and
+    Order.total); other rows hold per-item quantity and line revenue.
+    Maintained incrementally by services.rollup.
+    """
+    __tablename__ = 'daily_sales_rollup'
+    id = db.Column(db.Integer, primary_key=True)
+    sales_date = db.Column(db.Date, nullable=False)
+    payment_method = db.Column(db.String(20), nullable=False, default='')  # '' when not set
+    order_type = db.Column(db.String(20), nullable=False, default='')
+    menu_item_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = order totals
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.UniqueConstraint('sales_date', 'payment_method', 'order_type', 'menu_item_id', name='_daily_sales_rollup_uc'),
+    )
+
 
+class ChangeFeed(db.Model):
+    """Append-only log of order and reservation writes.
+
+    The autoincrement id is the feed version: live boards poll with
+    ?since=<version> and only reload rows whose ids appear after it.
+    Written by the mapper listeners in services.changefeed.
+    """
+    __tablename__ = 'change_feed'
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # 'order' or 'reservation'
+    entity_id = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_change_feed_entity_version', 'entity', 'id'),
+    )
+
+
+class ChangeFeedClock(db.Model):
+    """Single row that every transaction appending to change_feed updates first.
+
+    The row lock is held until commit, so feed ids are handed out and
+    committed in the same order and max(ChangeFeed.id) never passes a row
+    that is still uncommitted (see services.changefeed).
+    """
+    __tablename__ = 'change_feed_clock'
+    id = db.Column(db.Integer, primary_key=True)
+    writes = db.Column(db.Integer, nullable=False, default=0)
+
+
+class BookingLock(db.Model):
+    """Single row that every booking updates before it checks for overlaps.
+
+    The row lock is held until commit, so two bookings can never both see
+    the same table as free (see services.reservations.book_table).
+    """
+    __tablename__ = 'booking_lock'
+    id = db.Column(db.Integer, primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+
+
+class EmailJob(db.Model):
+    """Outgoing email waiting for, or done with, the background sender.
+
+    Request handlers only insert rows (services.email.send_email); the
+    worker in services.email_queue claims due rows, sends them over one
+    SMTP connection per batch and retries failures with backoff until
+    they are sent or marked dead.
+    """
+    __tablename__ = 'email_job'
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(200), nullable=False)
+    subject = db.Column(db.String(300), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, sending, sent, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # next attempt
+    locked_at = db.Column(db.DateTime)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_email_job_status_run_at', 'status', 'run_at'),
+    )
+
+
+class ReplicaHeartbeat(db.Model):
+    """Single row stamped on the primary by services.replica.
+
+    Read back on the replica, utcnow() - beat_at is how far the replica
+    lags; reporting reads fall back to the primary past REPLICA_MAX_LAG.
+    """
+    __tablename__ = 'replica_heartbeat'
+    id = db.Column(db.Integer, primary_key=True)
+    beat_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,26 @@
+"""
+Replica Sync
+Stamps the replica heartbeat on the primary database and, when the replica
+is a SQLite file, copies the primary into it with the SQLite backup API.
+Reporting screens read from the replica while the heartbeat they see there
+is at most REPLICA_MAX_LAG seconds old.
+
+It takes the same lock on instance/replica_sync.lock as the web workers'
+sync threads, so only one process syncs at a time.
+
+Run it next to the web app when REPLICA_SYNC=external:
+Usage: python replica_sync.py          (syncs every REPLICA_SYNC_INTERVAL seconds)
+       python replica_sync.py --once   (syncs once and exits)
+"""
+import sys
+import logging
+from app import app
+from services.replica import REPLICA_BIND, run_replica_sync
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if REPLICA_BIND not in app.config['SQLALCHEMY_BINDS']:
+        print("[ERROR] REPLICA_DATABASE_URL is not set")
+        exit(1)
+    print("[Replica] Sync started")
+    run_replica_sync(app, once='--once' in sys.argv)
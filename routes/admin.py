@@ -1,12 +1,23 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app, jsonify, send_from_directory
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app, jsonify, send_from_directory, send_file
 from werkzeug.utils import secure_filename
 from services.auth import role_required
 from services.email import send_email, format_order_body
+from services.email_queue import queue_stats, retry_job
+from services.invoices import export_invoices_zip, MAX_EXPORT_ORDERS
+from services.orders import best_selling_items, set_order_status
+from services.rollup import retract_order
+from services.reporting import get_sales_summary
+from services.pagination import keyset_paginate, apply_list_filters, list_filter_args
+from services.changefeed import ENTITY_ORDER, current_version, feed_delta
+from services.events import publish_event
+from services.identity import invalidate_identity
+from services.cache_tags import invalidate_tags, item_tag, TAG_MENU
 from extensions import db, cache
-from models.models import User, MenuItem, Order, Reservation, StaffShift, Rating, ReportLog, Employee, EmployeeRequest, Attendance
+from models.models import User, MenuItem, Order, Reservation, StaffShift, Rating, ReportLog, Employee, EmployeeRequest, Attendance, EmailJob
 import os
 import json
 from datetime import datetime
+from sqlalchemy.orm import joinedload
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -17,9 +28,13 @@ def allowed_file(filename):
 @role_required('admin')
 def index():
     items = MenuItem.query.order_by(MenuItem.id.desc()).all()
-    # orders = Order.query.order_by(Order.created_at.desc()).all() # Optimization: limit or paginate in future
-    orders = Order.query.order_by(Order.created_at.desc()).all()
-    reservations = Reservation.query.order_by(Reservation.created_at.desc()).all()
+    # Only the newest rows are shown on the dashboard; totals come from COUNT
+    orders = keyset_paginate(Order.query.options(joinedload(Order.user)),
+                             [(Order.created_at, True), (Order.id, True)], limit=8).items
+    reservations = keyset_paginate(Reservation.query.options(joinedload(Reservation.user)),
+                                   [(Reservation.created_at, True), (Reservation.id, True)], limit=8).items
+    orders_count = Order.query.count()
+    reservations_count = Reservation.query.count()
 
     # Parse JSON items
     for o in orders:
@@ -28,7 +43,7 @@ def index():
         except:
             o.items_parsed = []
 
-    total_sales = db.session.query(db.func.sum(Order.total)).scalar() or 0
+    total_sales = get_sales_summary()['revenue']
     
     # --- Live Operations Widget Logic ---
     from datetime import date
@@ -66,6 +81,8 @@ def index():
                            items=items, 
                            orders=orders, 
                            reservations=reservations, 
+                           orders_count=orders_count,
+                           reservations_count=reservations_count,
                            total_sales=total_sales,
                            active_staff_count=active_staff_count,
                            active_staff_list=active_staff_list,
@@ -107,7 +124,7 @@ def add_menu():
             low_stock_threshold=low_stock_threshold
         )
         db.session.add(mi); db.session.commit()
-        cache.clear() # Clear cache so users see new item immediately
+        invalidate_tags(TAG_MENU, item_tag(mi.id))  # users see the new item immediately
         flash('Menu item added.', 'success')
         return redirect(url_for('admin.index'))
     return render_template('admin/add_menu.html')
@@ -134,7 +151,7 @@ def edit_menu(item_id):
             mi.image = filename
 
         db.session.commit()
-        cache.clear() # Clear cache so update appears immediately
+        invalidate_tags(TAG_MENU, item_tag(mi.id))  # update appears immediately
         flash('Menu item updated.', 'success')
         return redirect(url_for('admin.index'))
     return render_template('admin/edit_menu.html', item=mi)
@@ -151,7 +168,7 @@ def delete_menu(item_id):
         except:
             pass
     db.session.delete(mi); db.session.commit()
-    cache.clear() # Clear cache
+    invalidate_tags(TAG_MENU, item_tag(item_id))
     flash('Menu item deleted.', 'success')
     return redirect(url_for('admin.index'))
 
@@ -161,25 +178,15 @@ def delete_menu(item_id):
 @admin_bp.route('/sales')
 @role_required('admin')
 def sales_report():
-    orders = Order.query.all()
-    total_sales = db.session.query(db.func.sum(Order.total)).scalar() or 0
+    total_sales = get_sales_summary()['revenue']
     
-    # Calculate popular dishes
-    dish_counts = {}
-    for o in orders:
-        try:
-            items = json.loads(o.items)
-            for item in items:
-                name = item.get('name')
-                qty = item.get('qty', 0)
-                if name:
-                    dish_counts[name] = dish_counts.get(name, 0) + qty
-        except:
-            continue
-            
+    # Calculate popular dishes (aggregated from SaleItem in SQL)
+    dish_counts = best_selling_items()
+    items_by_name = {mi.name: mi for mi in MenuItem.query.all()}
+
     popular = []
-    for k, v in dish_counts.items():
-        item = MenuItem.query.filter_by(name=k).first()
+    for k, v in dish_counts:
+        item = items_by_name.get(k)
         avg = item.get_average_rating() if item else 0
         popular.append({
             'name': k, 
@@ -191,14 +198,49 @@ def sales_report():
     
     return render_template('admin/sales.html', total_sales=total_sales, popular=popular)
 
+@admin_bp.route('/email-queue')
+@role_required('admin')
+def email_queue():
+    stats = queue_stats()
+    problem_jobs = EmailJob.query.filter(db.or_(EmailJob.status == 'dead', EmailJob.last_error.isnot(None)),
+                                         EmailJob.status != 'sent')\
+        .order_by(EmailJob.id.desc()).limit(50).all()
+    if request.args.get('format') == 'json':
+        return jsonify(stats)
+    return render_template('admin/email_queue.html', stats=stats, jobs=problem_jobs)
+
+@admin_bp.route('/email-queue/retry/<int:job_id>', methods=['POST'])
+@role_required('admin')
+def retry_email(job_id):
+    if retry_job(job_id):
+        flash('Email re-queued.', 'success')
+    else:
+        flash('Email job not found or already sent.', 'warning')
+    return redirect(url_for('admin.email_queue'))
+
+@admin_bp.route('/cache/stats')
+@role_required('admin')
+def cache_stats():
+    # Counters are per worker process and reset on restart
+    backend = cache.cache
+    if not hasattr(backend, 'stats'):
+        return jsonify({'backend': type(backend).__name__})
+    return jsonify(backend.stats())
+
 # -------------------------
 # User Management
 # -------------------------
 @admin_bp.route('/users')
 @role_required('admin')
 def users():
-    users = User.query.order_by(User.id.desc()).all()
-    return render_template('admin/users.html', users=users)
+    query = User.query
+    role = request.args.get('role', '').strip()
+    if role:
+        query = query.filter(User.role == role)
+    page = keyset_paginate(query, [(User.id, True)],
+                           after=request.args.get('after'), limit=request.args.get('limit', type=int))
+    return render_template('admin/users.html', users=page.items, next_cursor=page.next_cursor,
+                           users_count=query.count(), filters=list_filter_args(request.args))
 
 
 @admin_bp.route('/admins')
@@ -219,18 +261,30 @@ def admins():
 @admin_bp.route('/orders')
 @role_required('admin')
 def orders():
-    orders = Order.query.order_by(Order.created_at.desc()).all()
-    for o in orders:
+    page = _orders_page()
+    for o in page.items:
         try:
             o.items_parsed = json.loads(o.items)
         except:
             o.items_parsed = []
-    return render_template('admin/orders.html', orders=orders)
+    return render_template('admin/orders.html', orders=page.items, next_cursor=page.next_cursor,
+                           filters=list_filter_args(request.args))
 
 @admin_bp.route('/orders/data')
 @role_required('admin')
 def orders_data():
-    orders = Order.query.order_by(Order.created_at.desc()).all()
+    # ?since=<version> returns only orders written after that version
+    version = current_version()
+    since = request.args.get('since', type=int)
+    delta = None
+    if since is not None and not request.args.get('after'):
+        delta = feed_delta(ENTITY_ORDER, Order, _orders_query(), since, version)
+    if delta:
+        orders, removed, next_cursor = delta[0], delta[1], None
+    else:
+        page = _orders_page()
+        orders, removed, next_cursor = page.items, [], page.next_cursor
+
     orders_json = []
     for o in orders:
         try:
@@ -245,9 +299,45 @@ def orders_data():
             'customer': o.user.full_name if o.user else 'Guest',
             'username': o.user.username if o.user else 'guest',
             'created_at': o.created_at.strftime('%Y-%m-%d %H:%M'),
+            'sort_key': o.created_at.isoformat(),
             'items': items
         })
-    return jsonify({'orders': orders_json})
+    return jsonify({
+        'orders': orders_json,
+        'removed': removed,
+        'next_cursor': next_cursor,
+        'version': version,
+        'full': delta is None
+    })
+
+def _orders_query():
+    """Orders for the admin list, honouring ?status/date/customer."""
+    return apply_list_filters(Order.query.options(joinedload(Order.user)), request.args,
+                              status_column=Order.status, date_column=Order.created_at, user_column=Order.user_id)
+
+@admin_bp.route('/orders/invoices.zip')
+@role_required('admin')
+def export_invoices():
+    """Zip of the invoices of all orders matching the list filters (usually a date range)."""
+    query = _orders_query()
+    total = query.count()
+    if not total:
+        flash('No orders match these filters.', 'warning')
+        return redirect(url_for('admin.orders', **list_filter_args(request.args)))
+    if total > MAX_EXPORT_ORDERS:
+        flash(f'{total} orders match; narrow the date range to at most {MAX_EXPORT_ORDERS}.', 'warning')
+        return redirect(url_for('admin.orders', **list_filter_args(request.args)))
+
+    orders = query.order_by(Order.created_at.asc(), Order.id.asc()).all()
+    archive = export_invoices_zip(orders)
+    label = '_'.join(v for v in (request.args.get('date_from'), request.args.get('date_to')) if v) or 'all'
+    return send_file(archive, mimetype='application/zip', as_attachment=True,
+                     download_name=f'invoices_{label}.zip')
+
+def _orders_page():
+    """Newest-first page of orders for the admin list, starting at ?after=."""
+    return keyset_paginate(_orders_query(), [(Order.created_at, True), (Order.id, True)],
+                           after=request.args.get('after'), limit=request.args.get('limit', type=int))
 
 @admin_bp.route('/order/delete/<int:order_id>', methods=['POST', 'GET'])
 @role_required('admin')
@@ -263,8 +353,10 @@ def delete_order(order_id):
         email_status = send_email(f"Order #{order.unique_order_number} Canceled", user.email,
                     f"Hello {user.full_name},\n\nYour order #{order.unique_order_number} has been CANCELED/DELETED by the admin.\n\n{details}\n\nIf you have already paid, a refund will be processed shortly.\n\nRegards,\nRestaurant Team")
 
+    retract_order(order)
     db.session.delete(order)
     db.session.commit()
+    publish_event('order', id=order_id, status='Deleted')
     
     msg = 'Order has been deleted.'
     msg = 'Order has been deleted.'
@@ -287,8 +379,8 @@ def delete_order(order_id):
 @role_required('admin')
 def confirm_order(order_id):
     order = Order.query.get_or_404(order_id)
-    order.status = 'Confirmed'
-    db.session.commit()
+    set_order_status(order, 'Confirmed')
+    publish_event('order', id=order.id, status=order.status)
     
     email_status = False
     user = User.query.get(order.user_id)
@@ -345,13 +437,23 @@ def get_order(order_id):
 @admin_bp.route('/reservations')
 @role_required('admin')
 def reservations():
-    reservations = Reservation.query.order_by(Reservation.created_at.desc()).all()
-    return render_template('admin/reservations.html', reservations=reservations)
+    query = apply_list_filters(Reservation.query.options(joinedload(Reservation.user)), request.args,
+                               status_column=Reservation.status, date_column=Reservation.date,
+                               user_column=Reservation.user_id, date_is_string=True)
+    page = keyset_paginate(query, [(Reservation.created_at, True), (Reservation.id, True)],
+                           after=request.args.get('after'), limit=request.args.get('limit', type=int))
+    return render_template('admin/reservations.html', reservations=page.items, next_cursor=page.next_cursor,
+                           filters=list_filter_args(request.args))
 
 @admin_bp.route('/reservations/data')
 @role_required('admin')
 def reservations_data():
-    reservations = Reservation.query.order_by(Reservation.date.desc(), Reservation.time.desc()).all()
+    query = apply_list_filters(Reservation.query.options(joinedload(Reservation.user)), request.args,
+                               status_column=Reservation.status, date_column=Reservation.date,
+                               user_column=Reservation.user_id, date_is_string=True)
+    page = keyset_paginate(query, [(Reservation.date, True), (Reservation.time, True), (Reservation.id, True)],
+                           after=request.args.get('after'), limit=request.args.get('limit', type=int))
+    reservations = page.items
     res_json = [{
         'id': r.id,
         'unique_reservation_number': r.unique_reservation_number,
@@ -364,7 +466,7 @@ def reservations_data():
         'time': r.time,
         'status': r.status
     } for r in reservations]
-    return jsonify({'reservations': res_json})
+    return jsonify({'reservations': res_json, 'next_cursor': page.next_cursor})
 
 
 @admin_bp.route('/reservation/cancel/<int:res_id>')
@@ -373,6 +475,7 @@ def cancel_reservation(res_id):
     res = Reservation.query.get_or_404(res_id)
     res.status = 'Canceled'
     db.session.commit()
+    publish_event('reservation', id=res.id, status=res.status)
 
     msg = 'Reservation has been canceled.'
     user = User.query.get(res.user_id)
@@ -402,6 +505,7 @@ def confirm_reservation(res_id):
     res = Reservation.query.get_or_404(res_id)
     res.status = 'Confirmed'
     db.session.commit()
+    publish_event('reservation', id=res.id, status=res.status)
 
     msg = 'Reservation confirmed.'
     user = User.query.get(res.user_id)
@@ -409,10 +513,10 @@ def confirm_reservation(res_id):
     if user and user.email:
         email_status = send_email("Reservation Confirmed", user.email,
                    f"Hello {user.full_name},\n\nYour reservation for Table {res.table_no} on {res.date} at {res.time} has been CONFIRMED.\n\nWe look forward to hosting you!\n\nRegards,\nRestaurant Team")
-        if email_status:
-            msg += f' Notification sent to {user.email}.'
-        elif email_status == 'pending':
+        if email_status == 'pending':
             msg += f' Notification queued for {user.email}.'
+        elif email_status:
+            msg += f' Notification sent to {user.email}.'
         else:
             msg += f' (Note: Could not send email to {user.email})'
 
@@ -441,6 +545,7 @@ def remove_reservation(res_id):
 
     db.session.delete(res)
     db.session.commit()
+    publish_event('reservation', id=res_id, status='Deleted')
     
     msg = 'Reservation removed.'
     if not email_status and user and user.email:
@@ -499,6 +604,7 @@ def update_user(username):
                  employee.status = 'active'
          
     db.session.commit()
+    invalidate_identity(user.id)
 
     email_status = False
     if user.email:
@@ -537,8 +643,10 @@ def delete_user_api(username):
             }), 400
 
     email = user.email
+    user_id = user.id
     db.session.delete(user)
     db.session.commit()
+    invalidate_identity(user_id)
 
     email_status = False
     if email:
@@ -566,6 +674,7 @@ def promote_user_api(username):
         employee.status = 'active'
         
     db.session.commit()
+    invalidate_identity(user.id)
     
     email_status = False
     if user.email:
@@ -601,6 +710,7 @@ def demote_user_api(username):
     
     user.role = 'customer'
     db.session.commit()
+    invalidate_identity(user.id)
     
     email_status = False
     if user.email:
@@ -629,6 +739,7 @@ def promote_manager_api(username):
         employee.status = 'active'
         
     db.session.commit()
+    invalidate_identity(user.id)
     
     email_status = False
     if user.email:
@@ -652,6 +763,7 @@ def demote_manager_api(username):
     
     user.role = 'customer'
     db.session.commit()
+    invalidate_identity(user.id)
     
     email_status = False
     if user.email:
@@ -684,6 +796,7 @@ def update_stock(item_id):
         mi.stock_quantity = int(request.form.get('stock_quantity', 0))
         mi.low_stock_threshold = int(request.form.get('low_stock_threshold', 5))
         db.session.commit()
+        invalidate_tags(TAG_MENU, item_tag(mi.id))
         flash(f'Stock updated for {mi.name}.', 'success')
     except Exception as e:
         flash(f'Error updating stock: {str(e)}', 'danger')
@@ -714,15 +827,18 @@ def shifts():
 @admin_bp.route('/shifts/data')
 @role_required('admin')
 def shifts_data():
-    all_shifts = StaffShift.query.order_by(StaffShift.shift_start.desc()).all()
+    query = apply_list_filters(StaffShift.query.options(joinedload(StaffShift.user)), request.args,
+                               date_column=StaffShift.shift_start, user_column=StaffShift.user_id)
+    page = keyset_paginate(query, [(StaffShift.shift_start, True), (StaffShift.id, True)],
+                           after=request.args.get('after'), limit=request.args.get('limit', type=int))
     shifts_json = [{
         'id': s.id,
-        'username': s.staff.username,
-        'role': s.staff.role,
+        'username': s.user.username,
+        'role': s.user.role,
         'start': s.shift_start.strftime('%Y-%m-%d %H:%M'),
         'end': s.shift_end.strftime('%Y-%m-%d %H:%M')
-    } for s in all_shifts]
-    return jsonify({'shifts': shifts_json})
+    } for s in page.items]
+    return jsonify({'shifts': shifts_json, 'next_cursor': page.next_cursor})
 
 @admin_bp.route('/shifts/add', methods=['POST'])
 @role_required('admin')
@@ -807,6 +923,7 @@ def approve_employee_request(req_id):
         req.status = 'approved'
         req.admin_notes = admin_notes
         db.session.commit()
+        invalidate_identity(user.id)
         
         # Notify user (if email service is functional)
         if user.email:
@@ -1,12 +1,16 @@
-from flask import Blueprint, render_template, request, jsonify, make_response
-from models.models import db, Order, SaleItem, MenuItem, User
+from flask import Blueprint, render_template, request, jsonify, Response, stream_with_context
+from models.models import db, Order, MenuItem, User, DailySalesRollup, get_business_date
 from datetime import datetime, timedelta
 from sqlalchemy import func
+from services.reporting import get_sales_by_period, get_sales_summary, get_payment_method_breakdown
 import csv
 from io import StringIO
 
 analytics_bp = Blueprint('analytics', __name__, url_prefix='/analytics')
 
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 64 * 1024
+
 def admin_required(f):
     """Decorator to require admin or manager role"""
     from functools import wraps
@@ -27,21 +31,19 @@ def dashboard():
     
     # Get date range from query params
     days = int(request.args.get('days', 30))
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    # Get orders in date range
-    orders = Order.query.filter(Order.created_at >= start_date).all()
+    today = get_business_date()
+    start_date = today - timedelta(days=days)
     
-    # Calculate statistics
-    total_revenue = sum(order.total for order in orders)
-    total_orders = len(orders)
+    # Calculate statistics (pre-aggregated daily rollup)
+    summary = get_sales_summary(start_date)
+    total_revenue = summary['revenue']
+    total_orders = summary['orders']
     avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
     
     # Today's statistics
-    today = datetime.utcnow().date()
-    today_orders = Order.query.filter(func.date(Order.created_at) == today).all()
-    today_revenue = sum(order.total for order in today_orders)
-    today_orders_count = len(today_orders)
+    today_summary = get_sales_summary(today, today + timedelta(days=1))
+    today_revenue = today_summary['revenue']
+    today_orders_count = today_summary['orders']
     
     # Get trend data
     trend_result = get_sales_trend(days)
@@ -52,11 +54,7 @@ def dashboard():
     top_products = top_products_result.get('products', [])
     
     # Payment method breakdown
-    payment_methods = db.session.query(
-        Order.payment_method,
-        func.count(Order.id).label('count'),
-        func.sum(Order.total).label('total')
-    ).filter(Order.created_at >= start_date).group_by(Order.payment_method).all()
+    payment_methods = get_payment_method_breakdown(start_date)
     
     from flask import session
     template_folder = 'admin' if session.get('role') == 'admin' else 'manager'
@@ -77,21 +75,25 @@ def sales_report():
     """Detailed sales report with filtering"""
     # Get date range from query params
     days = int(request.args.get('days', 30))
-    start_date = datetime.utcnow() - timedelta(days=days)
+    start_date = get_business_date() - timedelta(days=days)
     
-    orders = Order.query.filter(Order.created_at >= start_date).order_by(Order.created_at.desc()).all()
+    orders = Order.query.filter(Order.business_date >= start_date)\
+        .order_by(Order.business_date.desc(), Order.created_at.desc()).all()
     
-    total_revenue = sum(order.total for order in orders)
-    total_orders = len(orders)
+    # Totals and top items from the daily rollup, like the dashboards, so
+    # canceled orders are left out (they are still listed with their status)
+    summary = get_sales_summary(start_date)
+    total_revenue = summary['revenue']
+    total_orders = summary['orders']
     
     # Top selling items
     top_items = db.session.query(
         MenuItem.name,
-        func.sum(SaleItem.quantity).label('total_quantity'),
-        func.sum(SaleItem.quantity * SaleItem.price_at_sale).label('total_revenue')
-    ).join(SaleItem).join(Order).filter(
-        Order.created_at >= start_date
-    ).group_by(MenuItem.id).order_by(func.sum(SaleItem.quantity).desc()).limit(10).all()
+        func.sum(DailySalesRollup.quantity).label('total_quantity'),
+        func.sum(DailySalesRollup.revenue).label('total_revenue')
+    ).join(DailySalesRollup, DailySalesRollup.menu_item_id == MenuItem.id).filter(
+        DailySalesRollup.sales_date >= start_date
+    ).group_by(MenuItem.id).order_by(func.sum(DailySalesRollup.quantity).desc()).limit(10).all()
     
     from flask import session
     template_folder = 'admin' if session.get('role') == 'admin' else 'manager'
@@ -107,29 +109,47 @@ def sales_report():
 def export_csv():
     """Export sales data to CSV"""
     days = int(request.args.get('days', 30))
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    orders = Order.query.filter(Order.created_at >= start_date).all()
-    
-    si = StringIO()
-    writer = csv.writer(si)
-    writer.writerow(['Order ID', 'Date', 'Customer', 'Total Amount', 'Payment Method', 'Status'])
-    
-    for order in orders:
-        customer = User.query.get(order.user_id)
-        customer_name = customer.full_name or customer.username if customer else 'Unknown'
-        writer.writerow([
-            order.unique_order_number,
-            order.created_at.strftime('%Y-%m-%d %H:%M'),
-            customer_name,
-            f'৳{order.total:.2f}',
-            order.payment_method or 'N/A',
-            order.status
-        ])
-    
-    output = make_response(si.getvalue())
+    start_date = get_business_date() - timedelta(days=days)
+    
+    # Customer names come from the same query; rows are fetched in batches
+    rows = db.session.query(
+        Order.unique_order_number,
+        Order.created_at,
+        User.full_name,
+        User.username,
+        Order.total,
+        Order.payment_method,
+        Order.status
+    ).outerjoin(User, Order.user_id == User.id)\
+        .filter(Order.business_date >= start_date)\
+        .order_by(Order.business_date.asc(), Order.created_at.asc())\
+        .yield_per(EXPORT_BATCH_SIZE)
+    
+    def generate():
+        si = StringIO()
+        writer = csv.writer(si)
+        writer.writerow(['Order ID', 'Date', 'Customer', 'Total Amount', 'Payment Method', 'Status'])
+        yield si.getvalue()  # Header goes out before the first row is fetched
+        si.seek(0)
+        si.truncate(0)
+        
+        for number, created_at, full_name, username, total, payment_method, status in rows:
+            writer.writerow([
+                number,
+                created_at.strftime('%Y-%m-%d %H:%M'),
+                full_name or username or 'Unknown',
+                f'৳{total:.2f}',
+                payment_method or 'N/A',
+                status
+            ])
+            if si.tell() >= EXPORT_CHUNK_SIZE:
+                yield si.getvalue()
+                si.seek(0)
+                si.truncate(0)
+        yield si.getvalue()
+    
+    output = Response(stream_with_context(generate()), mimetype="text/csv")
     output.headers["Content-Disposition"] = f"attachment; filename=sales_report_{datetime.now().strftime('%Y%m%d')}.csv"
-    output.headers["Content-type"] = "text/csv"
     return output
 
 @analytics_bp.route('/api/revenue-chart')
@@ -137,17 +157,16 @@ def export_csv():
 def revenue_chart_api():
     """API endpoint for revenue chart data"""
     days = int(request.args.get('days', 7))
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ('hour', 'day', 'week'):
+        granularity = 'day'
     
-    chart_data = []
-    labels = []
+    today = get_business_date()
+    buckets = get_sales_by_period(today - timedelta(days=days - 1), today + timedelta(days=1), granularity)
     
-    for i in range(days-1, -1, -1):
-        date = datetime.utcnow().date() - timedelta(days=i)
-        day_orders = Order.query.filter(func.date(Order.created_at) == date).all()
-        revenue = sum(order.total for order in day_orders)
-        
-        chart_data.append(revenue)
-        labels.append(date.strftime('%m/%d'))
+    label_format = '%m/%d %H:00' if granularity == 'hour' else '%m/%d'
+    chart_data = [bucket['revenue'] for bucket in buckets]
+    labels = [bucket['period'].strftime(label_format) for bucket in buckets]
     
     return jsonify({
         'labels': labels,
@@ -3,6 +3,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from models.models import User
 from extensions import db
 from services.email import send_email
+from services.identity import invalidate_identity
 import random
 import secrets
 from datetime import datetime, timedelta
@@ -59,6 +60,7 @@ def login():
              if user.role != target_role:
                  user.role = target_role
                  db.session.commit()
+                 invalidate_identity(user.id)
                  flash(f'Welcome aboard! Your profile has been updated to {target_role.capitalize()}.', 'info')
             
         session.permanent = True  # Use PERMANENT_SESSION_LIFETIME (7 days)
@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 from extensions import db
-from models.models import MenuItem, User
+from models.models import MenuItem
+from services.cart import price_cart, load_menu_items
+from services.identity import current_user
 
 cart_bp = Blueprint('cart', __name__)
 
@@ -11,35 +13,16 @@ def view_cart():
     complete = False
 
     if 'user_id' in session:
-        user = User.query.get(session['user_id'])
+        user = current_user()
         complete = user.is_complete if user else False
 
     # Build cart item list
-    raw_cart = session.get('cart', {})  # {item_id: qty}
-    items = []
-    total = 0.0
-
-    for item_id, qty in raw_cart.items():
-        menu_item = MenuItem.query.get(int(item_id))
-        if not menu_item:
-            continue
-
-        subtotal = menu_item.price * qty
-        items.append({
-            'id': menu_item.id,
-            'name': menu_item.name,
-            'price': menu_item.price,
-            'qty': qty,
-            'subtotal': subtotal,
-            'image': menu_item.image,
-            'stock': menu_item.stock_quantity
-        })
-        total += subtotal
+    cart = price_cart(session.get('cart', {}))
 
     return render_template(
         'cart.html',
-        items=items,
-        total=total,
+        items=cart.lines,
+        total=cart.total,
         is_profile_complete=complete
     )
 
@@ -111,7 +94,7 @@ def decrease_cart_item(item_id):
 
 @cart_bp.route('/update', methods=['POST'])
 def update_cart():
-    cart = {}
+    requested = {}
     for k, v in request.form.items():
         if k.startswith('qty_'):
             item_id = k.split('_', 1)[1]
@@ -119,15 +102,21 @@ def update_cart():
                 qty = int(v)
             except:
                 qty = 0
+            requested[item_id] = qty
+
+    # Load every item in the form with one query
+    menu_items = load_menu_items(requested.keys())
+
+    cart = {}
+    for item_id, qty in requested.items():
+        # Verify stock limit for update
+        mi = menu_items.get(int(item_id)) if item_id.isdigit() else None
+        if mi and qty > mi.stock_quantity:
+            flash(f'Cannot order {qty} of {mi.name}. Only {mi.stock_quantity} in stock.', 'warning')
+            qty = mi.stock_quantity
             
-            # Verify stock limit for update
-            mi = MenuItem.query.get(item_id)
-            if mi and qty > mi.stock_quantity:
-                flash(f'Cannot order {qty} of {mi.name}. Only {mi.stock_quantity} in stock.', 'warning')
-                qty = mi.stock_quantity
-                
-            if qty > 0:
-                cart[item_id] = qty
+        if qty > 0:
+            cart[item_id] = qty
     session['cart'] = cart
     flash('Cart updated.', 'success')
     return redirect(url_for('cart.view_cart'))
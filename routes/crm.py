@@ -1,9 +1,14 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, make_response
 from models.models import db, User, Order
 from sqlalchemy import func
+from services.customers import customer_metrics_query, get_customer_metrics, get_customer_summary
 
 crm_bp = Blueprint('crm', __name__, url_prefix='/crm')
 
+CUSTOMERS_PER_PAGE = 50
+EXPORT_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 64 * 1024
+
 def admin_required(f):
     """Decorator to require admin or manager role"""
     from functools import wraps
@@ -20,40 +25,21 @@ def admin_required(f):
 @admin_required
 def index():
     """Customer management dashboard"""
-    # Get all customers (users with role='customer')
-    customers = User.query.filter_by(role='customer').all()
-    
-    # Calculate customer statistics
-    customer_stats = []
-    for customer in customers:
-        total_orders = Order.query.filter_by(user_id=customer.id).count()
-        total_spent = db.session.query(func.sum(Order.total)).filter_by(user_id=customer.id).scalar() or 0
-        avg_order_value = total_spent / total_orders if total_orders > 0 else 0
-        
-        # Determine customer tier
-        if total_spent > 10000:
-            tier = 'VIP'
-        elif total_spent > 5000:
-            tier = 'Gold'
-        elif total_spent > 1000:
-            tier = 'Silver'
-        else:
-            tier = 'Regular'
-        
-        customer_stats.append({
-            'customer': customer,
-            'total_orders': total_orders,
-            'total_spent': total_spent,
-            'avg_order_value': avg_order_value,
-            'tier': tier
-        })
+    page = request.args.get('page', 1, type=int)
+    sort = request.args.get('sort', 'total_spent')
+    direction = 'asc' if request.args.get('dir') == 'asc' else 'desc'
     
-    # Sort by total spent (descending)
-    customer_stats.sort(key=lambda x: x['total_spent'], reverse=True)
+    # One grouped query per page, sorted and paginated in SQL
+    pagination, customer_stats = get_customer_metrics(page=page, per_page=CUSTOMERS_PER_PAGE, sort=sort, direction=direction)
     
     from flask import session
     template_folder = 'admin' if session.get('role') == 'admin' else 'manager'
-    return render_template(f'{template_folder}/customer_management.html', customer_stats=customer_stats)
+    return render_template(f'{template_folder}/customer_management.html',
+                         customer_stats=customer_stats,
+                         pagination=pagination,
+                         summary=get_customer_summary(),
+                         sort=sort,
+                         direction=direction)
 
 @crm_bp.route('/view/<int:id>')
 @admin_required
@@ -105,50 +91,52 @@ def view_customer(id):
 def export_customers():
     """Export customer data to Excel"""
     from openpyxl import Workbook
-    from io import BytesIO
-    from flask import make_response
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from tempfile import TemporaryFile
+    from flask import Response, stream_with_context
     from datetime import datetime
     
-    customers = User.query.filter_by(role='customer').all()
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Customers"
-    
-    # Header
-    ws.append(['Username', 'Full Name', 'Email', 'Phone', 'Total Orders', 'Total Spent', 'Member Since'])
-    
-    # Styling (optional but nice for Excel)
-    from openpyxl.styles import Font
-    header_font = Font(bold=True)
-    for cell in ws[1]:
-        cell.font = header_font
-
-    for customer in customers:
-        total_orders = Order.query.filter_by(user_id=customer.id).count()
-        total_spent = db.session.query(func.sum(Order.total)).filter_by(user_id=customer.id).scalar() or 0
+    def generate():
+        # Write-only mode streams rows to disk instead of building the sheet in memory
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Customers")
         
-        ws.append([
-            customer.username,
-            customer.full_name or 'N/A',
-            customer.email or 'N/A',
-            customer.phone or 'N/A',
-            total_orders,
-            total_spent,
-            customer.created_at.strftime('%Y-%m-%d') if customer.created_at else 'N/A'
-        ])
-    
-    # Format Currency column (Total Spent is column F/6)
-    for row in range(2, len(customers) + 2):
-        ws.cell(row=row, column=6).number_format = '"৳"#,##0.00'
-
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    response = make_response(output.read())
+        # Header (bold, nice for Excel)
+        header_font = Font(bold=True)
+        header = []
+        for title in ['Username', 'Full Name', 'Email', 'Phone', 'Total Orders', 'Total Spent', 'Member Since']:
+            cell = WriteOnlyCell(ws, value=title)
+            cell.font = header_font
+            header.append(cell)
+        ws.append(header)
+        
+        customers = customer_metrics_query(sort='username', direction='asc').yield_per(EXPORT_BATCH_SIZE)
+        for customer, total_orders, total_spent, avg_order_value, tier in customers:
+            # Format Currency column (Total Spent)
+            spent = WriteOnlyCell(ws, value=total_spent)
+            spent.number_format = '"৳"#,##0.00'
+            ws.append([
+                customer.username,
+                customer.full_name or 'N/A',
+                customer.email or 'N/A',
+                customer.phone or 'N/A',
+                total_orders,
+                spent,
+                customer.created_at.strftime('%Y-%m-%d') if customer.created_at else 'N/A'
+            ])
+        
+        with TemporaryFile() as output:
+            wb.save(output)
+            output.seek(0)
+            while True:
+                chunk = output.read(EXPORT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    
+    response = Response(stream_with_context(generate()), mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
     response.headers["Content-Disposition"] = f"attachment; filename=customers_{datetime.now().strftime('%Y%m%d')}.xlsx"
-    response.headers["Content-type"] = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     return response
 
 @crm_bp.route('/order/<int:order_id>')
@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from models.models import db, Employee, Attendance, User, EmployeeRequest
+from models.models import db, Employee, Attendance, User, EmployeeRequest, get_business_date
+from services.identity import invalidate_identity
 from datetime import datetime, date
 
 employees_bp = Blueprint('employees', __name__, url_prefix='/employees')
@@ -121,6 +122,7 @@ def add_employee():
             
         db.session.add(employee)
         db.session.commit()
+        invalidate_identity(user_id)
         
         flash(f'Employee added successfully!', 'success')
         return redirect(url_for('employees.index'))
@@ -190,6 +192,7 @@ def edit_employee(id):
             employee.hire_date = datetime.strptime(hire_date_str, '%Y-%m-%d').date()
         
         db.session.commit()
+        invalidate_identity(employee.user_id)
         
         flash(f'Employee updated successfully!', 'success')
         return redirect(url_for('employees.index'))
@@ -231,8 +234,10 @@ def delete_employee(id):
             employee.user.role = 'customer'
             db.session.add(employee.user)
         
+        user_id = employee.user_id
         db.session.delete(employee)
         db.session.commit()
+        invalidate_identity(user_id)
         
         flash(f'Employee record deleted successfully! Role reverted to Customer.', 'success')
         return redirect(url_for('employees.index'))
@@ -247,7 +252,7 @@ def delete_employee(id):
 def attendance():
     """View and manage attendance"""
     # Get date from query params, default to today
-    date_str = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
+    date_str = request.args.get('date', get_business_date().strftime('%Y-%m-%d'))
     selected_date = datetime.strptime(date_str, '%Y-%m-%d').date()
     
     employees = Employee.query.filter_by(status='active').all()
@@ -1,6 +1,9 @@
 from flask import Blueprint, render_template, request, jsonify, session
-from models.models import MenuItem, Rating, Order, Reservation, EmployeeRequest
-from extensions import db, cache
+from models.models import MenuItem, Order, Reservation, EmployeeRequest, get_business_date
+from extensions import db
+from services.ratings import add_rating
+from services.cache_tags import cached_fragment, TAG_MENU, TAG_RATINGS
+from services.search import search_menu, autocomplete
 
 main_bp = Blueprint('main', __name__)
 
@@ -25,10 +28,9 @@ def dashboard_stats():
     employee_requests_count = EmployeeRequest.query.filter_by(status='pending').count()
     
     # 5. Manager: Absent/On Leave Today
-    from datetime import date
     from models.models import Attendance
     absent_leave_count = Attendance.query.filter(
-        Attendance.date == date.today(),
+        Attendance.date == get_business_date(),
         Attendance.status.in_(['absent', 'leave', 'on_leave']) 
     ).count()
     
@@ -42,48 +44,64 @@ def dashboard_stats():
     })
 
 
-def make_cache_key():
-    """Create a cache key that includes the user identity to prevent shared caching between users."""
-    user_id = session.get('user_id', 'anon')
-    return f"{request.path}:{user_id}:{request.query_string.decode('utf-8')}"
-
-def has_flash_messages():
-    """Check if there are any flash messages in the session."""
-    return '_flashes' in session
+def fragment_cache_key():
+    """Key for user-independent page fragments: path and query only, shared by everyone."""
+    return f"fragment:{request.path}:{request.query_string.decode('utf-8')}"
 
 @main_bp.route('/')
-@cache.cached(timeout=300, key_prefix=make_cache_key, unless=has_flash_messages)
 def index():
-    # Only available items on homepage, eager load ratings
-    items = MenuItem.query.options(db.joinedload(MenuItem.ratings)).filter_by(availability=True).all()
-    # Optimized category fetch
-    cat_query = db.session.query(MenuItem.category).distinct().all()
-    categories = sorted([c[0] or 'Uncategorized' for c in cat_query])
+    def build():
+        # Only available items on homepage; ratings come from the aggregate columns
+        items = MenuItem.query.filter_by(availability=True).all()
+        # Optimized category fetch
+        cat_query = db.session.query(MenuItem.category).distinct().all()
+        categories = sorted([c[0] or 'Uncategorized' for c in cat_query])
+        return render_template('index_fragment.html', items=items, categories=categories)
 
-    return render_template('index.html', items=items, categories=categories)
+    # The item grid is the same for every visitor, so it is cached once and
+    # rebuilt only when the menu or ratings change; the page shell (navbar,
+    # cart count, flashes) is rendered per request.
+    fragment = cached_fragment(fragment_cache_key(), [TAG_MENU, TAG_RATINGS], build)
+    return render_template('index.html', fragment=fragment)
 
 @main_bp.route('/menu')
-@cache.cached(timeout=300, key_prefix=make_cache_key, unless=has_flash_messages)
 def menu():
     q = request.args.get('q', '').strip()
     cat = request.args.get('category', '').strip()
-    query = MenuItem.query.options(db.joinedload(MenuItem.ratings))
-    
-    # Filter by name if search provided
-    if q:
-        query = query.filter(MenuItem.name.ilike(f'%{q}%'))
-    
-    # Filter by category
-    if cat:
-        query = query.filter_by(category=cat)
+
+    def build():
+        query = MenuItem.query
+
+        # Search name, category and ingredients through the menu index
+        ranked = search_menu(q) if q else None
+        if ranked is not None:
+            query = query.filter(MenuItem.id.in_(ranked))
         
-    items = query.all()
-    
-    # Optimized category fetch
-    cat_query = db.session.query(MenuItem.category).distinct().all()
-    categories = sorted([c[0] or 'Uncategorized' for c in cat_query])
-    
-    return render_template('menu.html', items=items, categories=categories, q=q, cat=cat)
+        # Filter by category
+        if cat:
+            query = query.filter_by(category=cat)
+            
+        items = query.all()
+        if ranked is not None:
+            position = {item_id: i for i, item_id in enumerate(ranked)}
+            items.sort(key=lambda it: position[it.id])
+        
+        # Optimized category fetch
+        cat_query = db.session.query(MenuItem.category).distinct().all()
+        categories = sorted([c[0] or 'Uncategorized' for c in cat_query])
+        return render_template('menu_fragment.html', items=items, categories=categories, q=q, cat=cat)
+
+    fragment = cached_fragment(fragment_cache_key(), [TAG_MENU, TAG_RATINGS], build)
+    return render_template('menu.html', fragment=fragment)
+
+@main_bp.route('/api/menu/autocomplete')
+def menu_autocomplete():
+    q = request.args.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.args.get('limit', 8)), 20))
+    except ValueError:
+        limit = 8
+    return jsonify({'suggestions': autocomplete(q, limit) if q else []})
 
 @main_bp.route("/api/rate", methods=["POST"])
 def rate_item():
@@ -109,14 +127,8 @@ def rate_item():
     if not item:
         return jsonify({"success": False, "message": "Item not found."}), 404
 
-    # Save new rating
-    new_rating = Rating(
-        item_id=item_id,
-        user_id=user_id,
-        score=score
-    )
-    db.session.add(new_rating)
-    db.session.commit()
+    # Save new rating and update the item's aggregates
+    add_rating(item.id, user_id, score)
 
     return jsonify({
         "success": True, 
@@ -1,34 +1,25 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
-from extensions import db
-from models.models import Order, MenuItem, User
+from models.models import Order
 from services.email import send_email, format_order_body
-import json
-import requests
+from services.orders import create_order, claim_bkash_payment, release_bkash_payment, attach_bkash_order
+from services.cart import price_cart
+from services.inventory import InsufficientStock
+from services.identity import current_user
+from services.invoices import get_invoice
 import os
-import io
-from xhtml2pdf import pisa
 from flask import send_file, current_app
 from datetime import datetime
-from bkash_config import BKASH
+from services.bkash import bkash, BkashError, GatewayUnavailable
 
 orders_bp = Blueprint('orders', __name__)
 
-# BKash Mock Config (should ideally be in config)
-BKASH_CONFIG = {
-    'base_url': 'https://checkout.sandbox.bka.sh/v1.2.0-beta',
-    'app_key': 'mock_key',
-    'app_secret': 'mock_secret',
-    'username': 'mock_user',
-    'password': 'mock_password'
-}
-
 @orders_bp.route('/checkout', methods=['GET', 'POST'])
 def checkout():
     if 'user_id' not in session:
         flash('Please login to place order.', 'danger')
         return redirect(url_for('auth.login'))
     
-    user = User.query.get(session['user_id'])
+    user = current_user()
 
     # Check profile completion using model property
     if not user.is_complete:
@@ -48,11 +39,13 @@ def checkout():
         street = request.form.get('street')
         
         # Verify items are in stock before proceeding
-        for item_id, qty in cart_data.items():
-            mi = MenuItem.query.get(item_id)
-            if not mi or mi.stock_quantity < qty:
-                flash(f"Item '{mi.name}' is out of stock or low on stock. Please update cart.", 'danger')
-                return redirect(url_for('cart.view_cart'))
+        cart = price_cart(cart_data)
+        for line in cart.out_of_stock:
+            flash(f"Item '{line['name']}' is out of stock or low on stock. Please update cart.", 'danger')
+            return redirect(url_for('cart.view_cart'))
+        if not cart:
+            flash("Your cart is empty.", 'warning')
+            return redirect(url_for('cart.view_cart'))
 
         # If Pay Now selected → go to payment gateway page
         if payment_method == "paynow":
@@ -65,43 +58,23 @@ def checkout():
             return redirect(url_for("orders.pay_now"))
 
         # Cash on Delivery / Standard Order
-        items_list = []
-        total_price = 0
-
-        for item_id, qty in cart_data.items():
-            item = MenuItem.query.get(int(item_id))
-            if item:
-                items_list.append({
-                    'name': item.name,
-                    'price': item.price,
-                    'qty': qty
-                })
-                total_price += item.price * qty
-                
-                # SRS: Decrease stock quantity
-                item.stock_quantity -= qty
-                if item.stock_quantity < 0: 
-                     item.stock_quantity = 0 # Prevent negative
-
-        # Create order
-        new_order = Order(
-            user_id=user.id,
-            items=json.dumps(items_list),
-            total=total_price,
-            phone=phone,
-            address_district=district,
-            address_city=city,
-            address_street=street,
-            status="Pending",
-            payment_status="pending",
-            order_type="dine_in" # Default for now, can extend to takeaway
-        )
-        
-        if payment_method == "cash":
-             new_order.payment_method = "cash"
-        
-        db.session.add(new_order)
-        db.session.commit()
+        try:
+            new_order = create_order(
+                user.id,
+                cart,
+                phone=phone,
+                address_district=district,
+                address_city=city,
+                address_street=street,
+                status="Pending",
+                payment_status="pending",
+                payment_method="cash" if payment_method == "cash" else None,
+                order_type="dine_in" # Default for now, can extend to takeaway
+            )
+        except InsufficientStock as e:
+            name = cart.items[int(e.item_id)].name
+            flash(f"Item '{name}' is out of stock or low on stock. Please update cart.", 'danger')
+            return redirect(url_for('cart.view_cart'))
 
         # Clear cart
         session['cart'] = {}
@@ -124,12 +97,7 @@ def pay_now():
         return redirect(url_for("orders.checkout"))
 
     # Calculate total from cart
-    cart = session.get('cart', {})
-    total = 0
-    for item_id, qty in cart.items():
-        item = MenuItem.query.get(int(item_id))
-        if item:
-            total += item.price * qty
+    total = price_cart(session.get('cart', {})).total
 
     return render_template("pay_now.html", total=total)
 
@@ -141,40 +109,23 @@ def payment_success():
 
     checkout_data = session["checkout_data"]
     cart_data = session.get("cart", {})
-    user = User.query.get(session['user_id'])
-
-    items_list = []
-    total_price = 0
-
-    for item_id, qty in cart_data.items():
-        item = MenuItem.query.get(int(item_id))
-        if item:
-            items_list.append({
-                'name': item.name,
-                'price': item.price,
-                'qty': qty
-            })
-            total_price += item.price * qty
-            
-            # SRS: Update Stock
-            item.stock_quantity -= qty
-            if item.stock_quantity < 0: item.stock_quantity = 0
-
-    new_order = Order(
-        user_id=user.id,
-        items=json.dumps(items_list),
-        total=total_price,
-        phone=checkout_data["phone"],
-        address_district=checkout_data["district"],
-        address_city=checkout_data["city"],
-        address_street=checkout_data["street"],
-        status="Paid",          # Confirmed essentially
-        payment_status="paid",  # SRS requirement
-        payment_method="online_bkash" # simplified
-    )
+    user = current_user()
 
-    db.session.add(new_order)
-    db.session.commit()
+    try:
+        new_order = create_order(
+            user.id,
+            price_cart(cart_data),
+            phone=checkout_data["phone"],
+            address_district=checkout_data["district"],
+            address_city=checkout_data["city"],
+            address_street=checkout_data["street"],
+            status="Paid",          # Confirmed essentially
+            payment_status="paid",  # SRS requirement
+            payment_method="online_bkash" # simplified
+        )
+    except InsufficientStock:
+        flash("Some items sold out while you were paying. Please contact us for a refund.", 'danger')
+        return redirect(url_for('cart.view_cart'))
 
     session.pop("checkout_data", None)
     session['cart'] = {}
@@ -201,78 +152,43 @@ def download_invoice(order_id):
         flash("You don't have permission to access this invoice.", 'danger')
         return redirect(url_for('user.orders'))
 
-    # Parse items JSON
-    try:
-        order.items_parsed = json.loads(order.items)
-    except:
-        order.items_parsed = []
-
-    # Render invoice HTML
-    html_out = render_template('invoice.html', order=order)
-
-    # PDF generation
-    pdf_stream = io.BytesIO()
-    pisa.CreatePDF(html_out, dest=pdf_stream)
-    pdf_stream.seek(0)
+    # Rendered once per version of the order and served from the cache;
+    # conditional=True answers If-None-Match with 304 and supports Range.
+    path, digest = get_invoice(order)
 
     return send_file(
-        pdf_stream,
+        path,
         mimetype="application/pdf",
         as_attachment=True,
-        download_name=f"Invoice_{order.unique_order_number}.pdf"
+        download_name=f"Invoice_{order.unique_order_number}.pdf",
+        conditional=True,
+        etag=digest,
+        max_age=0
     )
 
-def bkash_get_token():
-    url = f"{BKASH['base_url']}/token/grant"
-    headers = {"Content-Type": "application/json"}
-    body = {
-        "app_key": BKASH["app_key"],
-        "app_secret": BKASH["app_secret"]
-    }
-
-    res = requests.post(url, json=body, auth=(BKASH["username"], BKASH["password"]), headers=headers)
-    data = res.json()
-
-    return data.get("id_token")
-
 @orders_bp.route('/pay/bkash', methods=['POST'])
 def bkash_pay():
     if "checkout_data" not in session:
         return redirect(url_for("orders.checkout"))
 
-    token = bkash_get_token()
-    if not token:
-        flash("bKash authentication failed!", 'danger')
-        return redirect(url_for("orders.checkout"))
-
     # Calculate Total Amount
-    cart = session.get("cart", {})
-    total = 0
-    for item_id, qty in cart.items():
-        item = MenuItem.query.get(int(item_id))
-        if item:
-            total += item.price * qty
+    total = price_cart(session.get("cart", {})).total
 
     # Store transaction amount for verification
     session["bkash_amount"] = total
 
-    # Create payment request
-    create_url = f"{BKASH['base_url']}/checkout/payment/create"
-    headers = {
-        "Content-Type": "application/json",
-        "authorization": token,
-        "x-app-key": BKASH["app_key"]
-    }
-
-    payload = {
-        "amount": str(total),
-        "currency": "BDT",
-        "intent": "sale",
-        "merchantInvoiceNumber": "INV" + str(int(datetime.utcnow().timestamp())),
-    }
-
-    res = requests.post(create_url, json=payload, headers=headers)
-    data = res.json()
+    # Create payment request (token comes from the client's cache)
+    try:
+        data = bkash.create_payment(total, "INV" + str(int(datetime.utcnow().timestamp())),
+                                    callback_url=url_for('orders.bkash_callback', _external=True))
+    except GatewayUnavailable as e:
+        print(f"bKash unavailable: {e}")
+        flash("bKash is not responding right now. Please try again in a minute or choose another payment method.", 'danger')
+        return redirect(url_for("orders.checkout"))
+    except BkashError as e:
+        print(f"bKash error: {e}")
+        flash("bKash authentication failed!", 'danger')
+        return redirect(url_for("orders.checkout"))
 
     if "bkashURL" in data:
         return redirect(data["bkashURL"])
@@ -285,75 +201,61 @@ def bkash_callback():
     payment_id = request.args.get("paymentID")
     status = request.args.get("status")
 
-    if status != "success":
+    if status != "success" or not payment_id:
         flash("bKash Payment Failed or Canceled.", 'danger')
         return redirect(url_for("orders.checkout"))
 
-    token = bkash_get_token()
+    # A reloaded or replayed callback must not place the order twice: the
+    # unique claim row is written before the payment is executed
+    if not claim_bkash_payment(payment_id, session.get('user_id')):
+        flash("This payment has already been processed.", 'info')
+        return redirect(url_for("user.orders"))
 
-    execute_url = f"{BKASH['base_url']}/checkout/payment/execute/{payment_id}"
-    headers = {
-        "Content-Type": "application/json",
-        "authorization": token,
-        "x-app-key": BKASH["app_key"]
-    }
-
-    res = requests.post(execute_url, json={}, headers=headers)
-    data = res.json()
+    try:
+        data = bkash.execute_payment(payment_id)
+    except BkashError as e:
+        release_bkash_payment(payment_id)
+        print(f"bKash execute failed for {payment_id}: {e}")
+        flash("Could not confirm the bKash payment. If you were charged, please contact us with your payment ID.", 'danger')
+        return redirect(url_for("orders.checkout"))
 
     if data.get("transactionStatus") != "Completed":
+        release_bkash_payment(payment_id)
         flash("bKash Payment Execution Failed.", 'danger')
         return redirect(url_for("orders.checkout"))
 
-    return finalize_bkash_order()
+    return finalize_bkash_order(payment_id)
 
-def finalize_bkash_order():
+def finalize_bkash_order(payment_id):
     checkout_data = session.get("checkout_data")
     cart = session.get("cart", {})
-    user = User.query.get(session['user_id'])
-
-    items_list = []
-    total_price = 0
-    for item_id, qty in cart.items():
-        item = MenuItem.query.get(int(item_id))
-        if item:
-            items_list.append({
-                "name": item.name,
-                "price": item.price,
-                "qty": qty
-            })
-            total_price += item.price * qty
-            
-            # Decrease Stock
-            item.stock_quantity -= qty
-            if item.stock_quantity < 0: item.stock_quantity = 0
-
-    new_order = Order(
-        user_id=user.id,
-        items=json.dumps(items_list),
-        total=total_price,
-        phone=checkout_data["phone"],
-        address_district=checkout_data["district"],
-        address_city=checkout_data["city"],
-        address_street=checkout_data["street"],
-        status="Paid",
-        payment_status="paid",
-        payment_method="bkash"
-    )
+    user = current_user()
 
-    db.session.add(new_order)
-    db.session.commit()
+    try:
+        new_order = create_order(
+            user.id,
+            price_cart(cart),
+            phone=checkout_data["phone"],
+            address_district=checkout_data["district"],
+            address_city=checkout_data["city"],
+            address_street=checkout_data["street"],
+            status="Paid",
+            payment_status="paid",
+            payment_method="bkash"
+        )
+    except InsufficientStock:
+        flash("Some items sold out while you were paying. Please contact us for a refund.", 'danger')
+        return redirect(url_for('cart.view_cart'))
+    attach_bkash_order(payment_id, new_order)
 
     if user.email:
          details = format_order_body(new_order)
          send_email(f"Payment Received - Order #{new_order.unique_order_number}", user.email,
                     f"Hello {user.full_name},\n\nPayment successful! Your order has been placed.\n\n{details}\n\nRegards,\nRestaurant Team")
 
-    # Earn Loyalty Points
-    add_loyalty_points(user.id, total_price)
-
     session.pop("checkout_data", None)
     session["cart"] = {}
 
     flash("Payment Successful! Order placed.", "success")
+    return redirect(url_for("user.orders"))
 
@@ -1,54 +1,20 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 from extensions import db
-from models.models import User, Reservation
-from datetime import datetime, timedelta
+from models.models import Reservation
+from services.reservations import TABLES, MAX_DURATION_HOURS, book_table, day_availability
+from services.events import publish_event
+from services.identity import current_user
+from datetime import datetime
 
 reservations_bp = Blueprint('reservations', __name__)
 
-def check_table_availability(date, time, duration=2, table_no=None):
-    """
-    Checks if a table is available.
-    Returns (bool, message)
-    """
-    try:
-        # 1. Parse DateTime
-        req_start = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
-        req_end = req_start + timedelta(hours=duration)
-        now = datetime.now()
-    except ValueError:
-        return False, "Invalid date/time format. Use YYYY-MM-DD and HH:MM."
-
-    # 2. Check Past Date
-    if req_start < now:
-        return False, "You cannot book a table in the past."
-
-    # 3. Check Opening Hours (11:00 to 23:00)
-    if req_start.hour < 11:
-        return False, "We are closed. Opening hours are 11:00 AM - 11:00 PM."
-    
-    if req_start.hour >= 22:
-        return False, "Our last seating is at 10:00 PM."
-
-    # 4. Check Conflicts in DB
-    if table_no and table_no != "Any":
-        conflict = Reservation.query.filter_by(date=date, table_no=table_no).all()
-        for r in conflict:
-            existing_start = datetime.strptime(f"{r.date} {r.time}", "%Y-%m-%d %H:%M")
-            existing_end = existing_start + timedelta(hours=r.duration)
-
-            # Check Overlap
-            if req_start < existing_end and req_end > existing_start:
-                return False, f"Table {table_no} is already booked at that time."
-
-    return True, "Available"
-
 @reservations_bp.route('/reserve', methods=['GET', 'POST'])
 def reserve():
     if 'user_id' not in session:
         flash('Please login to make a reservation.', 'danger')
         return redirect(url_for('auth.login'))
 
-    user = User.query.get(session['user_id'])
+    user = current_user()
 
     # Profile check
     if not user.is_complete:
@@ -62,29 +28,32 @@ def reserve():
         guests = int(request.form['guests'])
         table_no = request.form['table_no']
 
-        is_valid, msg = check_table_availability(date, time, duration, table_no)
-        
-        if not is_valid:
+        new_res, msg = book_table(user.id, date, time, duration, guests, table_no)
+
+        if not new_res:
             flash(msg, 'danger')
             return redirect(url_for('reservations.reserve'))
 
-        new_res = Reservation(
-            user_id=user.id,
-            date=date,
-            time=time,
-            duration=duration,
-            guests=guests,
-            table_no=table_no,
-            status="Pending"
-        )
-
-        db.session.add(new_res)
-        db.session.commit()
+        publish_event('reservation', id=new_res.id, status=new_res.status)
 
-        flash("Reservation successful!", 'success')
+        flash(f"Reservation successful! Table {new_res.table_no} is booked for you.", 'success')
         return redirect(url_for('reservations.my_reservations'))
 
-    return render_template('reserve.html')
+    return render_template('reserve.html', tables=TABLES)
+
+@reservations_bp.route('/availability')
+def availability():
+    """Free tables for every start slot of a day: ?date=YYYY-MM-DD&duration=2&guests=2"""
+    try:
+        day = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Use ?date=YYYY-MM-DD'}), 400
+    try:
+        duration = max(1, min(int(request.args.get('duration', 2)), MAX_DURATION_HOURS))
+        guests = max(1, int(request.args.get('guests', 1)))
+    except ValueError:
+        return jsonify({'error': 'duration and guests must be numbers'}), 400
+    return jsonify(day_availability(day, duration, guests))
 
 @reservations_bp.route('/')
 def my_reservations():
@@ -108,6 +77,7 @@ def cancel_reservation(res_id):
 
     r.status = 'Canceled'
     db.session.commit()
+    publish_event('reservation', id=r.id, status=r.status)
 
     flash('Reservation has been canceled successfully.', 'success')
     return redirect(url_for('reservations.my_reservations'))
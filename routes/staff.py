@@ -1,7 +1,10 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, current_app, Response, stream_with_context
 from services.auth import role_required
 from extensions import db
 from models.models import Order, Reservation, User, MenuItem
+from services.orders import set_order_status
+from services.changefeed import ENTITY_ORDER, ENTITY_RESERVATION, current_version, feed_delta
+from services.events import events, publish_event
 import json
 from datetime import datetime
 import pytz
@@ -26,7 +29,17 @@ def chef():
 def chef_data():
     # Only show Confirmed or Preparing orders
     active_statuses = ['Confirmed', 'Preparing']
-    orders = Order.query.filter(Order.status.in_(active_statuses)).order_by(Order.created_at.asc()).all()
+    query = Order.query.filter(Order.status.in_(active_statuses))
+
+    # ?since=<version> returns only orders written after that version
+    version = current_version()
+    since = request.args.get('since', type=int)
+    delta = feed_delta(ENTITY_ORDER, Order, query, since, version) if since is not None else None
+    if delta:
+        orders, removed = delta
+    else:
+        orders, removed = query.order_by(Order.created_at.asc()).all(), []
+
     orders_json = []
     for o in orders:
         try:
@@ -38,9 +51,10 @@ def chef_data():
             'unique_order_number': o.unique_order_number,
             'status': o.status,
             'items': items,
-            'created_at': o.created_at.strftime('%H:%M')
+            'created_at': o.created_at.strftime('%H:%M'),
+            'sort_key': o.created_at.isoformat()
         })
-    return jsonify({'orders': orders_json})
+    return jsonify({'orders': orders_json, 'removed': removed, 'version': version, 'full': delta is None})
 
 @staff_bp.route('/waiter')
 @role_required('waiter', 'admin')
@@ -56,8 +70,23 @@ def waiter():
 @role_required('waiter', 'admin')
 def waiter_data():
     today = datetime.now(pytz.timezone('Asia/Dhaka')).strftime('%Y-%m-%d')
-    reservations = Reservation.query.filter(Reservation.date >= today).order_by(Reservation.date.asc(), Reservation.time.asc()).all()
-    orders = Order.query.filter(Order.order_type == 'dine_in', Order.status == 'Ready').all()
+    res_query = Reservation.query.filter(Reservation.date >= today)
+    order_query = Order.query.options(db.joinedload(Order.user)).filter(Order.order_type == 'dine_in', Order.status == 'Ready')
+
+    # ?since=<version> returns only rows written after that version
+    version = current_version()
+    since = request.args.get('since', type=int)
+    res_delta = order_delta = None
+    if since is not None:
+        res_delta = feed_delta(ENTITY_RESERVATION, Reservation, res_query, since, version)
+        order_delta = feed_delta(ENTITY_ORDER, Order, order_query, since, version)
+    full = res_delta is None or order_delta is None
+    if full:
+        reservations, removed_reservations = res_query.order_by(Reservation.date.asc(), Reservation.time.asc()).all(), []
+        orders, removed_orders = order_query.all(), []
+    else:
+        reservations, removed_reservations = res_delta
+        orders, removed_orders = order_delta
     
     res_list = [{
         'id': r.id,
@@ -77,7 +106,14 @@ def waiter_data():
         'status': o.status
     } for o in orders]
     
-    return jsonify({'reservations': res_list, 'orders': order_list})
+    return jsonify({
+        'reservations': res_list,
+        'orders': order_list,
+        'removed_reservations': removed_reservations,
+        'removed_orders': removed_orders,
+        'version': version,
+        'full': full
+    })
 
 @staff_bp.route('/order/status/<int:order_id>', methods=['POST'])
 @role_required('chef', 'waiter', 'admin')
@@ -85,8 +121,8 @@ def update_order_status(order_id):
     order = Order.query.get_or_404(order_id)
     new_status = request.form.get('status')
     if new_status:
-        order.status = new_status
-        db.session.commit()
+        set_order_status(order, new_status)
+        publish_event('order', id=order.id, status=order.status)
         msg = f'Order #{order.unique_order_number} status updated to {new_status}.'
         flash(msg, 'success')
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.is_json:
@@ -102,6 +138,7 @@ def update_reservation_status(res_id):
     if new_status:
         res.status = new_status
         db.session.commit()
+        publish_event('reservation', id=res.id, status=res.status)
         msg = f'Reservation #{res.unique_reservation_number} updated to {new_status}.'
         flash(msg, 'success')
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.is_json:
@@ -109,6 +146,17 @@ def update_reservation_status(res_id):
     
     return redirect(request.referrer or url_for('staff.waiter'))
 
+@staff_bp.route('/events')
+@role_required('chef', 'waiter', 'admin')
+def event_stream():
+    """Server-Sent Events for order/reservation changes; screens refetch on each event."""
+    if not current_app.config['SSE_ENABLED']:
+        # 204 tells EventSource not to reconnect; the page falls back to polling
+        return '', 204
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    return Response(stream_with_context(events.stream(last_id)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @staff_bp.route('/counts')
 def staff_counts():
     """Return notification counts for navbar badges - accessible to any logged-in user"""
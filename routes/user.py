@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from extensions import db
 from models.models import User, Order
 from services.email import send_email
+from services.identity import current_user
 import os
 import random
 from werkzeug.utils import secure_filename
@@ -14,7 +15,7 @@ def profile():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    user = User.query.get(session['user_id'])
+    user = current_user()
     return render_template('profile.html', user=user)
 
 @user_bp.route('/profile/edit', methods=['GET', 'POST'])
@@ -22,7 +23,7 @@ def edit_profile():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
 
-    user = User.query.get(session['user_id'])
+    user = current_user()
 
     if request.method == 'POST':
         full_name = request.form.get('full_name')
@@ -69,7 +70,7 @@ def orders():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
         
-    user = User.query.get(session['user_id'])
+    user = current_user()
     my_orders = Order.query.filter_by(user_id=user.id).order_by(Order.created_at.desc()).all()
     
     # Parse items JSON for display
@@ -87,7 +88,7 @@ def api_send_verification_code():
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Authentication required'}), 401
     
-    user = User.query.get(session['user_id'])
+    user = current_user()
     
     data = request.json or {}
     email_to_verify = data.get('email', user.email or '').strip()
@@ -128,7 +129,7 @@ def api_verify_email_code():
     if not code:
         return jsonify({'success': False, 'message': 'Code is required'}), 400
     
-    user = User.query.get(session['user_id'])
+    user = current_user()
     
     if user.email_verification_code and user.email_verification_code == str(code):
         # Code matched. Update email if provided.
@@ -0,0 +1,220 @@
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bkash_config import BKASH
+import requests
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 3.05      # seconds to open a connection to the gateway
+READ_TIMEOUT = 10           # seconds to wait for a response
+TOKEN_REFRESH_MARGIN = 60   # refresh this long before the token expires
+FAILURE_THRESHOLD = 5       # consecutive failures that open the circuit
+RESET_TIMEOUT = 30          # seconds the circuit stays open before a trial call
+
+# Gateway error codes meaning the payment was already executed
+ALREADY_EXECUTED_CODES = ('2062', '2116')
+# Gateway error codes meaning the token was not accepted
+TOKEN_REJECTED_CODES = ('2079', '401')
+
+class BkashError(Exception):
+    """The gateway answered, but not with a usable result."""
+
+class GatewayUnavailable(BkashError):
+    """The gateway could not be reached in time, or the circuit is open."""
+
+class CircuitBreaker:
+    """Stops calling a failing gateway for a while instead of tying up workers.
+
+    After `threshold` consecutive failures the circuit opens and calls fail
+    at once; after `reset_timeout` seconds one trial call is let through
+    and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.failures >= self.threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+class BkashClient:
+    """bKash checkout API over a pooled, keep-alive requests.Session.
+
+    Grants a token once and reuses it until shortly before it expires
+    (refreshing with the refresh token when possible). Every call has a
+    connect and read timeout and goes through a circuit breaker.
+    """
+
+    def __init__(self, config, session=None, breaker=None):
+        self.config = config
+        self.timeout = (config.get('connect_timeout', CONNECT_TIMEOUT), config.get('read_timeout', READ_TIMEOUT))
+        self.breaker = breaker or CircuitBreaker()
+        self.session = session or self._make_session()
+        self._token = None
+        self._refresh_token = None
+        self._expires_at = 0
+        self._token_lock = threading.Lock()
+
+    @staticmethod
+    def _make_session():
+        session = requests.Session()
+        # Only connection failures are retried: the request never reached
+        # the gateway, so this is safe even for payment calls.
+        retry = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=16, max_retries=retry)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _url(self, path):
+        return f"{self.config['base_url']}{path}"
+
+    def _post(self, path, body=None, headers=None, auth=None):
+        if not self.breaker.allow():
+            raise GatewayUnavailable("bKash is unavailable (circuit open)")
+        try:
+            res = self.session.post(self._url(path), json=body or {}, headers=headers, auth=auth, timeout=self.timeout)
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            raise GatewayUnavailable(f"bKash request to {path} failed: {e}") from e
+        if res.status_code >= 500:
+            self.breaker.record_failure()
+            raise GatewayUnavailable(f"bKash returned HTTP {res.status_code} for {path}")
+        self.breaker.record_success()
+        try:
+            return res.json()
+        except ValueError as e:
+            raise BkashError(f"bKash returned invalid JSON for {path}") from e
+
+    # -------------------------
+    # Tokens
+    # -------------------------
+    def _store_token(self, data):
+        if not data.get('id_token'):
+            raise BkashError(data.get('statusMessage') or data.get('errorMessage') or "bKash did not grant a token")
+        self._token = data['id_token']
+        self._refresh_token = data.get('refresh_token') or self._refresh_token
+        self._expires_at = time.monotonic() + int(data.get('expires_in', 3600))
+        return self._token
+
+    def _grant(self):
+        data = self._post('/token/grant', {
+            "app_key": self.config["app_key"],
+            "app_secret": self.config["app_secret"]
+        }, headers={"Content-Type": "application/json"}, auth=(self.config["username"], self.config["password"]))
+        return self._store_token(data)
+
+    def _refresh(self):
+        data = self._post('/token/refresh', {
+            "app_key": self.config["app_key"],
+            "app_secret": self.config["app_secret"],
+            "refresh_token": self._refresh_token
+        }, headers={"Content-Type": "application/json"}, auth=(self.config["username"], self.config["password"]))
+        return self._store_token(data)
+
+    def get_token(self):
+        """A valid id_token, granting or refreshing only when the cached one is about to expire."""
+        with self._token_lock:
+            if self._token and time.monotonic() < self._expires_at - TOKEN_REFRESH_MARGIN:
+                return self._token
+            if self._refresh_token:
+                try:
+                    return self._refresh()
+                except GatewayUnavailable:
+                    raise
+                except BkashError as e:
+                    logger.info(f"bKash token refresh failed, granting a new one: {e}")
+                    self._refresh_token = None
+            return self._grant()
+
+    def invalidate_token(self):
+        with self._token_lock:
+            self._token = None
+            self._expires_at = 0
+
+    def _auth_headers(self):
+        return {
+            "Content-Type": "application/json",
+            "authorization": self.get_token(),
+            "x-app-key": self.config["app_key"]
+        }
+
+    def _authed_post(self, path, body=None):
+        """POST with the cached token; a token the gateway rejects is replaced once."""
+        data = self._post(path, body, headers=self._auth_headers())
+        if str(data.get('statusCode', data.get('errorCode', ''))) in TOKEN_REJECTED_CODES:
+            self.invalidate_token()
+            data = self._post(path, body, headers=self._auth_headers())
+        return data
+
+    # -------------------------
+    # Payments
+    # -------------------------
+    def create_payment(self, amount, invoice_number, callback_url=None):
+        body = {
+            "amount": str(amount),
+            "currency": "BDT",
+            "intent": "sale",
+            "merchantInvoiceNumber": invoice_number,
+        }
+        if callback_url:
+            body["callbackURL"] = callback_url
+        return self._authed_post('/checkout/payment/create', body)
+
+    def query_payment(self, payment_id):
+        return self._authed_post(f'/checkout/payment/query/{payment_id}')
+
+    def execute_payment(self, payment_id):
+        """Execute a payment, safe to call again for the same payment id.
+
+        If the gateway says it was already executed, or the call timed out
+        after it may have reached the gateway, the payment's current state
+        is queried instead of executing it a second time.
+        """
+        try:
+            data = self._authed_post(f'/checkout/payment/execute/{payment_id}')
+        except GatewayUnavailable as e:
+            if not isinstance(e.__cause__, requests.Timeout):
+                raise
+            logger.warning(f"bKash execute for {payment_id} timed out, checking its status")
+            return self.query_payment(payment_id)
+        if str(data.get('errorCode', '')) in ALREADY_EXECUTED_CODES:
+            return self.query_payment(payment_id)
+        return data
+
+bkash = BkashClient(BKASH)
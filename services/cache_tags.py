@@ -0,0 +1,49 @@
+from extensions import cache
+import time
+
+# Tags used by the menu caches
+TAG_MENU = 'menu'
+TAG_RATINGS = 'ratings'
+
+def item_tag(item_id):
+    return f'item:{item_id}'
+
+def _tag_key(tag):
+    return f'tag-version:{tag}'
+
+def tag_versions(tags):
+    """Current version token of each tag.
+
+    A tag without a stored version (never invalidated, or evicted) gets a
+    fresh one, which only costs a cache miss, never a stale read.
+    """
+    keys = [_tag_key(t) for t in tags]
+    versions = []
+    for key, value in zip(keys, cache.get_many(*keys)):
+        if value is None:
+            cache.add(key, time.time_ns(), timeout=0)
+            value = cache.get(key)
+        versions.append(value)
+    return versions
+
+def tagged_key(base, tags):
+    """Cache key that changes whenever any of `tags` is invalidated."""
+    return base + ''.join(f'|{t}@{v}' for t, v in zip(tags, tag_versions(tags)))
+
+def invalidate_tags(*tags):
+    """Bump the version of each tag. Entries built under the old versions are
+    never read again and simply expire. Call after the change is committed.
+    """
+    now = time.time_ns()
+    cache.set_many({_tag_key(t): now for t in tags}, timeout=0)
+
+def cached_fragment(base, tags, builder, timeout=300):
+    """Return builder() cached under `base` + the current versions of `tags`."""
+    # The key is taken before building, so a change committed while building
+    # lands under a newer version and the result is not served stale.
+    key = tagged_key(base, tags)
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(key, value, timeout=timeout)
+    return value
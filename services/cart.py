@@ -0,0 +1,59 @@
+from models.models import MenuItem
+
+class PricedCart:
+    """Session cart priced against the menu with a single query.
+
+    lines holds one dict per cart entry that still exists on the menu
+    (id, name, price, qty, subtotal, image, stock); items maps id -> MenuItem.
+    """
+
+    def __init__(self, lines, items):
+        self.lines = lines
+        self.items = items
+        self.total = sum(line['subtotal'] for line in lines)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    @property
+    def out_of_stock(self):
+        """Lines asking for more than is currently in stock."""
+        return [line for line in self.lines if line['stock'] is not None and line['qty'] > line['stock']]
+
+def load_menu_items(item_ids):
+    """Fetch menu items for the given ids in one IN (...) query, keyed by id."""
+    ids = set()
+    for item_id in item_ids:
+        try:
+            ids.add(int(item_id))
+        except (TypeError, ValueError):
+            continue
+    if not ids:
+        return {}
+    return {mi.id: mi for mi in MenuItem.query.filter(MenuItem.id.in_(ids)).all()}
+
+def price_cart(cart_data):
+    """Price a session cart ({item_id: qty}); unknown items are dropped."""
+    cart_data = cart_data or {}
+    items = load_menu_items(cart_data.keys())
+
+    lines = []
+    for item_id, qty in cart_data.items():
+        try:
+            menu_item = items.get(int(item_id))
+        except (TypeError, ValueError):
+            menu_item = None
+        if not menu_item:
+            continue
+
+        lines.append({
+            'id': menu_item.id,
+            'name': menu_item.name,
+            'price': menu_item.price,
+            'qty': qty,
+            'subtotal': menu_item.price * qty,
+            'image': menu_item.image,
+            'stock': menu_item.stock_quantity
+        })
+
+    return PricedCart(lines, items)
@@ -0,0 +1,82 @@
+from models.models import Order, Reservation, ChangeFeed, ChangeFeedClock
+from extensions import db
+from sqlalchemy import event, func
+
+ENTITY_ORDER = 'order'
+ENTITY_RESERVATION = 'reservation'
+
+# How many feed rows are kept for ?since= catch-up; older clients reload fully
+FEED_RETENTION = 5000
+PRUNE_EVERY = 500
+
+def _lock_feed(connection):
+    """Take the feed clock's row lock for the rest of this transaction.
+
+    Autoincrement ids are handed out when a row is inserted but become
+    visible when its transaction commits; on a server database two writers
+    can commit out of order, and a client polling in between would skip
+    the lower id for good. Writers that append only while holding this
+    lock commit in id order. (On SQLite the database lock already
+    serializes writers; the lock costs one row update per transaction.)
+    """
+    transaction = connection.get_transaction()
+    if connection.info.get('feed_locked') is transaction:
+        return
+    clock = ChangeFeedClock.__table__
+    if connection.execute(clock.update().where(clock.c.id == 1).values(writes=clock.c.writes + 1)).rowcount == 0:
+        connection.execute(clock.insert().values(id=1, writes=1))
+    connection.info['feed_locked'] = transaction
+
+def create_feed_clock_if_missing():
+    """Seed the clock row at startup, so concurrent first writers never both insert it."""
+    if db.session.get(ChangeFeedClock, 1) is None:
+        db.session.add(ChangeFeedClock(id=1, writes=0))
+        db.session.commit()
+
+def _record(connection, entity, entity_id):
+    """Append one feed row inside the flush that wrote the record."""
+    _lock_feed(connection)
+    table = ChangeFeed.__table__
+    result = connection.execute(table.insert().values(entity=entity, entity_id=entity_id))
+    version = result.inserted_primary_key[0]
+    if version % PRUNE_EVERY == 0:
+        connection.execute(table.delete().where(table.c.id <= version - FEED_RETENTION))
+
+def _track(model, entity):
+    # Inserts, updates and deletes all bump the version; a deleted row simply
+    # no longer loads, which the delta reports as removed (a tombstone).
+    for name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(model, name, lambda mapper, connection, target: _record(connection, entity, target.id))
+
+_track(Order, ENTITY_ORDER)
+_track(Reservation, ENTITY_RESERVATION)
+
+def current_version():
+    """Highest committed feed id; every lower id is committed too (see _lock_feed)."""
+    return db.session.query(func.max(ChangeFeed.id)).scalar() or 0
+
+def changes_since(entity, since, version):
+    """Ids of `entity` written in (since, version], or None if the feed was pruned past `since`."""
+    if since > version:
+        return None  # feed was reset (e.g. a fresh database)
+    oldest = db.session.query(func.min(ChangeFeed.id)).scalar()
+    if oldest is not None and since < oldest - 1:
+        return None
+    rows = db.session.query(ChangeFeed.entity_id).filter(
+        ChangeFeed.entity == entity, ChangeFeed.id > since, ChangeFeed.id <= version
+    ).distinct().all()
+    return {entity_id for entity_id, in rows}
+
+def feed_delta(entity, model, query, since, version):
+    """Rows of `query` changed since a version, plus ids that changed but left it.
+
+    The removed ids cover deletes and rows that no longer match the board's
+    filter (e.g. an order that moved from Preparing to Ready). Returns
+    (rows, removed), or None when the client must reload the full set.
+    """
+    ids = changes_since(entity, since, version)
+    if ids is None:
+        return None
+    rows = query.filter(model.id.in_(ids)).all() if ids else []
+    removed = sorted(ids - {r.id for r in rows})
+    return rows, removed
@@ -0,0 +1,101 @@
+from models.models import MenuItem
+from extensions import db
+from services.cache_tags import tag_versions, TAG_MENU
+import threading
+import difflib
+import re
+
+WORD_TO_NUM = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+    'a': 1, 'an': 1
+}
+
+# Checked in this order; the first intent present in a message wins
+INTENTS = [
+    ('greeting', ['hi', 'hello', 'hey', 'greetings', 'good morning', 'good evening']),
+    ('menu', ['menu', 'list', 'what do you have', 'dishes']),
+    ('reserve', ['book', 'reservation', 'table', 'reserve']),
+    ('cart', ['cart', 'checkout', 'pay'])
+]
+
+# All intents in one regex; whole words (optionally plural) so that e.g.
+# "chicken" does not read as "hi" or "vegetable" as "table".
+_INTENT_RE = re.compile('|'.join(
+    rf"(?P<{name}>\b(?:{'|'.join(re.escape(p) for p in phrases)})s?\b)" for name, phrases in INTENTS
+))
+
+def detect_intent(message):
+    """Name of the highest-priority intent in a lowercased message, or None."""
+    found = {m.lastgroup for m in _INTENT_RE.finditer(message)}
+    for name, _ in INTENTS:
+        if name in found:
+            return name
+    return None
+
+class ItemMatcher:
+    """Finds menu items and their quantities in a chat message.
+
+    Every keyword (full name, its plural, and each word of the name longer
+    than two letters) goes into one alternation, longest first, with an
+    optional quantity in front, so a message is matched in one left to
+    right scan. Built per menu version and read-only afterwards.
+    """
+
+    def __init__(self, items):
+        self.items = {}
+        self.keywords = {}
+        for item_id, name in items:
+            self.items[item_id] = name
+            name_lower = name.lower()
+            self.keywords[name_lower] = item_id
+            self.keywords[name_lower + 's'] = item_id
+            for part in name_lower.split():
+                if len(part) > 2 and part not in self.keywords:
+                    self.keywords[part] = item_id
+        self.names = list(self.items.values())
+        self._names_lower = {name.lower(): item_id for item_id, name in self.items.items()}
+
+        self.pattern = None
+        if self.keywords:
+            alternation = '|'.join(re.escape(k) for k in sorted(self.keywords, key=len, reverse=True))
+            quantity = '|'.join([r'\d+'] + list(WORD_TO_NUM))
+            self.pattern = re.compile(rf"(?:\b({quantity})\s+)?\b({alternation})\b")
+
+    def find_items(self, message):
+        """[(item_id, quantity)] for each item mentioned in a lowercased message."""
+        if self.pattern is None:
+            return []
+        found = []
+        for match in self.pattern.finditer(message):
+            qty_str = match.group(1)
+            qty = 1
+            if qty_str:
+                qty = int(qty_str) if qty_str.isdigit() else WORD_TO_NUM.get(qty_str, 1)
+            found.append((self.keywords[match.group(2)], qty))
+        return found
+
+    def lookup(self, item_name):
+        """Item id for a free-text name: exact or keyword match first, then closest name."""
+        key = item_name.strip().lower()
+        if key in self.keywords:
+            return self.keywords[key]
+        matches = difflib.get_close_matches(key, list(self._names_lower), n=1, cutoff=0.5)
+        return self._names_lower[matches[0]] if matches else None
+
+_matcher = None
+_matcher_version = None
+_lock = threading.Lock()
+
+def get_item_matcher():
+    """Matcher over the available menu items, rebuilt when the menu tag changes."""
+    global _matcher, _matcher_version
+    version = tag_versions([TAG_MENU])[0]
+    if _matcher is None or _matcher_version != version:
+        with _lock:
+            if _matcher is None or _matcher_version != version:
+                rows = db.session.query(MenuItem.id, MenuItem.name)\
+                    .filter(MenuItem.availability == True).order_by(MenuItem.id).all()
+                _matcher = ItemMatcher(rows)
+                _matcher_version = version
+    return _matcher
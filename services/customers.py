@@ -0,0 +1,80 @@
+from models.models import User, Order
+from extensions import db
+from sqlalchemy import func, case
+
+# Spend thresholds for customer tiers, highest first
+TIERS = [(10000, 'VIP'), (5000, 'Gold'), (1000, 'Silver')]
+
+# Sortable columns exposed to the CRM page (?sort=...)
+SORT_KEYS = ('total_spent', 'total_orders', 'avg_order_value', 'username', 'created_at')
+
+def customer_metrics_query(sort='total_spent', direction='desc'):
+    """All customers with order count, spend, AOV and tier in one grouped query.
+
+    Orders are aggregated per user in a subquery and LEFT JOINed, so
+    customers without orders are included with zeros. Each row has
+    (User, total_orders, total_spent, avg_order_value, tier).
+    """
+    order_stats = db.session.query(
+        Order.user_id.label('user_id'),
+        func.count(Order.id).label('total_orders'),
+        func.sum(Order.total).label('total_spent')
+    ).group_by(Order.user_id).subquery()
+
+    total_orders = func.coalesce(order_stats.c.total_orders, 0)
+    total_spent = func.coalesce(order_stats.c.total_spent, 0)
+    avg_order_value = case((total_orders > 0, total_spent / total_orders), else_=0)
+    tier = case(*[(total_spent > limit, name) for limit, name in TIERS], else_='Regular')
+
+    columns = {
+        'total_spent': total_spent,
+        'total_orders': total_orders,
+        'avg_order_value': avg_order_value,
+        'username': User.username,
+        'created_at': User.created_at
+    }
+    order_column = columns.get(sort, total_spent)
+    order_column = order_column.asc() if direction == 'asc' else order_column.desc()
+
+    return db.session.query(
+        User,
+        total_orders.label('total_orders'),
+        total_spent.label('total_spent'),
+        avg_order_value.label('avg_order_value'),
+        tier.label('tier')
+    ).outerjoin(order_stats, order_stats.c.user_id == User.id)\
+        .filter(User.role == 'customer')\
+        .order_by(order_column, User.id.asc())
+
+def customer_stat(row):
+    """Turn a customer_metrics_query row into the dict the CRM templates use."""
+    customer, total_orders, total_spent, avg_order_value, tier = row
+    return {
+        'customer': customer,
+        'total_orders': total_orders,
+        'total_spent': total_spent,
+        'avg_order_value': avg_order_value,
+        'tier': tier
+    }
+
+def get_customer_metrics(page=1, per_page=50, sort='total_spent', direction='desc'):
+    """One page of customer metrics, sorted in SQL. Returns (pagination, stats)."""
+    pagination = customer_metrics_query(sort, direction).paginate(page=page, per_page=per_page, error_out=False)
+    return pagination, [customer_stat(row) for row in pagination.items]
+
+def get_customer_summary():
+    """Customer count and the average of per-customer AOV, over all customers."""
+    order_stats = db.session.query(
+        Order.user_id.label('user_id'),
+        (func.sum(Order.total) / func.count(Order.id)).label('aov')
+    ).group_by(Order.user_id).subquery()
+
+    count, aov_sum = db.session.query(
+        func.count(User.id),
+        func.coalesce(func.sum(order_stats.c.aov), 0)
+    ).outerjoin(order_stats, order_stats.c.user_id == User.id)\
+        .filter(User.role == 'customer').one()
+    return {
+        'total_customers': count,
+        'avg_order_value': aov_sum / count if count else 0
+    }
@@ -0,0 +1,68 @@
+from extensions import db
+from sqlalchemy import func, cast, Date
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+import sqlite3
+
+# Aggregation SQL that differs between databases. Each helper has a
+# PostgreSQL / MySQL form and a SQLite form, which is also the fallback.
+
+SQLITE_HAS_UPSERT = sqlite3.sqlite_version_info >= (3, 24, 0)
+
+def dialect_name():
+    return db.session.get_bind().dialect.name
+
+def day_of(column):
+    """Calendar day of a timestamp column (a 'YYYY-MM-DD' string on SQLite)."""
+    if dialect_name() == 'sqlite':
+        return func.date(column)
+    return cast(column, Date)
+
+def bucket_key(column, granularity):
+    """Text key of the hour ('YYYY-MM-DD HH:00'), day or Monday-started week ('YYYY-MM-DD') of a column."""
+    name = dialect_name()
+    if name == 'postgresql':
+        if granularity == 'week':
+            column = func.date_trunc('week', column)
+        return func.to_char(column, 'YYYY-MM-DD HH24:00' if granularity == 'hour' else 'YYYY-MM-DD')
+    if name in ('mysql', 'mariadb'):
+        if granularity == 'week':
+            column = func.subdate(column, func.weekday(column))
+        return func.date_format(column, '%Y-%m-%d %H:00' if granularity == 'hour' else '%Y-%m-%d')
+    if granularity == 'week':
+        return func.date(column, '-6 days', 'weekday 1')
+    return func.strftime('%Y-%m-%d %H:00' if granularity == 'hour' else '%Y-%m-%d', column)
+
+def increment_or_insert(table, key, increments):
+    """Add `increments` to the row of `table` matching `key`, inserting it if missing.
+
+    key must cover a unique constraint. Where the database has an upsert
+    this is one statement; otherwise an UPDATE followed, if it matched
+    nothing, by an INSERT. Runs in the caller's transaction.
+    """
+    name = dialect_name()
+    values = dict(key, **increments)
+    if name == 'postgresql' or (name == 'sqlite' and SQLITE_HAS_UPSERT):
+        stmt = (postgresql_insert if name == 'postgresql' else sqlite_insert)(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[column] for column in key],
+            set_={column: table.c[column] + stmt.excluded[column] for column in increments}
+        )
+        db.session.execute(stmt)
+        return
+    if name in ('mysql', 'mariadb'):
+        stmt = mysql_insert(table).values(**values)
+        db.session.execute(stmt.on_duplicate_key_update(
+            {column: table.c[column] + stmt.inserted[column] for column in increments}
+        ))
+        return
+
+    c = table.c
+    result = db.session.execute(
+        table.update()
+        .where(*[c[column] == value for column, value in key.items()])
+        .values({column: c[column] + value for column, value in increments.items()})
+    )
+    if result.rowcount == 0:
+        db.session.execute(table.insert().values(**values))
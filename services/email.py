@@ -1,47 +1,30 @@
 from flask import current_app
-from flask_mail import Message
-from extensions import mail
-import threading
+from services.email_queue import enqueue_email, start_email_worker_thread
 import json
 from datetime import datetime
 
 def send_email(subject, recipient, body):
-    """Helper to send emails with a timed wait to prevent request timeouts."""
+    """Queue an email for the background sender; never waits on SMTP.
+
+    Returns "pending" once queued, False for an invalid recipient or if the
+    job could not be stored.
+    """
     if not recipient or '@' not in recipient:
         print(f"Skipping email to invalid recipient: {recipient}")
         return False
-        
-    result = {"status": "failed"}
 
-    def _do_send(app_context):
-        with app_context:
-            try:
-                msg = Message(subject, recipients=[recipient])
-                msg.body = body
-                mail.send(msg)
-                result["status"] = "success"
-                print(f"Email sent to {recipient}")
-            except Exception as e:
-                with open("email_errors.log", "a") as f:
-                    f.write(f"[{datetime.now()}] Email error to {recipient}: {str(e)}\n")
-                print(f"Email error: {e}")
-                result["status"] = "failed"
-                
-    # Capture app context explicitly for the thread
-    # Note: access current_app._get_current_object() to get true app object
+    try:
+        enqueue_email(subject, recipient, body)
+    except Exception as e:
+        with open("email_errors.log", "a") as f:
+            f.write(f"[{datetime.now()}] Could not queue email to {recipient}: {str(e)}\n")
+        print(f"Email queue error: {e}")
+        return False
+
     app = current_app._get_current_object()
-    ctx = app.app_context()
-    thread = threading.Thread(target=_do_send, args=(ctx,))
-    thread.start()
-    
-    # Wait for up to 5 seconds. Fast enough for Render's request cycle.
-    thread.join(timeout=5)
-    
-    if thread.is_alive():
-        print(f"Email to {recipient} timed out locally, continuing in background.")
-        return "pending"
-    
-    return True if result["status"] == "success" else False
+    if app.config.get('EMAIL_WORKER', 'thread') == 'thread':
+        start_email_worker_thread(app)
+    return "pending"
 
 def format_order_body(order):
     """Helper to format order items for email."""
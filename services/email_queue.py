@@ -0,0 +1,209 @@
+from flask import g, has_request_context
+from flask_mail import Message
+from sqlalchemy.exc import SQLAlchemyError
+from extensions import db, mail
+from models.models import EmailJob
+from datetime import datetime, timedelta
+import threading
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5            # after this many failures a job is dead-lettered
+RETRY_BASE_SECONDS = 30     # first retry delay, doubled on every failure
+RETRY_MAX_SECONDS = 3600
+BATCH_SIZE = 20             # jobs sent over one SMTP connection
+POLL_SECONDS = 5            # idle wait between queue checks
+STALE_LOCK_SECONDS = 600    # a 'sending' job older than this is claimed again
+SENT_RETENTION_DAYS = 7
+DEAD_LETTER_LOG = "email_errors.log"
+
+def enqueue_email(subject, recipient, body):
+    """Add an email for the background sender to the caller's transaction; returns its job id.
+
+    The job goes through db.session, so it is committed or rolled back
+    together with the change it announces. A job queued after the view's
+    last commit is committed when the request ends (commit_queued_emails);
+    outside a request the session is committed at once.
+    """
+    now = datetime.utcnow()
+    job = EmailJob(recipient=recipient, subject=subject, body=body,
+                   status='queued', attempts=0, created_at=now, run_at=now)
+    db.session.add(job)
+    db.session.flush()
+    if has_request_context():
+        g.email_queued = True
+    else:
+        db.session.commit()
+        _wake.set()
+    return job.id
+
+def commit_queued_emails(response):
+    """after_request: commit the jobs the view queued after its own commit, then wake the sender.
+
+    Jobs the view rolled back are gone from the session by now; after an
+    unhandled error the request's session is discarded with them.
+    """
+    if g.pop('email_queued', False):
+        try:
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Could not commit queued emails: {e}")
+        _wake.set()
+    return response
+
+def init_email_queue(app):
+    app.after_request(commit_queued_emails)
+
+def _claim_due_jobs(limit):
+    """Mark up to `limit` due jobs as 'sending' for this worker and return them."""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=STALE_LOCK_SECONDS)
+    due = db.or_(
+        db.and_(EmailJob.status == 'queued', EmailJob.run_at <= now),
+        db.and_(EmailJob.status == 'sending', EmailJob.locked_at < stale)
+    )
+    ids = [row.id for row in db.session.query(EmailJob.id).filter(due).order_by(EmailJob.run_at).limit(limit)]
+    claimed = []
+    for job_id in ids:
+        # Conditional update: another worker may have claimed it meanwhile
+        updated = EmailJob.query.filter(EmailJob.id == job_id, due)\
+            .update({'status': 'sending', 'locked_at': now}, synchronize_session=False)
+        if updated:
+            claimed.append(job_id)
+    db.session.commit()
+    if not claimed:
+        return []
+    return EmailJob.query.filter(EmailJob.id.in_(claimed)).order_by(EmailJob.run_at).all()
+
+def _record_failure(job, error):
+    job.attempts += 1
+    job.last_error = str(error)[:1000]
+    job.locked_at = None
+    if job.attempts >= MAX_ATTEMPTS:
+        job.status = 'dead'
+        with open(DEAD_LETTER_LOG, "a") as f:
+            f.write(f"[{datetime.now()}] Email job {job.id} to {job.recipient} dead after {job.attempts} attempts: {job.last_error}\n")
+        logger.warning(f"Email job {job.id} to {job.recipient} moved to dead letters: {error}")
+    else:
+        delay = min(RETRY_BASE_SECONDS * 2 ** (job.attempts - 1), RETRY_MAX_SECONDS)
+        job.status = 'queued'
+        job.run_at = datetime.utcnow() + timedelta(seconds=delay)
+        logger.info(f"Email job {job.id} to {job.recipient} failed, retrying in {delay}s: {error}")
+
+def process_email_queue(limit=BATCH_SIZE):
+    """Send one batch of due jobs over a single SMTP connection.
+
+    Returns (sent, failed). Needs an app context.
+    """
+    jobs = _claim_due_jobs(limit)
+    if not jobs:
+        return 0, 0
+
+    sent = failed = 0
+    try:
+        with mail.connect() as conn:
+            for job in jobs:
+                try:
+                    msg = Message(job.subject, recipients=[job.recipient])
+                    msg.body = job.body
+                    conn.send(msg)
+                    job.status = 'sent'
+                    job.sent_at = datetime.utcnow()
+                    job.locked_at = None
+                    job.attempts += 1
+                    sent += 1
+                except Exception as e:
+                    _record_failure(job, e)
+                    failed += 1
+    except Exception as e:
+        # Could not open (or cleanly close) the connection: retry what is left
+        for job in jobs:
+            if job.status == 'sending':
+                _record_failure(job, e)
+                failed += 1
+    db.session.commit()
+    return sent, failed
+
+def prune_sent_jobs():
+    cutoff = datetime.utcnow() - timedelta(days=SENT_RETENTION_DAYS)
+    EmailJob.query.filter(EmailJob.status == 'sent', EmailJob.sent_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+
+def retry_job(job_id):
+    """Put a dead (or waiting) job back at the front of the queue. Returns False if unknown."""
+    job = db.session.get(EmailJob, job_id)
+    if job is None or job.status == 'sent':
+        return False
+    job.status = 'queued'
+    job.attempts = 0
+    job.run_at = datetime.utcnow()
+    job.locked_at = None
+    db.session.commit()
+    _wake.set()
+    return True
+
+def queue_stats():
+    """Queue depth per status and latency figures for the admin view."""
+    now = datetime.utcnow()
+    counts = dict(db.session.query(EmailJob.status, db.func.count(EmailJob.id)).group_by(EmailJob.status).all())
+
+    oldest = db.session.query(db.func.min(EmailJob.created_at))\
+        .filter(EmailJob.status.in_(['queued', 'sending'])).scalar()
+
+    recent = db.session.query(EmailJob.created_at, EmailJob.sent_at)\
+        .filter(EmailJob.status == 'sent', EmailJob.sent_at >= now - timedelta(days=1))\
+        .order_by(EmailJob.sent_at.desc()).limit(1000).all()
+    latencies = sorted((r.sent_at - r.created_at).total_seconds() for r in recent)
+
+    return {
+        'queued': counts.get('queued', 0),
+        'sending': counts.get('sending', 0),
+        'sent': counts.get('sent', 0),
+        'dead': counts.get('dead', 0),
+        'oldest_waiting_seconds': round((now - oldest).total_seconds(), 1) if oldest else 0,
+        'sent_last_day': len(latencies),
+        'avg_latency_seconds': round(sum(latencies) / len(latencies), 2) if latencies else None,
+        'p95_latency_seconds': round(latencies[math.ceil(len(latencies) * 0.95) - 1], 2) if latencies else None
+    }
+
+_wake = threading.Event()
+_thread = None
+_thread_lock = threading.Lock()
+
+def run_email_worker(app, once=False):
+    """Worker loop: send due batches, sleep when idle, prune old sent jobs hourly."""
+    last_prune = None
+    while True:
+        busy = False
+        _wake.clear()
+        try:
+            with app.app_context():
+                sent, failed = process_email_queue()
+                busy = sent + failed >= BATCH_SIZE
+                if sent or failed:
+                    print(f"[Email] Sent {sent}, failed {failed}")
+                if last_prune is None or datetime.utcnow() - last_prune > timedelta(hours=1):
+                    prune_sent_jobs()
+                    last_prune = datetime.utcnow()
+                db.session.remove()
+        except Exception as e:
+            logger.warning(f"Email worker iteration failed: {e}")
+        if once:
+            return
+        if not busy:
+            _wake.wait(POLL_SECONDS)
+
+def start_email_worker_thread(app):
+    """Run the worker as a daemon thread of this process (EMAIL_WORKER='thread').
+
+    Started lazily from the first enqueue so it lives in the serving
+    worker, not in a pre-fork master process.
+    """
+    global _thread
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=run_email_worker, args=(app,), daemon=True)
+            _thread.start()
@@ -0,0 +1,141 @@
+from models.models import ChangeFeed
+from extensions import db
+from flask import json
+from collections import deque
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MemoryBroker:
+    """In-process fan-out for live-update events.
+
+    Every open stream in this worker waits on one Condition, so a status
+    change costs a single notify no matter how many screens are open.
+    Only reaches streams served by the same process.
+    """
+
+    def __init__(self, size=500):
+        self._events = deque(maxlen=size)
+        self._last_id = 0
+        self._cond = threading.Condition()
+
+    def start(self, app):
+        pass
+
+    def publish(self, event, data):
+        with self._cond:
+            self._last_id += 1
+            self._events.append((self._last_id, event, data))
+            self._cond.notify_all()
+
+    def last_id(self):
+        with self._cond:
+            return self._last_id
+
+    def wait(self, after, timeout):
+        """Events with an id above `after`, blocking up to `timeout` seconds for one."""
+        with self._cond:
+            # An id from another process or an earlier run: skip ahead
+            if after > self._last_id:
+                after = self._last_id
+            self._cond.wait_for(lambda: self._last_id > after, timeout)
+            return [e for e in self._events if e[0] > after]
+
+class FeedBroker(MemoryBroker):
+    """Fan-out across worker processes through the change_feed table.
+
+    One daemon thread per process reads the latest feed version every
+    `interval` seconds and wakes this process's streams when it moves, so
+    writes made by other workers arrive within about a second. Events
+    published in this process are still delivered immediately.
+    """
+
+    def __init__(self, size=500, interval=1.0):
+        super().__init__(size)
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, app):
+        # Started lazily from the first stream so it runs in the worker, not
+        # in a pre-fork master process.
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._watch, args=(app,), daemon=True)
+                self._thread.start()
+
+    def _watch(self, app):
+        version = None
+        while True:
+            try:
+                with app.app_context():
+                    latest = db.session.query(db.func.max(ChangeFeed.id)).scalar() or 0
+                    db.session.remove()
+                if version is not None and latest != version:
+                    self.publish('changed', {'version': latest})
+                version = latest
+            except Exception as e:
+                logger.warning(f"Change feed watcher failed: {e}")
+            time.sleep(self.interval)
+
+BROKERS = {
+    'memory': MemoryBroker,
+    'feed': FeedBroker
+}
+
+class EventBus:
+    """Server-Sent Events channel for order and reservation changes.
+
+    Config: SSE_ENABLED (off by default, it needs a threaded worker),
+    EVENT_BROKER ('memory' or 'feed'), SSE_STREAM_SECONDS (each response
+    ends after this long and the browser reconnects with Last-Event-ID),
+    SSE_KEEPALIVE_SECONDS.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.broker = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SSE_ENABLED', False)
+        app.config.setdefault('EVENT_BROKER', 'memory')
+        app.config.setdefault('SSE_STREAM_SECONDS', 30)
+        app.config.setdefault('SSE_KEEPALIVE_SECONDS', 15)
+        self.app = app
+        self.broker = BROKERS[app.config['EVENT_BROKER']]()
+        app.extensions['event_bus'] = self
+
+    def publish(self, event, **data):
+        """Notify open streams. Call after the change is committed."""
+        if self.broker is not None:
+            self.broker.publish(event, data)
+
+    def stream(self, last_id=None):
+        """Generator of SSE frames for one client connection."""
+        broker = self.broker
+        broker.start(self.app)
+        config = self.app.config
+        cursor = broker.last_id() if last_id is None else last_id
+        deadline = time.monotonic() + config['SSE_STREAM_SECONDS']
+
+        yield "retry: 3000\n\n"
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            batch = broker.wait(cursor, min(config['SSE_KEEPALIVE_SECONDS'], remaining))
+            if not batch:
+                yield ": keepalive\n\n"
+                continue
+            for event_id, event, data in batch:
+                cursor = event_id
+                yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+events = EventBus()
+
+def publish_event(event, **data):
+    events.publish(event, **data)
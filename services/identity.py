@@ -0,0 +1,35 @@
+from models.models import User
+from extensions import db, cache
+from flask import g, session
+
+# Seconds a user's (role, username, exists) snapshot is reused across requests.
+# Role changes made through the admin/employee routes invalidate it at once.
+IDENTITY_CACHE_TTL = 30
+
+def _identity_key(user_id):
+    return f'identity:{user_id}'
+
+def get_identity(user_id):
+    """Cached {'exists', 'role', 'username'} for a user id, for session syncing."""
+    key = _identity_key(user_id)
+    identity = cache.get(key)
+    if identity is None:
+        row = db.session.query(User.role, User.username).filter(User.id == user_id).first()
+        identity = {
+            'exists': row is not None,
+            'role': str(getattr(row.role, 'name', row.role)) if row else None,
+            'username': row.username if row else None
+        }
+        cache.set(key, identity, timeout=IDENTITY_CACHE_TTL)
+    return identity
+
+def invalidate_identity(user_id):
+    """Drop the cached identity after a role/username change or account deletion."""
+    cache.delete(_identity_key(user_id))
+
+def current_user():
+    """The logged-in User, loaded at most once per request and kept on flask.g."""
+    if 'current_user' not in g:
+        user_id = session.get('user_id')
+        g.current_user = db.session.get(User, user_id) if user_id else None
+    return g.current_user
@@ -1,41 +1,95 @@
 from models.models import MenuItem
 from extensions import db
 from flask import current_app
+from services.cache_tags import invalidate_tags, item_tag, TAG_MENU
 import logging
 
 logger = logging.getLogger(__name__)
 
+class InsufficientStock(Exception):
+    """Raised when a reservation cannot be satisfied; nothing is decremented."""
+
+    def __init__(self, item_id, requested):
+        self.item_id = item_id
+        self.requested = requested
+        super().__init__(f"Insufficient stock for item id={item_id} (requested {requested}).")
+
+def reserve_stock(quantities):
+    """Atomically decrement stock for every line of an order.
+
+    quantities maps item_id -> qty. Each line is a conditional
+    UPDATE ... WHERE stock_quantity >= :qty executed in the current
+    transaction, so concurrent checkouts can never oversell. If any line
+    fails the whole transaction is rolled back and InsufficientStock is
+    raised. The caller commits (usually together with the Order).
+    NULL stock is treated as unlimited.
+    Returns the ids of items that just sold out; pass them to
+    invalidate_sold_out after the commit.
+    """
+    table = MenuItem.__table__
+    try:
+        # Fixed lock order keeps concurrent reservations from deadlocking
+        for item_id in sorted(quantities, key=int):
+            qty = quantities[item_id]
+            result = db.session.execute(
+                table.update()
+                .where(table.c.id == int(item_id))
+                .where(db.or_(table.c.stock_quantity.is_(None), table.c.stock_quantity >= qty))
+                .values(stock_quantity=table.c.stock_quantity - qty)
+            )
+            if result.rowcount != 1:
+                raise InsufficientStock(item_id, qty)
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Check low stock threshold
+    low = db.session.query(MenuItem.name, MenuItem.stock_quantity).filter(
+        MenuItem.id.in_([int(i) for i in quantities]),
+        MenuItem.stock_quantity <= db.func.coalesce(MenuItem.low_stock_threshold, 0)
+    ).all()
+    for name, remaining in low:
+        logger.info(f"Low stock alert for {name}: {remaining} remaining.")
+        # Here you could trigger email/notification; for now just log.
+
+    sold_out = db.session.query(MenuItem.id).filter(
+        MenuItem.id.in_([int(i) for i in quantities]),
+        MenuItem.stock_quantity <= 0
+    ).all()
+    return [item_id for item_id, in sold_out]
+
+def invalidate_sold_out(item_ids):
+    """Drop cached menu pages once items have sold out (the menu shows 'Sold out')."""
+    if item_ids:
+        invalidate_tags(TAG_MENU, *[item_tag(i) for i in item_ids])
+
 def decrease_stock(item_id, quantity):
     """Decrease stock for a menu item after an order.
     Returns True on success, False if insufficient stock.
     """
-    item = MenuItem.query.get(item_id)
-    if not item:
-        logger.error(f"MenuItem {item_id} not found for stock update.")
+    try:
+        sold_out = reserve_stock({item_id: quantity})
+    except InsufficientStock:
+        logger.warning(f"Insufficient stock for item id={item_id}. Requested {quantity}.")
         return False
-    if item.stock_quantity is None:
-        # Treat None as unlimited stock
-        return True
-    if item.stock_quantity < quantity:
-        logger.warning(f"Insufficient stock for item {item.name} (id={item.id}). Requested {quantity}, available {item.stock_quantity}.")
-        return False
-    item.stock_quantity -= quantity
     db.session.commit()
-    # Check low stock threshold
-    if item.stock_quantity <= (item.low_stock_threshold or 0):
-        logger.info(f"Low stock alert for {item.name}: {item.stock_quantity} remaining.")
-        # Here you could trigger email/notification; for now just log.
+    invalidate_sold_out(sold_out)
     return True
 
 def increase_stock(item_id, quantity):
     """Increase stock, e.g., when an order is cancelled.
     """
-    item = MenuItem.query.get(item_id)
-    if not item:
+    table = MenuItem.__table__
+    result = db.session.execute(
+        table.update()
+        .where(table.c.id == int(item_id))
+        .values(stock_quantity=table.c.stock_quantity + quantity)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
         logger.error(f"MenuItem {item_id} not found for stock increase.")
         return False
-    if item.stock_quantity is None:
-        return True
-    item.stock_quantity += quantity
     db.session.commit()
+    # May bring a sold-out item back
+    invalidate_tags(TAG_MENU, item_tag(item_id))
     return True
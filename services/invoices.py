@@ -0,0 +1,143 @@
+from flask import current_app, render_template
+from services.pdf import html_to_pdf
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import threading
+import tempfile
+import zipfile
+import hashlib
+import json
+import os
+
+INVOICE_WAIT_SECONDS = 60   # longest a download waits for its PDF
+MAX_EXPORT_ORDERS = 500     # per zip export
+CACHE_MAX_FILES = 5000      # cached PDFs kept before the oldest are pruned
+
+_pool = None
+_pool_lock = threading.Lock()
+_inflight = {}              # digest -> Future, so one invoice renders once at a time
+_inflight_lock = threading.Lock()
+_writes = 0
+
+def render_invoice_html(order):
+    # Items are passed separately: assigning order.items_parsed would mark
+    # the row dirty and make the next autoflush write it back.
+    try:
+        items = json.loads(order.items)
+    except (TypeError, ValueError):
+        items = []
+    return render_template('invoice.html', order=order, items=items)
+
+def invoice_digest(html):
+    """Content address of an invoice: any change to the order changes its HTML."""
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+def invoice_path(digest):
+    return os.path.join(current_app.config['INVOICE_CACHE_DIR'], digest[:2], f"{digest}.pdf")
+
+def _get_pool():
+    """Process pool for PDF rendering, created on first use.
+
+    Workers are forked from a clean fork server that preloads only
+    services.pdf, so they carry none of the web worker's threads,
+    connections or app setup.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(['services.pdf'])
+            _pool = ProcessPoolExecutor(max_workers=current_app.config['INVOICE_WORKERS'], mp_context=context)
+        return _pool
+
+def _submit(digest, html):
+    """Future for the PDF of `html`, sharing one render between concurrent requests."""
+    global _pool
+    with _inflight_lock:
+        future = _inflight.get(digest)
+        if future is None:
+            try:
+                future = _get_pool().submit(html_to_pdf, html)
+            except BrokenProcessPool:
+                with _pool_lock:
+                    _pool = None
+                future = _get_pool().submit(html_to_pdf, html)
+            _inflight[digest] = future
+            future.add_done_callback(lambda f: _inflight.pop(digest, None))
+        return future
+
+def _store(path, pdf):
+    """Write atomically so a reader never sees half a file."""
+    global _writes
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(pdf)
+    os.replace(tmp, path)
+    _writes += 1
+    if _writes % 100 == 0:
+        prune_invoice_cache()
+
+def _render(digest, html):
+    if not current_app.config['INVOICE_WORKERS']:
+        return html_to_pdf(html)
+    return _submit(digest, html).result(timeout=INVOICE_WAIT_SECONDS)
+
+def get_invoice(order):
+    """(path, digest) of the order's current invoice PDF, rendering it only on a cache miss."""
+    html = render_invoice_html(order)
+    digest = invoice_digest(html)
+    path = invoice_path(digest)
+    if os.path.exists(path):
+        os.utime(path)  # recently used files survive pruning
+    else:
+        _store(path, _render(digest, html))
+    return path, digest
+
+def export_invoices_zip(orders):
+    """Temporary file holding a zip of the orders' invoices.
+
+    Missing PDFs are rendered in parallel across the worker processes.
+    """
+    entries = []
+    pending = []
+    for order in orders:
+        html = render_invoice_html(order)
+        digest = invoice_digest(html)
+        path = invoice_path(digest)
+        entries.append((f"Invoice_{order.unique_order_number}.pdf", path))
+        if not os.path.exists(path):
+            if current_app.config['INVOICE_WORKERS']:
+                pending.append((path, _submit(digest, html)))
+            else:
+                _store(path, html_to_pdf(html))
+    for path, future in pending:
+        _store(path, future.result(timeout=INVOICE_WAIT_SECONDS))
+
+    archive = tempfile.TemporaryFile()
+    # PDFs are already compressed
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_STORED) as zf:
+        for name, path in entries:
+            zf.write(path, name)
+    archive.seek(0)
+    return archive
+
+def prune_invoice_cache(max_files=CACHE_MAX_FILES):
+    """Delete the least recently used PDFs beyond `max_files`."""
+    root = current_app.config['INVOICE_CACHE_DIR']
+    files = []
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            if name.endswith('.pdf'):
+                path = os.path.join(dirpath, name)
+                try:
+                    files.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+    files.sort()
+    for _, path in files[:max(0, len(files) - max_files)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,160 @@
+from models.models import Order, MenuItem, SaleItem, BkashPayment, get_dhaka_time
+from extensions import db
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from services.inventory import reserve_stock, invalidate_sold_out
+from services.rollup import record_order, rollup_state, sync_order
+from services.events import publish_event
+from services.sqlite_tuning import retry_on_lock
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+@retry_on_lock
+def create_order(user_id, cart, **order_fields):
+    """Create an Order together with its SaleItem rows in one transaction.
+
+    cart is a PricedCart from services.cart.price_cart. Extra keyword
+    arguments (phone, address, status, payment_method, ...) are passed to
+    Order. Stock for every line is reserved in the same transaction; if any
+    line is short nothing is written and InsufficientStock is raised.
+    Returns the committed Order.
+    """
+    items_list = []
+    sale_items = []
+    # One timestamp for the order and its lines, so they share a business_date
+    created_at = order_fields.pop('created_at', None) or get_dhaka_time()
+
+    for line in cart.lines:
+        items_list.append({
+            'id': line['id'],
+            'name': line['name'],
+            'price': line['price'],
+            'qty': line['qty']
+        })
+        sale_items.append(SaleItem(menu_item_id=line['id'], quantity=line['qty'], price_at_sale=line['price'],
+                                   created_at=created_at))
+
+    # SRS: Decrease stock quantity (all-or-nothing, raises InsufficientStock)
+    sold_out = reserve_stock({line['id']: line['qty'] for line in cart.lines})
+
+    order = Order(
+        user_id=user_id,
+        items=json.dumps(items_list),
+        total=cart.total,
+        created_at=created_at,
+        **order_fields
+    )
+    order.sale_items = sale_items
+
+    try:
+        db.session.add(order)
+        db.session.flush()
+        record_order(order)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    invalidate_sold_out(sold_out)
+    publish_event('order', id=order.id, status=order.status)
+    return order
+
+@retry_on_lock
+def set_order_status(order, status):
+    """Change an order's status, moving it between rollup rows, and commit."""
+    before = rollup_state(order)
+    order.status = status
+    sync_order(order, before)
+    db.session.commit()
+
+@retry_on_lock
+def claim_bkash_payment(payment_id, user_id):
+    """Record that this payment id is being finalized; False if it already was.
+
+    Committed before the payment is executed, so only one callback for a
+    payment id ever executes it and places the order.
+    """
+    db.session.add(BkashPayment(payment_id=payment_id, user_id=user_id))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
+
+def release_bkash_payment(payment_id):
+    """Drop a claim whose payment did not go through, so the callback can be retried."""
+    db.session.query(BkashPayment).filter_by(payment_id=payment_id, order_id=None).delete()
+    db.session.commit()
+
+def attach_bkash_order(payment_id, order):
+    """Link a claimed payment to the order it paid for."""
+    db.session.query(BkashPayment).filter_by(payment_id=payment_id).update({'order_id': order.id})
+    db.session.commit()
+
+def backfill_sale_items(batch_size=200, start_after=0):
+    """Convert historical JSON orders into SaleItem rows, batch by batch.
+
+    Only orders without any SaleItem rows are touched and every batch is
+    committed on its own, so an interrupted run can simply be restarted.
+    Lines are matched by menu item id when the JSON has one, otherwise by
+    name. Returns (orders_converted, lines_created, orders_skipped).
+    """
+    menu_by_name = {name.lower(): item_id for item_id, name in db.session.query(MenuItem.id, MenuItem.name)}
+    menu_ids = set(menu_by_name.values())
+
+    has_lines = db.session.query(SaleItem.id).filter(SaleItem.order_id == Order.id).exists()
+    last_id = start_after
+    converted = created = skipped = 0
+
+    while True:
+        batch = Order.query.filter(Order.id > last_id, ~has_lines)\
+            .order_by(Order.id.asc()).limit(batch_size).all()
+        if not batch:
+            break
+
+        for order in batch:
+            last_id = order.id
+            try:
+                items = json.loads(order.items)
+            except (TypeError, ValueError):
+                items = []
+
+            lines = []
+            for i in items if isinstance(items, list) else []:
+                menu_item_id = i.get('id') if i.get('id') in menu_ids else menu_by_name.get(str(i.get('name', '')).lower())
+                if not menu_item_id:
+                    continue
+                lines.append(SaleItem(
+                    order_id=order.id,
+                    menu_item_id=menu_item_id,
+                    quantity=int(i.get('qty', 1)),
+                    price_at_sale=float(i.get('price', 0)),
+                    created_at=order.created_at
+                ))
+
+            if not lines:
+                logger.warning(f"Order {order.id}: no menu items could be matched, skipping.")
+                skipped += 1
+                continue
+
+            db.session.add_all(lines)
+            converted += 1
+            created += len(lines)
+
+        db.session.commit()
+        logger.info(f"Backfilled sale items up to order id {last_id}.")
+
+    return converted, created, skipped
+
+def best_selling_items(limit=None):
+    """Return [(name, quantity_sold)] aggregated from SaleItem in SQL."""
+    query = db.session.query(
+        MenuItem.name,
+        func.sum(SaleItem.quantity).label('total_quantity')
+    ).join(SaleItem, SaleItem.menu_item_id == MenuItem.id)\
+        .group_by(MenuItem.id).order_by(func.sum(SaleItem.quantity).desc())
+    if limit:
+        query = query.limit(limit)
+    return [(row.name, row.total_quantity) for row in query.all()]
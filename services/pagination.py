@@ -0,0 +1,136 @@
+from models.models import User
+from extensions import db
+from datetime import datetime, date, timedelta
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+class KeysetPage:
+    """One page of a keyset-paginated list.
+
+    next_cursor is an opaque token for ?after=, or None on the last page.
+    """
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+    return value
+
+def encode_cursor(values):
+    raw = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Return the list of sort-key values in a cursor, or None if it is invalid."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list):
+        return None
+    return [_decode_value(v) for v in values]
+
+def _after_condition(order_by, values):
+    """WHERE clause selecting rows strictly after `values` in the sort order.
+
+    Expands (a, b, c) > (x, y, z) into OR-ed prefixes so every column can
+    have its own direction and the leading column can use an index.
+    """
+    clauses = []
+    for i, (column, descending) in enumerate(order_by):
+        if values[i] is None:
+            continue
+        prefix = [order_by[j][0] == values[j] for j in range(i)]
+        step = column < values[i] if descending else column > values[i]
+        clauses.append(db.and_(*prefix, step))
+    return db.or_(*clauses)
+
+def keyset_paginate(query, order_by, after=None, limit=DEFAULT_PAGE_SIZE):
+    """Fetch one page of `query` ordered by `order_by`, starting after a cursor.
+
+    order_by is a list of (column, descending) pairs and must end with a
+    unique column (usually the primary key) so the order is total. Page
+    cost is bounded by `limit` no matter how deep the cursor is.
+    """
+    limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+
+    if after:
+        values = decode_cursor(after)
+        if values is not None and len(values) == len(order_by):
+            query = query.filter(_after_condition(order_by, values))
+
+    query = query.order_by(*[column.desc() if descending else column.asc() for column, descending in order_by])
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column, _ in order_by])
+    return KeysetPage(rows, next_cursor)
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+def apply_list_filters(query, args, status_column=None, date_column=None, user_column=None, date_is_string=False):
+    """Apply the common admin list filters from request args.
+
+    ?status=A,B  ?date_from=YYYY-MM-DD  ?date_to=YYYY-MM-DD (inclusive)
+    ?customer=<username or user id>. Columns that are not given are ignored.
+    Set date_is_string for legacy 'YYYY-MM-DD' string columns.
+    """
+    status = args.get('status', '').strip()
+    if status_column is not None and status:
+        query = query.filter(status_column.in_([s.strip() for s in status.split(',') if s.strip()]))
+
+    if date_column is not None:
+        date_from = _parse_date(args.get('date_from'))
+        date_to = _parse_date(args.get('date_to'))
+        if date_is_string:
+            if date_from:
+                query = query.filter(date_column >= date_from.strftime('%Y-%m-%d'))
+            if date_to:
+                query = query.filter(date_column <= date_to.strftime('%Y-%m-%d'))
+        else:
+            if date_from:
+                query = query.filter(date_column >= date_from)
+            if date_to:
+                query = query.filter(date_column < date_to + timedelta(days=1))
+
+    customer = args.get('customer', '').strip()
+    if user_column is not None and customer:
+        if customer.isdigit():
+            query = query.filter(user_column == int(customer))
+        else:
+            matching = db.session.query(User.id).filter(User.username == customer.lower())
+            query = query.filter(user_column.in_(matching))
+
+    return query
+
+def list_filter_args(args):
+    """The filter/page-size args present in a request, for building links."""
+    return {k: v for k, v in args.items() if k in ('status', 'date_from', 'date_to', 'customer', 'role', 'limit') and v}
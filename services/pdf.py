@@ -0,0 +1,13 @@
+from xhtml2pdf import pisa
+import io
+
+# Kept free of app/model imports: this runs inside the invoice worker
+# processes, which import only this module.
+
+def html_to_pdf(html):
+    """Render an HTML document to PDF bytes. Raises ValueError if xhtml2pdf reports errors."""
+    out = io.BytesIO()
+    result = pisa.CreatePDF(html, dest=out)
+    if result.err:
+        raise ValueError(f"PDF rendering failed with {result.err} error(s)")
+    return out.getvalue()
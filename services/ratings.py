@@ -0,0 +1,90 @@
+from models.models import MenuItem, Rating
+from extensions import db
+from sqlalchemy import func, text
+from sqlalchemy.exc import SQLAlchemyError
+from services.cache_tags import invalidate_tags, item_tag, TAG_RATINGS
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Aggregate columns added to menu_item after the first release
+RATING_COLUMNS = [
+    ('rating_count', 'INTEGER NOT NULL DEFAULT 0'),
+    ('rating_sum', 'INTEGER NOT NULL DEFAULT 0'),
+    ('rating_avg', 'FLOAT NOT NULL DEFAULT 0.0'),
+]
+
+def add_rating(item_id, user_id, score):
+    """Save a rating and fold it into the item's count/sum/average.
+
+    Both writes happen in one transaction; the aggregate update is relative
+    (count + 1, sum + score), so concurrent votes are not lost.
+    """
+    table = MenuItem.__table__
+    try:
+        db.session.add(Rating(item_id=item_id, user_id=user_id, score=score))
+        db.session.execute(
+            table.update()
+            .where(table.c.id == item_id)
+            .values(rating_count=table.c.rating_count + 1,
+                    rating_sum=table.c.rating_sum + score,
+                    rating_avg=(table.c.rating_sum + score) * 1.0 / (table.c.rating_count + 1))
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    invalidate_tags(TAG_RATINGS, item_tag(item_id))
+
+def top_rated_items(limit=1):
+    """Highest average first (ties go to the older item); uses the rating_avg index."""
+    return MenuItem.query.filter(MenuItem.rating_count > 0)\
+        .order_by(MenuItem.rating_avg.desc(), MenuItem.id.asc())\
+        .limit(limit).all()
+
+def rebuild_rating_aggregates():
+    """Recompute every item's rating aggregates from the Rating table.
+
+    Used for the initial fill and for repair. Returns the number of rated items.
+    """
+    rows = db.session.query(
+        Rating.item_id, func.count(Rating.id), func.sum(Rating.score)
+    ).group_by(Rating.item_id).all()
+
+    table = MenuItem.__table__
+    try:
+        db.session.execute(table.update().values(rating_count=0, rating_sum=0, rating_avg=0.0))
+        for item_id, count, total in rows:
+            db.session.execute(
+                table.update().where(table.c.id == item_id)
+                .values(rating_count=count, rating_sum=total, rating_avg=total * 1.0 / count)
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    invalidate_tags(TAG_RATINGS)
+    logger.info(f"Rebuilt rating aggregates for {len(rows)} menu items.")
+    return len(rows)
+
+def add_rating_columns():
+    """Add the rating columns an existing menu_item table lacks; returns the names added.
+
+    db.create_all() never alters an existing table, so app.py runs this at
+    startup and migrate_ratings.py at upgrade. Workers starting together
+    may race on the ALTER; a column another one just added is accepted.
+    """
+    existing = {c['name'] for c in db.inspect(db.engine).get_columns('menu_item')}
+    added = []
+    for name, ddl in RATING_COLUMNS:
+        if name in existing:
+            continue
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE menu_item ADD COLUMN {name} {ddl}"))
+            added.append(name)
+        except SQLAlchemyError:
+            if name not in {c['name'] for c in db.inspect(db.engine).get_columns('menu_item')}:
+                raise
+    return added
@@ -0,0 +1,189 @@
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no forked web workers, the one process syncs
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica'
+# Read-only screens whose GET requests may read from the replica
+REPLICA_BLUEPRINTS = ('analytics', 'ai_insights', 'crm')
+REPLICA_ENDPOINTS = ('admin.export_invoices',)
+LAG_CHECK_SECONDS = 2   # how long a worker reuses one lag reading
+SYNC_LOCK_FILE = 'replica_sync.lock'   # in the instance folder; its holder is the syncer
+
+def _reading_from_replica():
+    return has_app_context() and g.get('db_replica', False)
+
+class RoutingSession(Session):
+    """Session that sends the reads of a routed request to the replica bind.
+
+    Flushes and DML statements (inserts, updates, deletes, upserts) always
+    go to the primary, and after the first one the rest of the request
+    reads from the primary as well, so it sees its own writes. Raw text()
+    writes are not detected and must not be issued from routed screens.
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _reading_from_replica():
+            if self._flushing or getattr(clause, 'is_dml', False):
+                g.db_replica = False
+            else:
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def replica_lag(db):
+    """Seconds since the heartbeat seen on the replica, or None if it cannot be read."""
+    from models.models import ReplicaHeartbeat
+    table = ReplicaHeartbeat.__table__
+    try:
+        with db.engines[REPLICA_BIND].connect() as conn:
+            beat_at = conn.execute(select(table.c.beat_at).where(table.c.id == 1)).scalar()
+    except SQLAlchemyError as e:
+        logger.warning(f"Replica unreadable: {getattr(e, 'orig', e)}")
+        return None
+    if beat_at is None:
+        return None
+    return max(0.0, (datetime.utcnow() - beat_at).total_seconds())
+
+_lag_reading = (None, None)   # (monotonic time, lag)
+
+def replica_is_fresh(app):
+    """True while the replica is at most REPLICA_MAX_LAG seconds behind.
+
+    The lag is read at most every LAG_CHECK_SECONDS per worker; a missing
+    or unreadable replica counts as stale.
+    """
+    global _lag_reading
+    checked_at, lag = _lag_reading
+    now = time.monotonic()
+    if checked_at is None or now - checked_at > LAG_CHECK_SECONDS:
+        lag = replica_lag(app.extensions['sqlalchemy'])
+        _lag_reading = (now, lag)
+        if lag is None:
+            logger.warning("Replica heartbeat not readable; reading from the primary")
+        elif lag > app.config['REPLICA_MAX_LAG']:
+            logger.warning(f"Replica {lag:.0f}s behind (budget {app.config['REPLICA_MAX_LAG']:.0f}s); reading from the primary")
+    return lag is not None and lag <= app.config['REPLICA_MAX_LAG']
+
+def _routed(app):
+    return (request.method in ('GET', 'HEAD')
+            and (request.blueprint in REPLICA_BLUEPRINTS or request.endpoint in REPLICA_ENDPOINTS)
+            and replica_is_fresh(app))
+
+def init_replica(app):
+    """Send the reporting screens' reads to the 'replica' bind, if one is configured.
+
+    Needs db created with RoutingSession (extensions.py). With
+    REPLICA_SYNC='thread' the first request starts the sync thread, and
+    one worker at a time is elected to sync.
+    """
+    if REPLICA_BIND not in app.config.get('SQLALCHEMY_BINDS', {}):
+        return
+
+    @app.before_request
+    def route_reads():
+        if app.config['REPLICA_SYNC'] == 'thread':
+            start_replica_sync_thread(app)
+        g.db_replica = _routed(app)
+
+def beat(db):
+    """Stamp the heartbeat row on the primary."""
+    from models.models import ReplicaHeartbeat
+    table = ReplicaHeartbeat.__table__
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        if conn.execute(table.update().where(table.c.id == 1).values(beat_at=now)).rowcount == 0:
+            conn.execute(table.insert().values(id=1, beat_at=now))
+
+def copy_sqlite(db):
+    """Copy the primary SQLite database over the replica file with the backup API.
+
+    The copy is one consistent snapshot; in WAL mode the replica's readers
+    keep their snapshot while it is written.
+    """
+    source = db.engine.raw_connection()
+    try:
+        target = db.engines[REPLICA_BIND].raw_connection()
+        try:
+            source.driver_connection.backup(target.driver_connection)
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+def sync_replica(app):
+    """Stamp the heartbeat, then refresh a SQLite replica.
+
+    A server replica (e.g. a PostgreSQL standby) receives the heartbeat
+    through its own replication, which is what its lag is measured by.
+    """
+    with app.app_context():
+        db = app.extensions['sqlalchemy']
+        beat(db)
+        if db.engine.dialect.name == 'sqlite' and db.engines[REPLICA_BIND].dialect.name == 'sqlite':
+            copy_sqlite(db)
+
+_thread = None
+_thread_lock = threading.Lock()
+_sync_lock = None   # open lock file while this process is the syncer
+
+def _is_syncer(app):
+    """True if this process holds the sync lock, taking it when it is free.
+
+    The lock is an exclusive flock on SYNC_LOCK_FILE, kept until the
+    process exits. Of all the web workers (and replica_sync.py) sharing
+    the instance folder only the holder syncs; the others keep trying, so
+    one of them takes over when the holder goes away.
+    """
+    global _sync_lock
+    if _sync_lock is not None or fcntl is None:
+        return True
+    os.makedirs(app.instance_path, exist_ok=True)
+    lock_file = open(os.path.join(app.instance_path, SYNC_LOCK_FILE), 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _sync_lock = lock_file
+    logger.info(f"Replica sync: process {os.getpid()} is the syncer")
+    return True
+
+def run_replica_sync(app, once=False):
+    """Sync loop: one sync every REPLICA_SYNC_INTERVAL seconds, in the elected process only."""
+    while True:
+        started = time.monotonic()
+        if _is_syncer(app):
+            try:
+                sync_replica(app)
+            except Exception as e:
+                logger.warning(f"Replica sync failed: {e}")
+        elif once:
+            logger.warning("Replica sync: another process holds the sync lock, nothing done")
+        if once:
+            return
+        time.sleep(max(0.0, app.config['REPLICA_SYNC_INTERVAL'] - (time.monotonic() - started)))
+
+def start_replica_sync_thread(app):
+    """Run the sync loop as a daemon thread of this process (REPLICA_SYNC='thread').
+
+    Every web worker starts one, but only the worker holding the sync
+    lock copies the replica (see _is_syncer).
+    """
+    global _thread
+    if _thread is not None:
+        return
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=run_replica_sync, args=(app,), daemon=True)
+            _thread.start()
@@ -0,0 +1,208 @@
+from models.models import Reservation, BookingLock
+from extensions import db
+from services.sqlite_tuning import retry_on_lock
+from datetime import datetime, timedelta
+
+# Seats per table, in the order tables are offered and assigned
+TABLES = {
+    'T1': 2, 'T2': 2, 'T3': 2, 'T4': 4, 'T5': 4,
+    'T6': 4, 'T7': 4, 'T8': 6, 'T9': 6, 'T10': 8
+}
+
+OPENING_HOUR = 11       # first seating
+LAST_SEATING_HOUR = 22  # no booking may start at or after this hour
+SLOT_MINUTES = 30       # granularity of the availability grid
+MAX_DURATION_HOURS = 6  # bounds the overlap scan; the form offers 1-3
+
+# Reservations in these states no longer hold their table
+INACTIVE_STATUSES = ('Canceled', 'Cancelled')
+
+def booking_window(date, time, duration):
+    """(start, end) datetimes for 'YYYY-MM-DD', 'HH:MM' and hours. Raises ValueError."""
+    start = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
+    return start, start + timedelta(hours=int(duration))
+
+def set_booking_window(reservation):
+    """Fill start_at/end_at from the reservation's date, time and duration."""
+    reservation.start_at, reservation.end_at = booking_window(reservation.date, reservation.time, reservation.duration)
+
+def busy_tables(start, end, tables=None, exclude_id=None):
+    """Tables with an active reservation overlapping [start, end), in one query.
+
+    Two windows overlap when each starts before the other ends. Since no
+    booking is longer than MAX_DURATION_HOURS, only rows starting within
+    that distance of `start` can overlap, which keeps the scan on
+    ix_reservation_table_start to a short range per table.
+    """
+    query = db.session.query(Reservation.table_no).filter(
+        Reservation.start_at > start - timedelta(hours=MAX_DURATION_HOURS),
+        Reservation.start_at < end,
+        Reservation.end_at > start,
+        Reservation.status.notin_(INACTIVE_STATUSES)
+    )
+    if tables is not None:
+        query = query.filter(Reservation.table_no.in_(list(tables)))
+    if exclude_id is not None:
+        query = query.filter(Reservation.id != exclude_id)
+    return {row.table_no for row in query.distinct()}
+
+def tables_for(guests):
+    """Tables that seat `guests`, smallest first so big tables stay free."""
+    fitting = [t for t, seats in TABLES.items() if seats >= guests]
+    return sorted(fitting, key=lambda t: TABLES[t])
+
+def find_free_table(start, end, guests):
+    """The first (smallest) table seating `guests` that is free for the whole window, or None."""
+    candidates = tables_for(guests)
+    if not candidates:
+        return None
+    busy = busy_tables(start, end, candidates)
+    return next((t for t in candidates if t not in busy), None)
+
+def day_slots(day):
+    """Start times offered on `day`, every SLOT_MINUTES from opening to last seating."""
+    slot = datetime.combine(day, datetime.min.time()).replace(hour=OPENING_HOUR)
+    last = slot.replace(hour=LAST_SEATING_HOUR)
+    slots = []
+    while slot < last:
+        slots.append(slot)
+        slot += timedelta(minutes=SLOT_MINUTES)
+    return slots
+
+def day_availability(day, duration=2, guests=1):
+    """Free tables for every start slot of `day`, from a single query.
+
+    Returns {'date', 'duration', 'guests', 'tables': [{'table', 'seats'}],
+    'slots': [{'time': 'HH:MM', 'free': [table, ...]}]}. Slots already in
+    the past list no tables.
+    """
+    slots = day_slots(day)
+    candidates = tables_for(guests)
+    length = timedelta(hours=duration)
+    day_start, day_end = slots[0], slots[-1] + length
+
+    booked = {}
+    if candidates:
+        rows = db.session.query(Reservation.table_no, Reservation.start_at, Reservation.end_at).filter(
+            Reservation.table_no.in_(candidates),
+            Reservation.start_at > day_start - timedelta(hours=MAX_DURATION_HOURS),
+            Reservation.start_at < day_end,
+            Reservation.end_at > day_start,
+            Reservation.status.notin_(INACTIVE_STATUSES)
+        ).all()
+        for row in rows:
+            booked.setdefault(row.table_no, []).append((row.start_at, row.end_at))
+
+    now = datetime.now()
+    grid = []
+    for start in slots:
+        end = start + length
+        free = []
+        if start >= now:
+            free = [t for t in candidates
+                    if not any(s < end and e > start for s, e in booked.get(t, ()))]
+        grid.append({'time': start.strftime('%H:%M'), 'free': free})
+
+    return {
+        'date': day.isoformat(),
+        'duration': duration,
+        'guests': guests,
+        'tables': [{'table': t, 'seats': TABLES[t]} for t in candidates],
+        'slots': grid
+    }
+
+def create_booking_lock_if_missing():
+    """Seed the booking lock row at startup, so concurrent first bookings never both insert it."""
+    if db.session.get(BookingLock, 1) is None:
+        db.session.add(BookingLock(id=1, bookings=0))
+        db.session.commit()
+
+def lock_bookings():
+    """Take the booking lock's row lock for the rest of this transaction.
+
+    Must be the first statement of the transaction: on SQLite the UPDATE
+    takes the write lock before anything is read, on a server database
+    other bookings wait on the row until this one commits.
+    """
+    lock = BookingLock.__table__
+    if db.session.execute(lock.update().where(lock.c.id == 1).values(bookings=lock.c.bookings + 1)).rowcount == 0:
+        db.session.execute(lock.insert().values(id=1, bookings=1))
+
+def check_table_availability(date, time, duration=2, table_no=None, guests=1):
+    """
+    Checks if a table is available.
+    Returns (bool, message, table_no); for "Any" the first free table that
+    seats the party is picked. Call it under lock_bookings() when the
+    answer is used to book (see book_table).
+    """
+    try:
+        # 1. Parse DateTime
+        req_start, req_end = booking_window(date, time, duration)
+        now = datetime.now()
+    except ValueError:
+        return False, "Invalid date/time format. Use YYYY-MM-DD and HH:MM.", None
+
+    if not 1 <= duration <= MAX_DURATION_HOURS:
+        return False, f"Reservations can last 1 to {MAX_DURATION_HOURS} hours.", None
+
+    # 2. Check Past Date
+    if req_start < now:
+        return False, "You cannot book a table in the past.", None
+
+    # 3. Check Opening Hours (11:00 to 23:00)
+    if req_start.hour < OPENING_HOUR:
+        return False, "We are closed. Opening hours are 11:00 AM - 11:00 PM.", None
+
+    if req_start.hour >= LAST_SEATING_HOUR:
+        return False, "Our last seating is at 10:00 PM.", None
+
+    # 4. Check Conflicts in DB (one overlap query on the table/start index)
+    if not table_no or table_no == "Any":
+        table_no = find_free_table(req_start, req_end, guests)
+        if not table_no:
+            return False, f"No table for {guests} is free at that time. Please try another time.", None
+        return True, "Available", table_no
+
+    if table_no not in TABLES:
+        return False, "Unknown table.", None
+
+    if TABLES[table_no] < guests:
+        return False, f"Table {table_no} seats only {TABLES[table_no]} guests.", None
+
+    if busy_tables(req_start, req_end, [table_no]):
+        return False, f"Table {table_no} is already booked at that time.", None
+
+    return True, "Available", table_no
+
+@retry_on_lock
+def book_table(user_id, date, time, duration, guests, table_no=None):
+    """Check availability and insert the reservation in one transaction.
+
+    The booking lock is taken before the overlap check, so concurrent
+    bookings (two "Any" requests in particular) are checked one after the
+    other and can never be given the same table.
+    Returns (Reservation, message); the reservation is None when the
+    table is not available, and nothing is written.
+    """
+    try:
+        lock_bookings()
+        ok, msg, table_no = check_table_availability(date, time, duration, table_no, guests)
+        if not ok:
+            db.session.rollback()
+            return None, msg
+        reservation = Reservation(
+            user_id=user_id,
+            date=date,
+            time=time,
+            duration=duration,
+            guests=guests,
+            table_no=table_no,
+            status="Pending"
+        )
+        set_booking_window(reservation)
+        db.session.add(reservation)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return reservation, msg
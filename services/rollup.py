@@ -0,0 +1,139 @@
+from models.models import Order, SaleItem, DailySalesRollup, get_business_date
+from extensions import db
+from services.dialect import day_of, increment_or_insert
+from sqlalchemy import func
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Orders in these statuses are left out of the sales figures
+EXCLUDED_STATUSES = ('Canceled', 'Cancelled')
+
+def rollup_state(order):
+    """Snapshot of the order fields that decide which rollup rows it counts in.
+
+    Take it before changing status/payment fields and pass it to sync_order.
+    """
+    return {
+        'sales_date': order.business_date or (get_business_date(order.created_at) if order.created_at else None),
+        'payment_method': order.payment_method or '',
+        'order_type': order.order_type or '',
+        'counted': order.status not in EXCLUDED_STATUSES
+    }
+
+def _increment(key, order_count, quantity, revenue):
+    """Add deltas to one rollup row, inserting it if missing (an upsert where supported)."""
+    increment_or_insert(DailySalesRollup.__table__, key,
+                        {'order_count': order_count, 'quantity': quantity, 'revenue': revenue})
+
+def apply_order(order, state=None, sign=1):
+    """Add (sign=1) or remove (sign=-1) an order's contribution to the rollup.
+
+    Runs inside the caller's transaction; the caller commits.
+    """
+    state = state or rollup_state(order)
+    if not state['counted'] or state['sales_date'] is None:
+        return
+
+    key = {
+        'sales_date': state['sales_date'],
+        'payment_method': state['payment_method'],
+        'order_type': state['order_type']
+    }
+
+    lines = {}
+    for si in order.sale_items:
+        qty, revenue = lines.get(si.menu_item_id, (0, 0.0))
+        lines[si.menu_item_id] = (qty + si.quantity, revenue + si.quantity * si.price_at_sale)
+
+    _increment(dict(key, menu_item_id=0), sign, sign * sum(q for q, _ in lines.values()), sign * (order.total or 0))
+    for menu_item_id, (qty, revenue) in lines.items():
+        _increment(dict(key, menu_item_id=menu_item_id), sign, sign * qty, sign * revenue)
+
+    if sign < 0:
+        # Rows no order counts in any more would not survive a rebuild either
+        table = DailySalesRollup.__table__
+        db.session.execute(table.delete().where(
+            *[table.c[column] == value for column, value in key.items()],
+            table.c.order_count <= 0
+        ))
+
+def record_order(order):
+    """Count a newly written order. Call after flush, before commit."""
+    apply_order(order)
+
+def retract_order(order):
+    """Remove an order from the rollup, e.g. before deleting it."""
+    apply_order(order, sign=-1)
+
+def sync_order(order, before):
+    """Move an order between rollup rows after its status or payment changed."""
+    if rollup_state(order) != before:
+        apply_order(order, before, sign=-1)
+        apply_order(order)
+
+def rebuild_daily_sales_rollup():
+    """Recompute the whole rollup table from orders and sale items.
+
+    Used for repair and for the initial fill. Returns the number of rows.
+    """
+    # Same day as rollup_state: business_date, else the day of created_at.
+    # A database that predates migrate_business_date.py (first start after
+    # upgrading) only has created_at.
+    if 'business_date' in {c['name'] for c in db.inspect(db.engine).get_columns('orders')}:
+        day = func.coalesce(Order.business_date, day_of(Order.created_at)).label('day')
+    else:
+        day = day_of(Order.created_at).label('day')
+    payment_method = func.coalesce(Order.payment_method, '').label('payment_method')
+    order_type = func.coalesce(Order.order_type, '').label('order_type')
+    counted = Order.status.notin_(EXCLUDED_STATUSES)
+
+    items_per_order = db.session.query(
+        SaleItem.order_id,
+        func.sum(SaleItem.quantity).label('quantity')
+    ).group_by(SaleItem.order_id).subquery()
+
+    order_rows = db.session.query(
+        day, payment_method, order_type,
+        func.count(Order.id),
+        func.coalesce(func.sum(items_per_order.c.quantity), 0),
+        func.coalesce(func.sum(Order.total), 0)
+    ).outerjoin(items_per_order, items_per_order.c.order_id == Order.id)\
+        .filter(counted, Order.created_at.isnot(None))\
+        .group_by(day, payment_method, order_type).all()
+
+    item_rows = db.session.query(
+        day, payment_method, order_type,
+        SaleItem.menu_item_id,
+        func.count(func.distinct(Order.id)),
+        func.sum(SaleItem.quantity),
+        func.sum(SaleItem.quantity * SaleItem.price_at_sale)
+    ).join(Order, SaleItem.order_id == Order.id)\
+        .filter(counted, Order.created_at.isnot(None))\
+        .group_by(day, payment_method, order_type, SaleItem.menu_item_id).all()
+
+    rows = [
+        {'sales_date': d, 'payment_method': pm, 'order_type': ot, 'menu_item_id': 0,
+         'order_count': n, 'quantity': q, 'revenue': r}
+        for d, pm, ot, n, q, r in order_rows
+    ] + [
+        {'sales_date': d, 'payment_method': pm, 'order_type': ot, 'menu_item_id': mid,
+         'order_count': n, 'quantity': q, 'revenue': r}
+        for d, pm, ot, mid, n, q, r in item_rows
+    ]
+    for row in rows:
+        if isinstance(row['sales_date'], str):  # SQLite returns date() as text
+            row['sales_date'] = datetime.strptime(row['sales_date'], '%Y-%m-%d').date()
+
+    try:
+        db.session.query(DailySalesRollup).delete()
+        if rows:
+            db.session.execute(DailySalesRollup.__table__.insert(), rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(f"Rebuilt daily sales rollup: {len(rows)} rows.")
+    return len(rows)
@@ -0,0 +1,142 @@
+from models.models import MenuItem
+from extensions import db
+from services.cache_tags import tag_versions, TAG_MENU
+from bisect import bisect_left
+import threading
+import re
+
+# Field weights: a hit in the name counts more than one in the ingredients
+FIELD_WEIGHTS = {'name': 3.0, 'category': 2.0, 'ingredients': 1.0}
+# Score factor by how a query term matched an indexed term
+EXACT, PREFIX, FUZZY = 1.0, 0.7, 0.4
+FUZZY_CACHE_SIZE = 5000
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or '').lower())
+
+def _max_edits(term):
+    """Typos tolerated for a query term: none for very short words."""
+    if len(term) <= 3:
+        return 0
+    return 1 if len(term) <= 6 else 2
+
+def _within_distance(a, b, limit):
+    """True if the Levenshtein distance between a and b is at most `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+class MenuIndex:
+    """In-memory inverted index over menu item name, category and ingredients.
+
+    postings maps each term to {item_id: weight}; terms is the sorted
+    vocabulary, used for prefix lookups with bisect. Built from one query
+    and never mutated apart from the typo memo, so readers need no lock.
+    """
+
+    def __init__(self, rows):
+        self.items = {}
+        self.postings = {}
+        for row in rows:
+            self.items[row.id] = {
+                'id': row.id,
+                'name': row.name,
+                'category': row.category,
+                'price': row.price,
+                'available': bool(row.availability)
+            }
+            for field, weight in FIELD_WEIGHTS.items():
+                for term in tokenize(getattr(row, field)):
+                    postings = self.postings.setdefault(term, {})
+                    postings[row.id] = max(postings.get(row.id, 0), weight)
+        self.terms = sorted(self.postings)
+        # Typo expansions already computed against this vocabulary
+        self._fuzzy = {}
+
+    def _prefixed(self, prefix):
+        start = bisect_left(self.terms, prefix)
+        for term in self.terms[start:]:
+            if not term.startswith(prefix):
+                break
+            yield term
+
+    def _expand(self, term):
+        """Indexed terms matching a query term, with their score factor."""
+        matches = {}
+        if term in self.postings:
+            matches[term] = EXACT
+        for t in self._prefixed(term):
+            matches.setdefault(t, PREFIX)
+        if not matches:
+            if term not in self._fuzzy:
+                limit = _max_edits(term)
+                if len(self._fuzzy) >= FUZZY_CACHE_SIZE:
+                    self._fuzzy.clear()
+                self._fuzzy[term] = [t for t in self.terms if limit and _within_distance(term, t, limit)]
+            matches = dict.fromkeys(self._fuzzy[term], FUZZY)
+        return matches
+
+    def search(self, query, limit=None):
+        """Item ids matching every word of `query`, best first.
+
+        Words match exactly, as a prefix of an indexed word, or failing
+        both within one or two typos.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        scores = None
+        for word in words:
+            word_scores = {}
+            for term, factor in self._expand(word).items():
+                for item_id, weight in self.postings[term].items():
+                    word_scores[item_id] = max(word_scores.get(item_id, 0), weight * factor)
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {i: s + word_scores[i] for i, s in scores.items() if i in word_scores}
+            if not scores:
+                return []
+        ranked = sorted(scores, key=lambda i: (-scores[i], not self.items[i]['available'], self.items[i]['name'].lower()))
+        return ranked[:limit] if limit else ranked
+
+    def suggest(self, prefix, limit=8):
+        """Autocomplete entries for a partly typed query."""
+        return [self.items[i] for i in self.search(prefix, limit)]
+
+_index = None
+_index_version = None
+_lock = threading.Lock()
+
+def get_index():
+    """The menu index, rebuilt when the menu tag has been invalidated.
+
+    Every menu change already bumps TAG_MENU, so each worker rebuilds its
+    copy on the next search after an edit and otherwise reuses it.
+    """
+    global _index, _index_version
+    version = tag_versions([TAG_MENU])[0]
+    if _index is None or _index_version != version:
+        with _lock:
+            if _index is None or _index_version != version:
+                rows = db.session.query(MenuItem.id, MenuItem.name, MenuItem.category,
+                                        MenuItem.ingredients, MenuItem.price, MenuItem.availability).all()
+                _index = MenuIndex(rows)
+                _index_version = version
+    return _index
+
+def search_menu(query, limit=None):
+    return get_index().search(query, limit)
+
+def autocomplete(prefix, limit=8):
+    return get_index().suggest(prefix, limit)
@@ -0,0 +1,73 @@
+from extensions import db
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from functools import wraps
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY = 0.05     # seconds before the first retry, doubled each time
+RETRY_MAX_DELAY = 1.0
+
+def _apply_pragmas(dbapi_connection, config):
+    cursor = dbapi_connection.cursor()
+    try:
+        # Persistent in the database file; cheap to repeat once it is set.
+        # Switching needs a moment without other writers, so a busy
+        # database keeps its mode until a later connection succeeds.
+        try:
+            cursor.execute(f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}")
+        except Exception as e:
+            logger.warning(f"Could not set SQLite journal_mode: {e}")
+        cursor.execute(f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT'])}")
+        cursor.execute(f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}")
+        cursor.execute(f"PRAGMA cache_size={int(config['SQLITE_CACHE_SIZE'])}")
+    finally:
+        cursor.close()
+
+def init_sqlite(app):
+    """Tune every new SQLite connection of the app's engines.
+
+    WAL lets the polling screens read while a checkout writes, and
+    synchronous=NORMAL is safe with WAL (a power cut can lose the last
+    commits, never corrupt the file). busy_timeout makes a writer wait for
+    the lock instead of failing at once. Other databases are left alone.
+    """
+    config = {key: app.config[key] for key in (
+        'SQLITE_JOURNAL_MODE', 'SQLITE_SYNCHRONOUS', 'SQLITE_BUSY_TIMEOUT',
+        'SQLITE_MMAP_SIZE', 'SQLITE_CACHE_SIZE')}
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', lambda conn, record: _apply_pragmas(conn, config))
+
+def is_lock_error(error):
+    message = str(getattr(error, 'orig', error)).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+def retry_on_lock(fn):
+    """Re-run a write transaction that failed because the database was locked.
+
+    The wrapped function must be a whole unit of work: it is called again
+    from the start after the session is rolled back, up to
+    SQLITE_WRITE_RETRIES times, with jittered exponential backoff.
+    Other errors, and a lock error on the last attempt, are raised.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        retries = current_app.config.get('SQLITE_WRITE_RETRIES', 0)
+        for attempt in range(retries + 1):
+            try:
+                return fn(*args, **kwargs)
+            except OperationalError as e:
+                if attempt == retries or not is_lock_error(e):
+                    raise
+                db.session.rollback()
+                delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f"{fn.__name__}: database locked, retry {attempt + 1}/{retries} in {delay:.2f}s")
+                time.sleep(delay)
+    return wrapper
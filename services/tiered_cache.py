@@ -0,0 +1,179 @@
+from flask_caching.backends.base import BaseCache
+from werkzeug.utils import import_string
+from collections import OrderedDict
+import pickle
+import threading
+import time
+
+# Stored as-is; anything else is kept pickled, so every get returns a
+# private copy just like the shared backend (no object is shared between
+# requests or threads, e.g. an ORM instance bound to another session).
+IMMUTABLE_TYPES = (str, bytes, int, float, bool, type(None))
+
+class _Pickled:
+    """A value stored as pickle bytes."""
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+class LocalLRU:
+    """Bounded in-process LRU with a per-entry TTL. Thread-safe."""
+
+    def __init__(self, max_entries=1000, timeout=5):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return (found, value)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                return False, None
+            self._data.move_to_end(key)
+        if isinstance(value, _Pickled):
+            value = pickle.loads(value.data)
+        return True, value
+
+    def set(self, key, value, timeout=None):
+        ttl = self.timeout if not timeout else min(timeout, self.timeout)
+        if not isinstance(value, IMMUTABLE_TYPES):
+            try:
+                value = _Pickled(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+            except (pickle.PicklingError, TypeError, AttributeError):
+                return  # the backend cannot store it either
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class TieredCache(BaseCache):
+    """Two-tier cache: a small in-process LRU (L1) in front of a shared backend (L2).
+
+    Reads try L1 first and fill it from L2; writes and deletes go to both.
+    L1 entries live at most CACHE_LOCAL_TIMEOUT seconds, which bounds how
+    long another worker's change can take to show up in this process.
+    Keys starting with a CACHE_LOCAL_BYPASS prefix always go to L2.
+
+    Config: CACHE_BACKEND (a flask_caching backend name such as
+    FileSystemCache, RedisCache, SimpleCache, or a dotted path),
+    CACHE_LOCAL_MAX_ENTRIES, CACHE_LOCAL_TIMEOUT, CACHE_LOCAL_BYPASS, plus
+    the usual options of the chosen backend.
+    """
+
+    def __init__(self, backend, max_entries=1000, local_timeout=5, bypass_prefixes=(), default_timeout=300):
+        super().__init__(default_timeout=default_timeout)
+        self.backend = backend
+        self.local = LocalLRU(max_entries, local_timeout)
+        self.bypass_prefixes = tuple(bypass_prefixes)
+        self.local_hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        backend_name = config.get('CACHE_BACKEND', 'FileSystemCache')
+        if '.' not in backend_name:
+            backend_name = 'flask_caching.backends.' + backend_name
+        backend = import_string(backend_name).factory(app, config, list(args), dict(kwargs))
+        return cls(
+            backend,
+            max_entries=config.get('CACHE_LOCAL_MAX_ENTRIES', 1000),
+            local_timeout=config.get('CACHE_LOCAL_TIMEOUT', 5),
+            bypass_prefixes=config.get('CACHE_LOCAL_BYPASS', ()),
+            default_timeout=kwargs.get('default_timeout', 300)
+        )
+
+    def _local_ok(self, key):
+        return self.local.timeout > 0 and not key.startswith(self.bypass_prefixes)
+
+    def get(self, key):
+        if self._local_ok(key):
+            found, value = self.local.get(key)
+            if found:
+                self.local_hits += 1
+                return value
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.backend_hits += 1
+        if self._local_ok(key):
+            self.local.set(key, value)
+        return value
+
+    def set(self, key, value, timeout=None):
+        result = self.backend.set(key, value, timeout=timeout)
+        if self._local_ok(key):
+            self.local.set(key, value, self._normalize_timeout(timeout))
+        return result
+
+    def add(self, key, value, timeout=None):
+        added = self.backend.add(key, value, timeout=timeout)
+        if added and self._local_ok(key):
+            self.local.set(key, value, self._normalize_timeout(timeout))
+        return added
+
+    def delete(self, key):
+        self.local.delete(key)
+        return self.backend.delete(key)
+
+    def delete_many(self, *keys):
+        for key in keys:
+            self.local.delete(key)
+        return self.backend.delete_many(*keys)
+
+    def has(self, key):
+        if self._local_ok(key) and self.local.get(key)[0]:
+            return True
+        return self.backend.has(key)
+
+    def clear(self):
+        self.local.clear()
+        return self.backend.clear()
+
+    def inc(self, key, delta=1):
+        self.local.delete(key)
+        return self.backend.inc(key, delta)
+
+    def dec(self, key, delta=1):
+        self.local.delete(key)
+        return self.backend.dec(key, delta)
+
+    def stats(self):
+        """Hit/miss/eviction counters for this process."""
+        lookups = self.local_hits + self.backend_hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'local_entries': len(self.local),
+            'local_max_entries': self.local.max_entries,
+            'local_timeout': self.local.timeout,
+            'local_hits': self.local_hits,
+            'backend_hits': self.backend_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.local_hits + self.backend_hits) / lookups, 3) if lookups else 0,
+            'local_evictions': self.local.evictions,
+            'local_expirations': self.local.expirations
+        }
@@ -0,0 +1,163 @@
+"""
+Stock Stress Test
+Checks that concurrent checkouts never oversell. N processes place orders
+for one menu item with limited stock through services.orders.create_order
+(the conditional UPDATE in services.inventory.reserve_stock) until it is
+sold out, then the script asserts that exactly the starting stock was sold
+and that the stock never went below zero.
+
+Runs on a temporary copy of the SQLite database, so the real stock is not
+touched. To run it against a disposable server database instead, pass
+--database-url (its stock WILL be changed).
+
+Usage: python stress_stock.py [--processes 16] [--stock 200] [--item-id ID] [--database-url URL]
+Exits 1 if the item was oversold.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('OPENAI_API_KEY', 'unused')  # the app builds an OpenAI client on import
+os.environ['EMAIL_WORKER'] = 'external'           # no background sender in the test processes
+
+def copy_sqlite(source_path, target_path):
+    """Consistent copy of a (possibly WAL-mode) SQLite database."""
+    source, target = sqlite3.connect(source_path), sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+def checkout_until_sold_out(item_id, user_id, start_at, max_orders):
+    """Worker: order 1-3 of the item until even a single one is refused.
+
+    Stops after max_orders successful orders, which a single process
+    cannot reach unless the stock check is broken.
+
+    Returns (quantity sold, orders refused, unexpected errors).
+    """
+    from app import app
+    from extensions import db
+    from services.cart import price_cart
+    from services.orders import create_order
+    from services.inventory import InsufficientStock
+
+    sold = refused = errors = 0
+    with app.app_context():
+        while time.time() < start_at:
+            time.sleep(0.005)
+        qty = random.randint(1, 3)
+        orders = 0
+        while orders < max_orders:
+            try:
+                create_order(user_id, price_cart({str(item_id): qty}), phone='0', address_street='-',
+                             address_city='-', address_district='-', status='Confirmed', payment_method='cash')
+                sold += qty
+                orders += 1
+                qty = random.randint(1, 3)
+            except InsufficientStock:
+                refused += 1
+                if qty == 1:
+                    break
+                qty = 1  # a smaller order may still fit
+            except Exception as e:
+                db.session.rollback()
+                errors += 1
+                print(f"[Stress] {type(e).__name__}: {e}")
+            finally:
+                db.session.remove()
+    return sold, refused, errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=16)
+    parser.add_argument('--stock', type=int, default=200)
+    parser.add_argument('--item-id', type=int, help="menu item to sell (default: the first one)")
+    parser.add_argument('--database-url', help="run against this database instead of a copy of the SQLite file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='stress_stock_')
+    try:
+        if args.database_url:
+            os.environ['DATABASE_URL'] = args.database_url
+        else:
+            from db_config import IS_SQLITE, SQLITE_PATH
+            if not IS_SQLITE:
+                print("[ERROR] DATABASE_URL is a server database; pass it as --database-url to confirm")
+                return 1
+            copy_path = os.path.join(workdir, 'restaurant.db')
+            copy_sqlite(SQLITE_PATH, copy_path)
+            os.environ['DATABASE_URL'] = f"sqlite:///{copy_path}"
+
+        # Set up and check with a plain engine; only the workers load the app
+        from sqlalchemy import create_engine, select, func
+        from models.models import MenuItem, SaleItem, User
+        engine = create_engine(os.environ['DATABASE_URL'])
+        items, lines = MenuItem.__table__, SaleItem.__table__
+
+        def stock_and_sold(conn):
+            stock = conn.execute(select(items.c.stock_quantity).where(items.c.id == item_id)).scalar()
+            sold = conn.execute(select(func.coalesce(func.sum(lines.c.quantity), 0))
+                                .where(lines.c.menu_item_id == item_id)).scalar()
+            return stock, sold
+
+        with engine.begin() as conn:
+            item_id = args.item_id or conn.execute(select(func.min(items.c.id))).scalar()
+            user_id = conn.execute(select(func.min(User.__table__.c.id))).scalar()
+            if item_id is None or user_id is None:
+                print("[ERROR] The database needs at least one menu item and one user")
+                return 1
+            conn.execute(items.update().where(items.c.id == item_id).values(stock_quantity=args.stock))
+            sold_before = stock_and_sold(conn)[1]
+
+        print(f"[Stress] {args.processes} processes buying item {item_id} (stock {args.stock})")
+        start_at = time.time() + 5  # let every process import the app first
+        lowest_stock = args.stock
+        with multiprocessing.get_context('spawn').Pool(args.processes) as pool:
+            run = pool.starmap_async(checkout_until_sold_out, [(item_id, user_id, start_at, args.stock)] * args.processes)
+            while not run.ready():
+                # Sample the stock while the checkouts run, not only at the end
+                with engine.connect() as conn:
+                    lowest_stock = min(lowest_stock, stock_and_sold(conn)[0])
+                run.wait(0.05)
+            results = run.get()
+        elapsed = time.time() - start_at
+
+        with engine.connect() as conn:
+            final_stock, sold_in_db = stock_and_sold(conn)
+        sold_in_db -= sold_before
+        lowest_stock = min(lowest_stock, final_stock)
+        engine.dispose()
+
+        sold = sum(r[0] for r in results)
+        refused = sum(r[1] for r in results)
+        errors = sum(r[2] for r in results)
+        print(f"[Stress] sold {sold} (order lines in db: {sold_in_db}), refused {refused}, errors {errors}, "
+              f"final stock {final_stock} (lowest seen {lowest_stock}), {elapsed:.1f}s")
+
+        failures = []
+        if lowest_stock < 0:
+            failures.append(f"stock went below zero ({lowest_stock})")
+        if sold_in_db != args.stock:
+            failures.append(f"sold {sold_in_db} of a stock of {args.stock}")
+        if sold != sold_in_db:
+            failures.append(f"workers report {sold} sold but the database has {sold_in_db}")
+        if sold_in_db + final_stock != args.stock:
+            failures.append(f"sold + remaining = {sold_in_db + final_stock}, expected {args.stock}")
+        for failure in failures:
+            print(f"[FAIL] {failure}")
+        if not failures:
+            print("[SUCCESS] No oversell")
+        return 1 if failures else 0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())